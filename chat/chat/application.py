@@ -44,6 +44,7 @@ class Application(threading.Thread):
         finish_callback: Callable[[list], None] | None = None,
         voice_input_callback: Callable[[str], None] | None = None,
         enable_tools: bool = True,
+        eager_tool_dispatch: bool = False,
     ):
         """
         初始化
@@ -69,6 +70,7 @@ class Application(threading.Thread):
             config=self._config, stt_callback=voice_input_callback
         )
         self._enable_tools = enable_tools
+        self._eager_tool_dispatch = eager_tool_dispatch
 
     def __enter__(self):
         """
@@ -151,6 +153,7 @@ class Application(threading.Thread):
             system_prompt=system_prompt,
             begin_callback=self._begin_callback,
             enable_tools=self._enable_tools,
+            eager_tool_dispatch=self._eager_tool_dispatch,
         )
 
     def run(self):
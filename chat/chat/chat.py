@@ -32,9 +32,11 @@ class Chat:
         system_prompt: str = "你是一个乐于助人的AI助手， 性格和网络喷子差不多， 批评用户毫无手软， 不过说出的话总是让人发人深省",
         begin_callback: Callable[[], dict | None] | None = None,
         enable_tools: bool = True,
+        eager_tool_dispatch: bool = False,
     ):
         """
         初始化Chat， 作为中间人准备好模型的所有方面
+        eager_tool_dispatch为True的时候流式输出过程中提前执行参数已经完整的工具调用
         """
         self._first_model = first_model
         self._second_model = second_model
@@ -58,7 +60,11 @@ class Chat:
             },
         ]
         self._enable_tools = enable_tools
-        self._tool_call_looper = ToolCallLooper(enable_tools=self._enable_tools)
+        self._tool_call_looper = ToolCallLooper(
+            enable_tools=self._enable_tools,
+            eager_dispatch=eager_tool_dispatch,
+            on_tool_progress=self._tool_progress_handler,
+        )
 
     def _append_message(
         self, user_message: str, base64_image: str | None = None
@@ -198,6 +204,14 @@ class Chat:
 
         return self._model.tool_call_accumulator.all()
 
+    def _tool_progress_handler(self, text: str):
+        """
+        把工具执行过程中的进度消息转发给前端
+        """
+        self._model_output.output_progress(
+            text=text, model_name=self._model.current_model
+        )
+
     def _delta_handler(self, delta) -> ModelResult:
         """
         返回消息块， 并且标记这个消息块是否为reasoning content
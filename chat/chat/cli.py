@@ -84,6 +84,9 @@ def chat(
     system_prompt: Annotated[
         str, typer.Option("--system-prompt", "-sp")
     ] = default_system_prompt,
+    eager_tool_dispatch: Annotated[
+        bool, typer.Option("--eager-tool-dispatch", "-etd")
+    ] = False,
 ):
     start_time = time.time()
     status = CLIStatus()
@@ -102,6 +105,7 @@ def chat(
                     input_callback=status.message_queue.get,
                     voice_input_callback=status.on_speech_result,
                     enable_tools=True,
+                    eager_tool_dispatch=eager_tool_dispatch,
                 )
             )
             application.start()
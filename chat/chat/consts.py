@@ -36,6 +36,7 @@ class ContentTag(str, Enum):
     reasoning_content = "reasoning_content"
     model_status = "model_status"
     all_model = "all_model"
+    tool_output = "tool_output"
 
 
 # 一些元数据的常量定义
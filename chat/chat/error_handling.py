@@ -108,6 +108,18 @@ def _log(err: Error):
         print(f"{err}\nException:\n{err.exception}")
 
 
+def is_transient_error(err: Exception) -> bool:
+    """
+    连接错误、读取超时、请求过于频繁和服务端5xx错误是暂时故障， 重试可能成功
+    其它错误（4xx、程序bug、配置错误）重试也不会成功
+    """
+    if isinstance(err, (APIConnectionError, OpenAIReadTimeout, RateLimitError)):
+        return True
+    if isinstance(err, (APIStatusError, ollama.ResponseError)):
+        return err.status_code >= 500
+    return False
+
+
 def handle_api_error(
     err: Exception,
     call_count: int,
@@ -407,8 +407,9 @@ class MainFrame(wx.Frame):
          另外两个接口也一样
         """
         if self.status.current_content_tag != model_result.tag:
+            # 工具进度和模型输出交替到达， 切换类型之前先输出缓冲的内容， 不把两种内容拼在一行里
+            self._flush_line()
             self.status.current_content_tag = model_result.tag
-            model_result.content = f"\n{model_result.content}"
 
         self.status.line += model_result.content
         if self.status.current_model_name != model_result.model_name:
@@ -416,11 +417,19 @@ class MainFrame(wx.Frame):
             wx.CallAfter(self.set_window_title, model_result.model_name)
 
         if self.status.line[-1:] == "\n" or model_result.tag == ContentTag.end:
-            content = self.status.line.strip()
-            if content:
-                wx.CallAfter(self.add_message_to_tree, content)
+            self._flush_line()
 
-            self.status.line = ""
+    def _flush_line(self):
+        """
+        把缓冲的一行内容连同它的类型交给UI线程
+        """
+        content = self.status.line.strip()
+        if content:
+            wx.CallAfter(
+                self.add_message_to_tree, content, self.status.current_content_tag
+            )
+
+        self.status.line = ""
 
     def on_finish(self, messages: list):
         """
@@ -437,12 +446,12 @@ class MainFrame(wx.Frame):
         self.current_reasoning_node = None
         self.sound_player.stop_play()
 
-    def add_message_to_tree(self, line: str):
+    def add_message_to_tree(self, line: str, tag: ContentTag):
         """
         最后在这个方法里更新UI内容
         """
 
-        if self.status.current_content_tag == ContentTag.reasoning_content:
+        if tag == ContentTag.reasoning_content:
             if self.current_reasoning_node is None:
                 self.current_reasoning_node = self.tree.AppendItem(
                     self.current_message_node,
@@ -10,6 +10,7 @@ from io import BytesIO
 from typing import Any, Callable
 from datetime import datetime
 from pathlib import Path
+from threading import Lock
 import ollama
 from openai import OpenAI
 from consts import ContentTag
@@ -209,6 +210,9 @@ class ModelOutput:
         self._chunk_callback = chunk_callback
         self._audio_callback = audio_callback
         self._finish_callback = finish_callback
+        # 工具的进度消息在工作线程里输出， 和模型的流式输出同时进行
+        # 回调函数都在这个锁里调用， 前端的行缓冲区不会被两个线程同时修改
+        self._output_lock = Lock()
         self._text_to_speech: TextToSpeech | None = None
         self.start_text_to_speech()
         self._tts_content = ""
@@ -291,7 +295,8 @@ class ModelOutput:
         也可以保存内容， 默认把最后的用户输入和模型输出保存到文件里
         """
         if self._finish_callback:
-            self._finish_callback(messages)
+            with self._output_lock:
+                self._finish_callback(messages)
 
         root_dir = Path("ai-chat-collections")
         if not root_dir.exists():
@@ -333,23 +338,36 @@ class ModelOutput:
         if model_result.tag == ContentTag.reasoning_content:
             if show_reasoning:
                 self._tts_content += model_result.content
-                if self._chunk_callback:
-                    self._chunk_callback(model_result)
-                else:
-                    print(model_result.content, end="", flush=True)
+                self._emit(model_result)
 
         else:
             self._tts_content += model_result.content
-            if self._chunk_callback:
-                self._chunk_callback(model_result)
-            else:
-                print(model_result.content, end="", flush=True)
+            self._emit(model_result)
 
         if finish_reason == "stop":
             print()
 
         self.speak(is_last=finish_reason == "stop")
 
+    def output_progress(self, text: str, model_name: str | None = None):
+        """
+        输出工具执行过程中的进度消息， 比如shell命令的实时输出
+        只显示不朗读， 也不计入对话内容， 可以在工具的工作线程里调用
+        """
+        if not text.endswith("\n"):
+            text += "\n"
+        self._emit(ModelResult(text, ContentTag.tool_output, model_name=model_name))
+
+    def _emit(self, model_result: ModelResult):
+        """
+        把消息块交给chunk_callback， 没有提供的时候输出到标准输出
+        """
+        with self._output_lock:
+            if self._chunk_callback:
+                self._chunk_callback(model_result)
+            else:
+                print(model_result.content, end="", flush=True)
+
     def speak(self, is_last: bool = False):
         """
         如果可用, 语音朗读llm内容
@@ -21,6 +21,14 @@ class _ModelManager:
         self._models: list[dict] = self.load_all_models()
         self._lock = Lock()
 
+    @property
+    def config(self) -> Config:
+        """
+        :return: 程序的配置， 工具可以读取自己的配置项目
+        :rtype: Config
+        """
+        return self._config
+
     def find_model_group_index(self, name: str | None = None) -> int:
         """
         根据子模型查询模型组的索引
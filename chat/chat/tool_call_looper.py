@@ -4,10 +4,13 @@
 # * date： 2026-03
 # * description: 一个简单的AI LLM聊天程序
 # 实现一个主Agent和子Agent共用的工具调用循环
-from typing import Callable
+from typing import Any, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
 from error_handling import emit_error
 
 from tools import get_tool_registry
+from tools.context import ToolContext
+from tools.result import Result
 from model import Model
 
 
@@ -19,11 +22,27 @@ class ToolCallLooper:
     def __init__(
         self,
         enable_tools: bool = True,
+        eager_dispatch: bool = False,
+        on_tool_progress: Callable[[str], None] | None = None,
     ):
-        """ """
+        """
+        初始化
+        :param enable_tools: 是否启用工具调用
+        :type enable_tools: bool
+        :param eager_dispatch: 流式输出时某个工具调用的参数完整之后立即在后台执行， 和剩余的生成过程重叠
+        :type eager_dispatch: bool
+        :param on_tool_progress: 工具执行过程中的进度消息回调， 可能在工具的工作线程里调用
+        :type on_tool_progress: Callable[[str], None] | None
+        """
 
         self._enable_tools = enable_tools
         self._tool_registry = get_tool_registry() if self._enable_tools else None
+        # 每个looper就是一个会话， 工具调用状态互不干扰
+        self._tool_context = ToolContext(progress_callback=on_tool_progress)
+        self._eager_dispatch = eager_dispatch and enable_tools
+        # 单个工作线程， 保证工具的执行顺序和串行执行完全一致
+        self._dispatch_executor: ThreadPoolExecutor | None = None
+        self._dispatched: list[Future] = []
 
     def run(
         self,
@@ -34,30 +53,75 @@ class ToolCallLooper:
         max_iterations: int = 9,
         stream_handler: Callable | None = None,
         on_iteration: Callable | None = None,
+        on_response: Callable[[Any], None] | None = None,
     ) -> list[dict]:
+        """
+        循环调用模型和工具， 直到模型不再调用工具或者达到迭代次数上限
+        :param on_iteration: 每一轮调用模型之前调用， 参数是本次run里的迭代序号， 抛出异常可以提前结束
+        :param on_response: 非流式调用的时候， 每次模型返回之后传入完整的响应， 可以用来统计token用量
+        :return: 追加了模型输出和工具结果的消息列表
+        """
         if not self._enable_tools or self._tool_registry is None:
             tools = None
         else:
             tools = self._tool_registry.to_call_tools(exclude=exclude_tools)
 
-        for iteration in range(max_iterations):
-            if on_iteration:
-                on_iteration(iteration)
+        eager = self._eager_dispatch and stream_handler is not None
+        if eager:
+            model.tool_call_accumulator.set_tool_call_handler(self._dispatch)
+
+        try:
+            for iteration in range(max_iterations):
+                if on_iteration:
+                    on_iteration(iteration)
+
+                # 上一次失败的请求可能残留了已经提交的工具调用
+                self._dispatched = []
+                response = model.chat(
+                    messages=messages, tools=tools, stream=stream_handler is not None
+                )
+                if stream_handler is not None:
+                    pending_calls = stream_handler(response)
+                else:
+                    if on_response:
+                        on_response(response)
+                    pending_calls = model.response_handler(response, messages=messages)
+
+                if not pending_calls:
+                    break
+
+                self._execute_and_append(messages, pending_calls, is_online)
+        finally:
+            if eager:
+                model.tool_call_accumulator.set_tool_call_handler(None)
+            self._shutdown_dispatch()
 
-            response = model.chat(
-                messages=messages, tools=tools, stream=stream_handler is not None
-            )
-            if stream_handler is not None:
-                pending_calls = stream_handler(response)
-            else:
-                pending_calls = model.response_handler(response, messages=messages)
+        return messages
 
-            if not pending_calls:
-                break
+    def _shutdown_dispatch(self):
+        """
+        结束提前执行工具调用的工作线程， 下一次run需要的时候重新创建
+        异常退出的时候还没有开始的工具调用直接取消， 正在执行的让它自己结束
+        """
+        if self._dispatch_executor is not None:
+            self._dispatch_executor.shutdown(wait=False, cancel_futures=True)
+            self._dispatch_executor = None
+        self._dispatched = []
 
-            self._execute_and_append(messages, pending_calls, is_online)
+    def _dispatch(self, tool_call: dict):
+        """
+        ToolCallAccumulator回调， 工具调用参数完整之后立即提交到后台执行
+        :param tool_call: 完整的工具调用信息
+        :type tool_call: dict
+        """
+        if self._dispatch_executor is None:
+            self._dispatch_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="tool-dispatch"
+            )
 
-        return messages
+        self._dispatched.append(
+            self._dispatch_executor.submit(self._execute_tool_call, tool_call)
+        )
 
     def _execute_and_append(self, messages: list, pending_calls: list, is_online: bool):
         tool_results = self._execute_all_tool_call(pending_tool_calls=pending_calls)
@@ -78,20 +142,41 @@ class ToolCallLooper:
         if self._tool_registry is None:
             return []
 
+        # 提前提交的工具调用和pending_tool_calls的顺序一一对应
+        dispatched = self._dispatched
+        self._dispatched = []
         tool_results = []
-        for tc in pending_tool_calls:
-            print(f"\n\nTool Calling: {tc['name']} Arguments: {tc['arguments']}")
-            result = self._tool_registry.execute(
-                name=tc["name"], arguments=tc["arguments"]
-            )
-            print(f"Tool Calling: {tc['name']} Done. Return Result: {result}")
-            if result.error:
-                emit_error(msg=str(result.error), exception=result.error)
+        for i, tc in enumerate(pending_tool_calls):
+            if i < len(dispatched):
+                result = dispatched[i].result()
+            else:
+                result = self._execute_tool_call(tc)
 
             tool_results.append({"tool_call": tc, "result": result})
 
         return tool_results
 
+    def _execute_tool_call(self, tc: dict) -> Result:
+        """
+        执行一个工具调用
+        :param tc: 工具调用信息
+        :type tc: dict
+        :return: 工具执行结果
+        :rtype: Result
+        """
+        if self._tool_registry is None:
+            return Result(result={}, error=RuntimeError("工具调用没有启用"))
+
+        print(f"\n\nTool Calling: {tc['name']} Arguments: {tc['arguments']}")
+        result = self._tool_registry.execute(
+            name=tc["name"], arguments=tc["arguments"], context=self._tool_context
+        )
+        print(f"Tool Calling: {tc['name']} Done. Return Result: {result}")
+        if result.error:
+            emit_error(msg=str(result.error), exception=result.error)
+
+        return result
+
     def _build_openai_tool_calls(self, tool_calls: list) -> dict:
         """
         添加openai格式的工具调用消息
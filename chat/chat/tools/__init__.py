@@ -5,21 +5,93 @@
 # * description: 一个简单的AI LLM聊天程序
 # 自动发现和注册工具
 
-from typing_extensions import Any, Callable
-from threading import Lock
+from typing_extensions import Any, Callable, Literal
+from threading import Event, Lock, Thread
+from contextvars import ContextVar
+import asyncio
+import concurrent.futures
+import hashlib
 import inspect
+import json
+import os
 import sys
 import importlib
 from pathlib import Path
+import pydantic
 from pydantic import BaseModel
 from tools.result import Result
-from error_handling import emit_error
+from tools.context import ToolContext
+from tools.event_loop import get_event_loop
+from error_handling import emit_error, Level
+
+# 工具默认的执行期限（秒）， 注册的时候可以单独设置
+DEFAULT_TOOL_TIMEOUT = 300.0
+# 工具清单缓存， 记录每个工具模块的修改时间和工具定义， 避免启动的时候导入所有工具模块
+TOOL_MANIFEST_PATH = Path("tmp") / "tool_manifest.json"
+_MANIFEST_VERSION = f"2-pydantic-{pydantic.VERSION}"
+# 当前工作线程正在执行的工具调用的取消信号
+_cancel_event: ContextVar[Event | None] = ContextVar("_cancel_event", default=None)
+# 当前工作线程正在执行的工具调用所属的会话
+_tool_context: ContextVar[ToolContext | None] = ContextVar(
+    "_tool_context", default=None
+)
+
+
+class ToolCancelledError(Exception):
+    """
+    工具调用已经超时被取消
+    """
+
+
+def is_cancelled() -> bool:
+    """
+    协作式取消， 耗时工具应当在循环或者阶段之间检查这个标记， 尽快结束
+    :return: 当前工具调用是否已经被取消
+    :rtype: bool
+    """
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def get_tool_context() -> ToolContext:
+    """
+    获取当前工具调用所属会话的状态， 只能在工具函数内部调用
+    :return: 当前会话的ToolContext
+    :rtype: ToolContext
+    """
+    context = _tool_context.get()
+    if context is None:
+        raise RuntimeError("当前线程没有正在执行的工具调用")
+
+    return context
+
+
+def get_progress_callback() -> Callable[[str], None] | None:
+    """
+    获取当前会话的进度消息回调， 工具可以把耗时操作的中间输出转发给UI
+    回调可以在任何线程里调用
+    :return: 进度回调， 当前会话不接收进度消息的时候返回None
+    :rtype: Callable[[str], None] | None
+    """
+    context = _tool_context.get()
+    return None if context is None else context.progress_callback
+
+
+def raise_if_cancelled():
+    """
+    当前工具调用已经被取消则抛出ToolCancelledError
+    """
+    if is_cancelled():
+        raise ToolCancelledError("工具调用已经超时被取消")
 
 
 class _ToolRegistry:
     """
     工具注册中心
     统一集中发现注册和管理所有工具
+    会话相关的状态全部保存在ToolContext
+    工具清单没有变化的模块只登记工具定义， 第一次调用的时候才导入模块完成真正的注册
+    延迟导入的时候会替换工具表里的条目， 可能和其他会话的读取同时发生， 所以工具表的读写都加锁
     """
 
     def __init__(self):
@@ -27,18 +99,35 @@ class _ToolRegistry:
         初始化
         """
         self._tools: dict[str, dict] = {}
-        self._calls_since_todo = 0
+        self._tools_lock = Lock()
         self._reminder_threshold = 8
-        self._last_tool_name = ""
 
-    def register(self, fun: Callable[[Any], Result]):
+    def register(
+        self,
+        fun: Callable[[Any], Any] | None = None,
+        *,
+        timeout: float = DEFAULT_TOOL_TIMEOUT,
+        mode: Literal["thread", "process"] = "thread",
+    ) -> Any:
         """
         注册工具
         工具函数的参数必须是pydantic.BaseModel的子类型， 返回值应当是result.Result类型
+        既可以直接作为装饰器@register， 也可以带参数@register(timeout=30)
+        工具函数可以是async def， 在共享事件循环上执行， 适合网络请求等IO密集的工具
+        mode="process"的工具在预热的工作进程里执行， 适合CPU密集或者不可信的计算
         :param fun: 工具函数
-        :type fun: Callable[[BaseModel], Result]
+        :type fun: Callable[[BaseModel], Result] | Callable[[BaseModel], Awaitable[Result]]
+        :param timeout: 工具的执行期限（秒）， 超时之后返回超时结果并且请求工具取消
+        :type timeout: float
+        :param mode: 同步工具的执行方式， thread工作线程， process工作进程
+        :type mode: Literal["thread", "process"]
         """
-        if fun.__name__ in self._tools:
+        if fun is None:
+            return lambda f: self.register(f, timeout=timeout, mode=mode)
+
+        with self._tools_lock:
+            lazy_info = self._tools.get(fun.__name__)
+        if lazy_info is not None and lazy_info["fun"] is not None:
             raise ValueError(
                 f"工具： {fun.__name__} 已经被注册， 请检查工具名称是否有误。"
             )
@@ -52,6 +141,10 @@ class _ToolRegistry:
         input_model = params[0].annotation
         if not (isinstance(input_model, type) and issubclass(input_model, BaseModel)):
             raise ValueError("工具函数的第一个参数必须是pydantic.BaseModel的子类型")
+
+        is_async = inspect.iscoroutinefunction(fun)
+        if is_async and mode == "process":
+            raise ValueError("async工具不能在工作进程里执行")
         # LLM需要的工具函数数据结构
         tool_def = {
             "type": "function",
@@ -61,22 +154,66 @@ class _ToolRegistry:
                 "parameters": input_model.model_json_schema(),
             },
         }
-        self._tools[fun.__name__] = {
-            "fun": fun,
-            "input_model": input_model,
-            "tool_def": tool_def,
-        }
+        with self._tools_lock:
+            self._tools[fun.__name__] = {
+                "fun": fun,
+                "module": fun.__module__,
+                "input_model": input_model,
+                "tool_def": tool_def,
+                "timeout": timeout,
+                "is_async": is_async,
+                "mode": mode,
+            }
         return fun
 
+    def _register_lazy(self, module_name: str, tool_def: dict):
+        """
+        只登记工具清单里的工具定义， 不导入工具模块
+        :param module_name: 工具所在的模块
+        :type module_name: str
+        :param tool_def: LLM需要的工具函数数据结构
+        :type tool_def: dict
+        """
+        with self._tools_lock:
+            self._tools[tool_def["function"]["name"]] = {
+                "fun": None,
+                "module": module_name,
+                "tool_def": tool_def,
+            }
+
+    def _tool_defs(self, module_name: str) -> list[dict]:
+        """
+        :param module_name: 工具所在的模块
+        :type module_name: str
+        :return: 这个模块注册的所有工具定义
+        :rtype: list[dict]
+        """
+        with self._tools_lock:
+            return [
+                info["tool_def"]
+                for info in self._tools.values()
+                if info["module"] == module_name
+            ]
+
     def get(self, name: str) -> dict | None:
         """
         通过名称获取工具
+        如果工具还没有导入， 这里导入工具模块， 导入过程由Python的模块锁保证只执行一次
         :param name: 工具名称
         :type name: str
         :return: 工具的详细定义
         :rtype: dict | None
         """
-        return self._tools.get(name)
+        with self._tools_lock:
+            info = self._tools.get(name)
+        if info is not None and info["fun"] is None:
+            importlib.import_module(info["module"])
+            with self._tools_lock:
+                info = self._tools[name]
+            if info["fun"] is None:
+                raise RuntimeError(f"模块： {info['module']} 没有注册工具： {name}")
+
+        return info
 
     def to_call_tools(self, exclude: set[str] | None = None) -> list[dict]:
         """
@@ -86,65 +223,204 @@ class _ToolRegistry:
         :rtype: list[dict]
         """
         exclude_set: set[str] = exclude or set()
-        return [
-            info["tool_def"]
-            for name, info in self._tools.items()
-            if name not in exclude_set
-        ]
+        with self._tools_lock:
+            return [
+                info["tool_def"]
+                for name, info in self._tools.items()
+                if name not in exclude_set
+            ]
 
-    def execute(self, name: str, arguments: dict) -> Result:
+    def execute(
+        self, name: str, arguments: dict, context: ToolContext | None = None
+    ) -> Result:
         """
         验证参数之后执行工具
         :param name: 工具名称
         :type name: str
         :param arguments: 工具的参数和该工具的input_model参数关联， 而input_model是用pydantic.BaseModel上定义的
         :type arguments: dict
+        :param context: 调用方会话的工具状态， None的时候使用一次性的状态
+        :type context: ToolContext | None
         :return: 工具执行结果
         :rtype: Result
         """
-        info = self.get(name=name)
+        try:
+            info = self.get(name=name)
+        except Exception as e:
+            emit_error(msg=str(e), exception=e)
+            return Result(result={}, error=e)
+
         if not info:
             return Result(result={}, error=RuntimeError(f"找不到工具： {name}"))
 
-        if self._last_tool_name == name and name == "todo_write":
+        if context is None:
+            context = ToolContext()
+
+        with context.lock:
+            repeated = context.last_tool_name == name and name == "todo_write"
+            context.last_tool_name = name
+        if repeated:
             return Result(
                 result={},
                 reminder="不能连续调用todo_write假装执行任务，必须调用真实工具推进相关todos",
             )
 
-        self._last_tool_name = name
         try:
             args = info["input_model"](**arguments)
-            result = info["fun"](args)
-            result.reminder = self._build_reminder(tool_name=name)
+            if info["is_async"]:
+                run = self._run_async
+            elif info["mode"] == "process":
+                run = self._run_in_process
+            else:
+                run = self._run_with_deadline
+            result = run(
+                name=name,
+                fun=info["fun"],
+                args=args,
+                timeout=info["timeout"],
+                context=context,
+            )
+            result.reminder = self._build_reminder(tool_name=name, context=context)
 
             return result
         except Exception as e:
             emit_error(msg=str(e), exception=e)
             return Result(result={}, error=e)
 
-    def _build_reminder(self, tool_name: str) -> str | None:
+    def _run_with_deadline(
+        self,
+        name: str,
+        fun: Callable,
+        args: BaseModel,
+        timeout: float,
+        context: ToolContext,
+    ) -> Result:
+        """
+        在工作线程上执行工具， 超过期限之后设置取消信号， 不再等待工具返回
+        Python线程不能被强制结束， 工具需要通过is_cancelled协作退出
+        :param name: 工具名称
+        :type name: str
+        :param fun: 工具函数
+        :type fun: Callable
+        :param args: 验证之后的工具参数
+        :type args: BaseModel
+        :param timeout: 执行期限（秒）
+        :type timeout: float
+        :param context: 调用方会话的工具状态
+        :type context: ToolContext
+        :return: 工具执行结果， 超时返回结构化的超时结果
+        :rtype: Result
+        """
+        cancel_event = Event()
+        outcome: dict[str, Any] = {}
+
+        def worker():
+            _cancel_event.set(cancel_event)
+            _tool_context.set(context)
+            try:
+                outcome["result"] = fun(args)
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = Thread(target=worker, name=f"tool-{name}", daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            cancel_event.set()
+            return self._timeout_result(name=name, timeout=timeout)
+
+        if "error" in outcome:
+            raise outcome["error"]
+
+        return outcome["result"]
+
+    def _run_async(
+        self,
+        name: str,
+        fun: Callable,
+        args: BaseModel,
+        timeout: float,
+        context: ToolContext,
+    ) -> Result:
+        """
+        在共享事件循环上执行async工具， 超过期限之后直接取消协程
+        参数和返回值参考_run_with_deadline
+        """
+
+        async def runner() -> Result:
+            _tool_context.set(context)
+            return await fun(args)
+
+        future = asyncio.run_coroutine_threadsafe(runner(), get_event_loop())
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return self._timeout_result(name=name, timeout=timeout)
+
+    def _run_in_process(
+        self,
+        name: str,
+        fun: Callable,
+        args: BaseModel,
+        timeout: float,
+        context: ToolContext,
+    ) -> Result:
+        """
+        在预热的工作进程里执行工具， 超过期限之后直接杀死工作进程
+        工作进程没有会话状态， 所以这类工具不能使用get_tool_context
+        参数和返回值参考_run_with_deadline
+        """
+        from tools.process_pool import run_tool_in_process
+
+        try:
+            return run_tool_in_process(fun=fun, args=args, timeout=timeout)
+        except TimeoutError:
+            return self._timeout_result(name=name, timeout=timeout)
+
+    def _timeout_result(self, name: str, timeout: float) -> Result:
+        """
+        构造结构化的超时结果返回给LLM
+        :param name: 工具名称
+        :type name: str
+        :param timeout: 执行期限（秒）
+        :type timeout: float
+        :rtype: Result
+        """
+        return Result(
+            result={"tool": name, "status": "timeout", "timeout": timeout},
+            error=TimeoutError(
+                f"工具： {name} 执行超过{timeout}秒， 已经取消， 建议缩小任务范围之后重试"
+            ),
+        )
+
+    def _build_reminder(self, tool_name: str, context: ToolContext) -> str | None:
         """
         构造系统提醒消息
+        :param tool_name: 刚刚执行的工具名称
+        :type tool_name: str
+        :param context: 调用方会话的工具状态
+        :type context: ToolContext
         :return: 系统提醒消息
         :rtype: str
         """
         from tools.todo_tool import get_todo_manager
 
-        if tool_name == "todo_write":
-            self._calls_since_todo = 0
-            return None
+        with context.lock:
+            if tool_name == "todo_write":
+                context.calls_since_todo = 0
+                return None
 
-        self._calls_since_todo += 1
-        if self._calls_since_todo < self._reminder_threshold:
-            return None
+            context.calls_since_todo += 1
+            if context.calls_since_todo < self._reminder_threshold:
+                return None
 
-        todo_manager = get_todo_manager()
-        if not todo_manager.is_active():
-            self._calls_since_todo = 0
-            return None
-        calls_since_todo = self._calls_since_todo
-        self._calls_since_todo = 0
+            todo_manager = get_todo_manager(context=context)
+            if not todo_manager.is_active():
+                context.calls_since_todo = 0
+                return None
+            calls_since_todo = context.calls_since_todo
+            context.calls_since_todo = 0
 
         return f"系统提醒： 已连续超过{calls_since_todo}次没有todo_write了\n{todo_manager.render()}\n建议使用todo_write工具更新进度"
 
@@ -164,18 +440,103 @@ def _setup_import_hack():
         sys.modules["util"] = sys.modules["chat.util"]
 
 
-def _auto_discover_tools():
+def _sources_fingerprint() -> str:
+    """
+    工具的参数定义可能来自辅助模块（比如table_reader.TableFormat）， 只看工具模块本身不够
+    这里把tools目录和程序目录下所有源文件的修改时间和大小合在一起， 任何一个变化都重新导入工具模块
+    :return: 所有源文件状态的摘要
+    :rtype: str
+    """
+    tools_dir = Path(__file__).parent
+    digest = hashlib.sha1()
+    for directory in (tools_dir, tools_dir.parent):
+        for file in sorted(directory.glob("*.py")):
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            digest.update(
+                f"{directory.name}/{file.name}:{stat.st_mtime_ns}:{stat.st_size}\n".encode()
+            )
+
+    return digest.hexdigest()
+
+
+def _load_manifest(fingerprint: str) -> dict:
+    """
+    读取工具清单缓存， 版本或者源文件摘要不一致、读取失败都当作没有缓存
+    :param fingerprint: 当前源文件的摘要
+    :type fingerprint: str
+    :return: 模块名称到清单条目的映射
+    :rtype: dict
+    """
+    try:
+        manifest = json.loads(TOOL_MANIFEST_PATH.read_text(encoding="UTF-8"))
+        if (
+            manifest.get("version") == _MANIFEST_VERSION
+            and manifest.get("fingerprint") == fingerprint
+        ):
+            return manifest["modules"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    return {}
+
+
+def _save_manifest(modules: dict, fingerprint: str):
+    """
+    保存工具清单缓存， 先写临时文件再替换， 多个进程同时写入也不会损坏
+    :param modules: 模块名称到清单条目的映射
+    :type modules: dict
+    :param fingerprint: 源文件的摘要
+    :type fingerprint: str
+    """
+    try:
+        TOOL_MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = TOOL_MANIFEST_PATH.with_name(
+            f"{TOOL_MANIFEST_PATH.name}.{os.getpid()}.tmp"
+        )
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "version": _MANIFEST_VERSION,
+                    "fingerprint": fingerprint,
+                    "modules": modules,
+                },
+                ensure_ascii=False,
+            ),
+            encoding="UTF-8",
+        )
+        os.replace(tmp_path, TOOL_MANIFEST_PATH)
+    except OSError as e:
+        emit_error(msg=str(e), exception=e, level=Level.WARN)
+
+
+def _auto_discover_tools(registry: _ToolRegistry):
     """
     自动发现并注册所有 tools/*_tool.py 工具模块
+    所有源文件都没有变化的时候只登记清单缓存里的工具定义， 否则立即导入工具模块并更新清单
+    :param registry: 工具注册中心
+    :type registry: _ToolRegistry
     """
+    fingerprint = _sources_fingerprint()
+    manifest = _load_manifest(fingerprint)
+    modules = {}
     tools_dir = Path(__file__).parent
     for file in tools_dir.glob("*_tool.py"):
         module_name = f"tools.{file.stem}"
-        try:
+        entry = manifest.get(module_name)
+        if entry is not None:
+            for tool_def in entry["tools"]:
+                registry._register_lazy(module_name=module_name, tool_def=tool_def)
+        else:
             importlib.import_module(module_name)
+            entry = {"tools": registry._tool_defs(module_name=module_name)}
 
-        except Exception as e:
-            raise e
+        modules[module_name] = entry
+
+    if modules != manifest:
+        _save_manifest(modules, fingerprint)
 
 
 _tool_registry_instance: _ToolRegistry | None = None
@@ -193,6 +554,6 @@ def get_tool_registry() -> _ToolRegistry:
         with _instance_lock:
             if _tool_registry_instance is None:
                 _tool_registry_instance = _ToolRegistry()
-                _auto_discover_tools()
+                _auto_discover_tools(_tool_registry_instance)
 
     return _tool_registry_instance
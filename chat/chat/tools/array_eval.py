@@ -0,0 +1,299 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/array_eval.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+smart_calc的数组模式
+在simpleeval的沙箱里用NumPy计算数组表达式： 统计、百分位、线性回归、矩阵运算
+只能调用白名单里的函数， 禁止访问属性， 所有数组的元素数量都有上限， 创建数组之前先检查大小
+"""
+
+from typing_extensions import Any, Callable
+import ast
+import math
+import operator
+import numpy as np
+from simpleeval import (  # type: ignore
+    DEFAULT_OPERATORS,
+    EvalWithCompoundTypes,
+    FeatureNotAvailable,
+)
+
+# 单个数组最多的元素数量
+MAX_ARRAY_SIZE = 1_000_000
+# 返回结果里最多的元素数量， 超出的部分截断
+MAX_OUTPUT_SIZE = 1000
+_MAX_POLY_DEGREE = 10
+
+
+def _check_size(size: float) -> None:
+    if size > MAX_ARRAY_SIZE:
+        raise ValueError(f"数组太大： {int(size)}个元素， 上限是{MAX_ARRAY_SIZE}")
+
+
+def _as_array(value: Any) -> np.ndarray:
+    """
+    :return: float64数组， 超出大小上限的时候抛出ValueError
+    :rtype: np.ndarray
+    """
+    if isinstance(value, (list, tuple)):
+        _check_size(len(value))
+    array = np.asarray(value, dtype=np.float64)
+    _check_size(array.size)
+    return array
+
+
+def _guarded(fun: Callable) -> Callable:
+    """
+    包装NumPy函数： 列表参数转换成数组， 返回之前检查结果大小
+    """
+
+    def wrapper(*args, **kwargs):
+        args = tuple(
+            _as_array(arg) if isinstance(arg, (list, tuple)) else arg for arg in args
+        )
+        result = fun(*args, **kwargs)
+        if isinstance(result, np.ndarray):
+            _check_size(result.size)
+        return result
+
+    wrapper.__name__ = getattr(fun, "__name__", "function")
+    return wrapper
+
+
+def _arange(start: float, stop: float | None = None, step: float = 1) -> np.ndarray:
+    if stop is None:
+        start, stop = 0, start
+    if step == 0:
+        raise ValueError("step不能为0")
+    _check_size(math.ceil((stop - start) / step))
+    return np.arange(start, stop, step, dtype=np.float64)
+
+
+def _linspace(start: float, stop: float, num: int = 50) -> np.ndarray:
+    _check_size(num)
+    return np.linspace(start, stop, int(num))
+
+
+def _filled(value: float) -> Callable:
+    def create(rows: int, cols: int | None = None) -> np.ndarray:
+        shape = (int(rows),) if cols is None else (int(rows), int(cols))
+        _check_size(math.prod(shape))
+        return np.full(shape, value, dtype=np.float64)
+
+    return create
+
+
+def _eye(n: int) -> np.ndarray:
+    _check_size(n * n)
+    return np.eye(int(n))
+
+
+def _reshape(a: Any, rows: int, cols: int) -> np.ndarray:
+    return _as_array(a).reshape(int(rows), int(cols))
+
+
+def _linregress(x: Any, y: Any) -> dict:
+    """
+    最小二乘线性回归 y = slope * x + intercept
+    """
+    x, y = _as_array(x), _as_array(y)
+    if x.shape != y.shape or x.ndim != 1 or len(x) < 2:
+        raise ValueError("linregress需要两个长度相同、至少两个元素的一维数组")
+
+    slope, intercept = np.polyfit(x, y, 1)
+    r = np.corrcoef(x, y)[0, 1]
+    return {"slope": slope, "intercept": intercept, "r": r, "r2": r * r}
+
+
+def _polyfit(x: Any, y: Any, deg: int = 1) -> np.ndarray:
+    if not 0 <= deg <= _MAX_POLY_DEGREE:
+        raise ValueError(f"多项式次数必须在0到{_MAX_POLY_DEGREE}之间")
+    return np.polyfit(_as_array(x), _as_array(y), int(deg))
+
+
+def _corrcoef(x: Any, y: Any) -> float:
+    return np.corrcoef(_as_array(x), _as_array(y))[0, 1]
+
+
+def _cov(x: Any, y: Any) -> float:
+    return np.cov(_as_array(x), _as_array(y))[0, 1]
+
+
+def _product_operands(a: Any, b: Any) -> tuple[np.ndarray, np.ndarray]:
+    """
+    矩阵乘法之前检查结果大小， 按dot的结果形状估算， 不小于matmul的结果
+    """
+    a, b = _as_array(a), _as_array(b)
+    if a.ndim == 0 or b.ndim == 0:
+        _check_size(max(a.size, b.size))
+    else:
+        size = math.prod(a.shape[:-1])
+        if b.ndim > 1:
+            size *= math.prod(b.shape[:-2]) * b.shape[-1]
+        _check_size(size)
+    return a, b
+
+
+def _matmul(a: Any, b: Any) -> np.ndarray:
+    return np.matmul(*_product_operands(a, b))
+
+
+def _dot(a: Any, b: Any) -> np.ndarray:
+    return np.dot(*_product_operands(a, b))
+
+
+ARRAY_FUNCTIONS: dict[str, Callable] = {
+    # 创建数组
+    "array": _as_array,
+    "arange": _arange,
+    "linspace": _linspace,
+    "zeros": _filled(0.0),
+    "ones": _filled(1.0),
+    "eye": _eye,
+    "reshape": _guarded(_reshape),
+    # 统计
+    "len": len,
+    "sum": _guarded(np.sum),
+    "prod": _guarded(np.prod),
+    "mean": _guarded(np.mean),
+    "median": _guarded(np.median),
+    "std": _guarded(np.std),
+    "var": _guarded(np.var),
+    "min": _guarded(np.min),
+    "max": _guarded(np.max),
+    "argmin": _guarded(np.argmin),
+    "argmax": _guarded(np.argmax),
+    "percentile": _guarded(np.percentile),
+    "quantile": _guarded(np.quantile),
+    "cumsum": _guarded(np.cumsum),
+    "diff": _guarded(np.diff),
+    "sort": _guarded(np.sort),
+    "unique": _guarded(np.unique),
+    "corrcoef": _corrcoef,
+    "cov": _cov,
+    "linregress": _linregress,
+    "polyfit": _polyfit,
+    "polyval": _guarded(np.polyval),
+    # 逐元素
+    "abs": _guarded(np.abs),
+    "sqrt": _guarded(np.sqrt),
+    "exp": _guarded(np.exp),
+    "log": _guarded(np.log),
+    "log10": _guarded(np.log10),
+    "round": _guarded(np.round),
+    # 矩阵
+    "dot": _dot,
+    "matmul": _matmul,
+    "transpose": _guarded(np.transpose),
+    "inv": _guarded(np.linalg.inv),
+    "det": _guarded(np.linalg.det),
+    "solve": _guarded(np.linalg.solve),
+}
+ARRAY_NAMES = {"pi": math.pi, "e": math.e}
+
+
+def _array_operator(array_op: Callable, scalar_op: Callable) -> Callable:
+    """
+    有数组参与的时候先检查广播之后的大小， 否则使用simpleeval自带的安全运算
+    """
+
+    def apply(a, b):
+        if isinstance(a, (np.ndarray, np.generic)) or isinstance(
+            b, (np.ndarray, np.generic)
+        ):
+            _check_size(math.prod(np.broadcast_shapes(np.shape(a), np.shape(b))))
+            return array_op(a, b)
+        return scalar_op(a, b)
+
+    return apply
+
+
+_ARRAY_OPERATORS = {
+    **DEFAULT_OPERATORS,
+    ast.Add: _array_operator(np.add, DEFAULT_OPERATORS[ast.Add]),
+    ast.Sub: _array_operator(np.subtract, operator.sub),
+    ast.Mult: _array_operator(np.multiply, DEFAULT_OPERATORS[ast.Mult]),
+    ast.Div: _array_operator(np.true_divide, operator.truediv),
+    ast.FloorDiv: _array_operator(np.floor_divide, operator.floordiv),
+    ast.Mod: _array_operator(np.mod, operator.mod),
+    ast.Pow: _array_operator(np.power, DEFAULT_OPERATORS[ast.Pow]),
+    # 比较和位运算的结果也是广播之后的数组
+    **{
+        node: _array_operator(array_op, DEFAULT_OPERATORS[node])
+        for node, array_op in (
+            (ast.Eq, operator.eq),
+            (ast.NotEq, operator.ne),
+            (ast.Lt, operator.lt),
+            (ast.LtE, operator.le),
+            (ast.Gt, operator.gt),
+            (ast.GtE, operator.ge),
+            (ast.BitAnd, operator.and_),
+            (ast.BitOr, operator.or_),
+            (ast.BitXor, operator.xor),
+            (ast.LShift, operator.lshift),
+            (ast.RShift, operator.rshift),
+        )
+    },
+    ast.MatMult: _matmul,
+}
+
+
+class _ArrayEvaluator(EvalWithCompoundTypes):
+    """
+    禁止访问属性， 数组的tofile之类的方法不能被调用
+    """
+
+    def _eval_attribute(self, node):
+        raise FeatureNotAvailable(
+            f"数组模式不能访问属性： {node.attr}， 请使用对应的函数， 比如transpose(x)"
+        )
+
+
+def to_json(value: Any) -> Any:
+    """
+    把计算结果转换成JSON可以表示的值， 很大的数组只保留前面一部分
+    :rtype: Any
+    """
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.size > MAX_OUTPUT_SIZE:
+            return {
+                "shape": list(value.shape),
+                "values": to_json(value.ravel()[:MAX_OUTPUT_SIZE].tolist()),
+                "truncated": True,
+            }
+        return to_json(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def evaluate_array(expr: str, variables: dict[str, Any] | None = None) -> Any:
+    """
+    计算数组表达式
+    :param expr: 表达式， 比如 "percentile(x, 90)" 或者 "linregress(arange(10), y)"
+    :type expr: str
+    :param variables: 表达式里使用的变量， 数字或者数字列表
+    :type variables: dict[str, Any] | None
+    :return: JSON可以表示的结果
+    :rtype: Any
+    """
+    names: dict[str, Any] = dict(ARRAY_NAMES)
+    for name, value in (variables or {}).items():
+        if not name.isidentifier() or name in ARRAY_FUNCTIONS:
+            raise ValueError(f"变量名不可用： {name}")
+        names[name] = value if isinstance(value, (int, float)) else _as_array(value)
+
+    evaluator = _ArrayEvaluator(
+        operators=_ARRAY_OPERATORS, functions=ARRAY_FUNCTIONS, names=names
+    )
+    # log(0)之类的结果是inf或者nan， 返回null， 不用输出警告
+    with np.errstate(all="ignore"):
+        return to_json(evaluator.eval(expr))
@@ -0,0 +1,47 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/context.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+# 定义会话级别的工具调用状态
+from typing_extensions import Any, Callable
+from threading import RLock
+
+
+class ToolContext:
+    """
+    一个会话的工具调用状态
+    主agent和每个子agent各自持有一个ToolContext， 执行工具的时候传给注册中心
+    注册中心本身不保存任何会话状态， 多个会话可以并行使用同一个注册中心
+    超时的工具线程可能还在运行， 并行的子agent也可能共享同一个上下文
+    所以计数器和状态的读写都要持有lock
+    """
+
+    def __init__(self, progress_callback: Callable[[str], None] | None = None):
+        """
+        初始化
+        :param progress_callback: 工具执行过程中的进度消息回调， 比如转发shell命令的实时输出
+        :type progress_callback: Callable[[str], None] | None
+        """
+        self.progress_callback = progress_callback
+        self.calls_since_todo = 0
+        self.last_tool_name = ""
+        self._states: dict[str, Any] = {}
+        # 可重入， 持有锁的时候还可以调用state()
+        self.lock = RLock()
+
+    def state(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        获取某个工具在当前会话中的私有状态， 不存在的时候用factory创建
+        :param key: 状态名称， 一般使用工具名称
+        :type key: str
+        :param factory: 创建状态的函数
+        :type factory: Callable[[], Any]
+        :return: 当前会话的状态对象
+        :rtype: Any
+        """
+        with self.lock:
+            if key not in self._states:
+                self._states[key] = factory()
+
+            return self._states[key]
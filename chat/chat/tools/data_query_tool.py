@@ -0,0 +1,127 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/data_query_tool.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+结构化数据查询
+对工作目录里的CSV、JSON Lines、Parquet执行过滤、分组、聚合， 只返回很小的结果表
+数据分块读取， 比内存大的文件也可以查询
+"""
+
+from typing import Any, Literal
+from pathlib import Path
+from pydantic import BaseModel, Field
+from tools import get_tool_registry
+from tools.result import Result
+from tools.shell_tool import SHELL_BOX_DIR
+from tools.table_query import run_query
+from tools.table_reader import TableFormat, detect_format
+
+registry = get_tool_registry()
+
+
+class Condition(BaseModel):
+    """
+    一个过滤条件
+    """
+
+    column: str = Field(description="列名")
+    op: Literal[
+        "==", "!=", ">", ">=", "<", "<=", "contains", "in", "is_null", "not_null"
+    ] = Field(
+        default="==", description="比较运算，contains不区分大小写，in的value是列表"
+    )
+    value: Any = Field(default=None, description="比较的值，is_null和not_null不需要")
+
+
+class Aggregate(BaseModel):
+    """
+    一个聚合
+    """
+
+    func: Literal["count", "sum", "mean", "min", "max"]
+    column: str | None = Field(
+        default=None, description="聚合的列，count不提供的时候统计行数"
+    )
+
+
+class DataQueryInput(BaseModel):
+    """
+    data_query工具的输入参数
+    """
+
+    file_path: str = Field(description="数据文件，相对于工作目录")
+    shell_work_directory: str = Field(
+        default="", description="工作目录，和execute_shell的shell_work_directory相同"
+    )
+    format: TableFormat = Field(
+        default="auto", description="文件格式，auto按后缀名判断"
+    )
+    select: list[str] = Field(
+        default_factory=list,
+        description="返回的列，没有聚合的时候有效，不提供返回全部列",
+    )
+    where: list[Condition] = Field(
+        default_factory=list, description="过滤条件，全部满足的行才参与计算"
+    )
+    group_by: list[str] = Field(default_factory=list, description="分组列")
+    aggregates: list[Aggregate] = Field(
+        default_factory=list,
+        description="聚合，结果列名是func_column或者count；有group_by但是没有聚合的时候统计每组行数",
+    )
+    order_by: str | None = Field(
+        default=None, description="排序的列，聚合查询可以使用聚合结果的列名"
+    )
+    descending: bool = Field(default=False, description="是否从大到小排序")
+    limit: int = Field(default=50, ge=1, le=1000, description="最多返回的行数")
+
+
+def _data_file(work_directory: str, file_path: str) -> Path:
+    """
+    解析数据文件， 必须在shell_box之内
+    :param work_directory: 工作目录名称
+    :type work_directory: str
+    :param file_path: 相对于工作目录的文件路径
+    :type file_path: str
+    :return: 文件的绝对路径
+    :rtype: Path
+    """
+    base = Path(SHELL_BOX_DIR).resolve()
+    path = base.joinpath(work_directory, file_path).resolve()
+    if not path.is_relative_to(base):
+        raise ValueError(
+            f"文件： {file_path} 不在 {base} 之内， 有路径逃逸的风险。任务被阻断"
+        )
+    if not path.is_file():
+        raise FileNotFoundError(f"文件不存在： {file_path}")
+
+    return path
+
+
+# 大文件需要扫描全部数据， 纯CPU计算放到工作进程里执行
+@registry.register(timeout=120.0, mode="process")
+def data_query(p: DataQueryInput) -> Result:
+    """
+    查询CSV、TSV、JSON Lines、Parquet数据文件：过滤、分组、聚合、排序，只返回结果表
+    比把整个文件read进上下文或者写pandas脚本更快更省，适合统计、筛选、找最大最小值
+    例： {"file_path": "sales.csv", "where": [{"column": "region", "op": "==", "value": "华东"}],
+          "group_by": ["month"], "aggregates": [{"func": "sum", "column": "amount"}],
+          "order_by": "sum_amount", "descending": true, "limit": 10}
+    """
+    try:
+        path = _data_file(p.shell_work_directory, p.file_path)
+        result = run_query(
+            path,
+            detect_format(path, p.format),
+            select=p.select,
+            where=[(c.column, c.op, c.value) for c in p.where],
+            group_by=p.group_by,
+            aggregates=[(a.func, a.column) for a in p.aggregates],
+            order_by=p.order_by,
+            descending=p.descending,
+            limit=p.limit,
+        )
+        return Result(result=result)
+    except Exception as e:
+        return Result(error=e, result={})
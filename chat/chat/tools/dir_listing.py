@@ -0,0 +1,151 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/dir_listing.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+分页列举目录
+使用os.scandir， 类型和属性优先使用目录项自带的缓存信息， 每次只在内存里保留一层目录
+配合游标分页， 很大的目录也只返回一页条目
+"""
+
+from typing_extensions import Iterator, Literal
+from itertools import islice
+from pathlib import Path
+import os
+from tools.file_search import glob_to_regex
+
+SortBy = Literal["name", "mtime", "size", "none"]
+
+
+def _entry_info(entry: os.DirEntry, relative: str) -> dict:
+    """
+    :param entry: 目录项
+    :type entry: os.DirEntry
+    :param relative: 相对于列举根目录的路径
+    :type relative: str
+    :return: 人类和LLM可读的条目信息
+    :rtype: dict
+    """
+    is_dir = entry.is_dir(follow_symlinks=False)
+    try:
+        stat = entry.stat(follow_symlinks=False)
+        size, modified = (None if is_dir else stat.st_size), stat.st_mtime
+    except OSError:
+        size, modified = None, None
+
+    return {
+        "name": entry.name,
+        "path": relative,
+        "type": "directory" if is_dir else "file",
+        "size": size,
+        "modified": modified,
+    }
+
+
+def _sort_key(sort_by: SortBy):
+    """
+    :return: 排序函数， 修改时间和大小从大到小
+    """
+
+    def stat_value(entry: os.DirEntry, attribute: str) -> float:
+        try:
+            return -getattr(entry.stat(follow_symlinks=False), attribute)
+        except OSError:
+            return 0
+
+    if sort_by == "mtime":
+        return lambda entry: stat_value(entry, "st_mtime")
+    if sort_by == "size":
+        return lambda entry: stat_value(entry, "st_size")
+    return lambda entry: entry.name
+
+
+def iter_entries(
+    root: Path,
+    depth: int = 1,
+    glob: str | None = None,
+    show_hidden: bool = False,
+    sort_by: SortBy = "name",
+) -> Iterator[dict]:
+    """
+    深度优先列举目录， 每层目录内部排序
+    :param root: 要列举的目录
+    :type root: Path
+    :param depth: 递归深度， 1只列举root本身
+    :type depth: int
+    :param glob: 只返回相对路径匹配的条目， 不包含/的通配符只匹配名称； 不匹配的目录仍然会进入
+    :type glob: str | None
+    :param show_hidden: 是否包含.开头的条目
+    :type show_hidden: bool
+    :param sort_by: 排序方式
+    :type sort_by: SortBy
+    :return: 条目信息
+    :rtype: Iterator[dict]
+    """
+    if not root.is_dir():
+        raise NotADirectoryError(f"不是目录： {root}")
+
+    glob_regex = glob_to_regex(glob) if glob else None
+    match_name = glob is not None and "/" not in glob
+
+    def walk(directory: str, prefix: str, level: int) -> Iterator[dict]:
+        try:
+            with os.scandir(directory) as it:
+                entries = [
+                    entry
+                    for entry in it
+                    if show_hidden or not entry.name.startswith(".")
+                ]
+        except (PermissionError, FileNotFoundError):
+            return
+
+        if sort_by != "none":
+            entries.sort(key=_sort_key(sort_by))
+
+        for entry in entries:
+            relative = prefix + entry.name
+            if glob_regex is None or glob_regex.match(
+                entry.name if match_name else relative
+            ):
+                yield _entry_info(entry, relative)
+
+            if level < depth and entry.is_dir(follow_symlinks=False):
+                yield from walk(entry.path, relative + "/", level + 1)
+
+    yield from walk(str(root), "", 1)
+
+
+def list_page(
+    root: Path,
+    cursor: int = 0,
+    limit: int = 200,
+    **options,
+) -> dict:
+    """
+    列举一页条目
+    :param root: 要列举的目录
+    :type root: Path
+    :param cursor: 跳过前面的条目数， 上一页返回的next_cursor
+    :type cursor: int
+    :param limit: 每页最多的条目数
+    :type limit: int
+    :param options: iter_entries的其它参数
+    :return: 条目列表和下一页的游标
+    :rtype: dict
+    """
+    page = list(islice(iter_entries(root, **options), cursor, cursor + limit + 1))
+    result: dict = {"items": page[:limit], "total": min(len(page), limit)}
+    if len(page) > limit:
+        result["next_cursor"] = cursor + limit
+
+    return result
+
+
+def count_children(directory: Path) -> int:
+    """
+    :return: 目录下直接包含的条目数量， 不创建条目对象
+    :rtype: int
+    """
+    with os.scandir(directory) as it:
+        return sum(1 for _ in it)
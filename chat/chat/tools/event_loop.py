@@ -0,0 +1,49 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/event_loop.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+# 所有async工具共用的事件循环
+# 事件循环运行在一个后台守护线程里， 任何线程都可以把协程提交过来
+import asyncio
+from threading import Lock, Thread
+
+
+class _EventLoopThread(Thread):
+    """
+    运行共享事件循环的后台线程
+    """
+
+    def __init__(self):
+        """
+        初始化
+        """
+        super().__init__(name="tool-event-loop", daemon=True)
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        """
+        一直运行事件循环， 直到进程结束
+        """
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+_loop_thread: _EventLoopThread | None = None
+_lock = Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    全局唯一获取共享事件循环， 首次调用的时候启动后台线程
+    :return: 共享事件循环
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop_thread
+    if _loop_thread is None:
+        with _lock:
+            if _loop_thread is None:
+                _loop_thread = _EventLoopThread()
+                _loop_thread.start()
+
+    return _loop_thread.loop
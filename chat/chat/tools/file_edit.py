@@ -0,0 +1,129 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/file_edit.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+批量查找替换
+所有替换都在原始内容上定位， 检查唯一性和重叠之后一次性生成新内容
+写入临时文件之后重命名， 中途失败不会留下写了一半的文件
+"""
+
+from pathlib import Path
+import difflib
+import os
+import shutil
+import tempfile
+
+# diff摘要的上限， 防止大范围修改占满上下文
+_DIFF_MAX_LINES = 80
+_DIFF_MAX_CHARS = 4000
+
+
+def apply_edits(
+    content: str, edits: list[tuple[str, str, bool]]
+) -> tuple[str, list[int]]:
+    """
+    在原始内容上应用一组替换
+    :param content: 原始内容
+    :type content: str
+    :param edits: (old_string, new_string, replace_all)列表
+    :type edits: list[tuple[str, str, bool]]
+    :return: 新内容和每一处替换的次数
+    :rtype: tuple[str, list[int]]
+    """
+    spans: list[tuple[int, int, str, int]] = []
+    counts: list[int] = []
+    errors: list[str] = []
+    for index, (old, new, replace_all) in enumerate(edits):
+        if not old:
+            errors.append(f"edits[{index}]: old_string不能为空")
+            counts.append(0)
+            continue
+
+        positions = []
+        start = content.find(old)
+        while start != -1:
+            positions.append(start)
+            start = content.find(old, start + len(old))
+
+        if not positions:
+            errors.append(f"edits[{index}]: 找不到old_string")
+        elif len(positions) > 1 and not replace_all:
+            errors.append(
+                f"edits[{index}]: old_string出现了{len(positions)}次， 提供更多上下文使它唯一， 或者设置replace_all"
+            )
+        counts.append(len(positions))
+        spans.extend(
+            (position, position + len(old), new, index) for position in positions
+        )
+
+    spans.sort()
+    for previous, current in zip(spans, spans[1:]):
+        if current[0] < previous[1]:
+            errors.append(f"edits[{previous[3]}]和edits[{current[3]}]的替换范围重叠")
+
+    if errors:
+        raise ValueError("没有写入任何修改： " + "； ".join(errors))
+
+    parts = []
+    cursor = 0
+    for start, end, new, _ in spans:
+        parts.append(content[cursor:start])
+        parts.append(new)
+        cursor = end
+    parts.append(content[cursor:])
+
+    return "".join(parts), counts
+
+
+def atomic_write(path: Path, data: bytes):
+    """
+    先写入同一目录下的临时文件， 再替换目标文件， 保留原来的权限
+    :param path: 目标文件
+    :type path: Path
+    :param data: 文件内容
+    :type data: bytes
+    """
+    fd, temp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            shutil.copymode(path, temp_name)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+def diff_summary(old: str, new: str, name: str) -> str:
+    """
+    :param old: 修改之前的内容
+    :type old: str
+    :param new: 修改之后的内容
+    :type new: str
+    :param name: diff里显示的文件名
+    :type name: str
+    :return: 截断之后的unified diff
+    :rtype: str
+    """
+    lines = list(
+        difflib.unified_diff(
+            old.splitlines(),
+            new.splitlines(),
+            fromfile=f"a/{name}",
+            tofile=f"b/{name}",
+            n=1,
+            lineterm="",
+        )
+    )
+    text = "\n".join(lines[:_DIFF_MAX_LINES])
+    if len(lines) > _DIFF_MAX_LINES or len(text) > _DIFF_MAX_CHARS:
+        text = text[:_DIFF_MAX_CHARS] + f"\n...[diff共{len(lines)}行， 已截断]..."
+
+    return text
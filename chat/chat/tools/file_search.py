@@ -0,0 +1,533 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/file_search.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+多文件搜索
+遍历目录的时候遵守.gitignore， 跳过二进制文件
+文件分成若干批交给工作进程并行搜索， 匹配数量达到上限之后不再提交新的批次
+UTF-8文件用mmap按字节搜索， 不需要把整个文件读入内存
+"""
+
+from typing_extensions import Any, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from pathlib import Path
+from re import _constants as sre_constants  # type: ignore[attr-defined]
+from re import _parser as sre_parse  # type: ignore[attr-defined]
+import mmap
+import os
+import re
+import time
+from tools.process_pool import get_process_pool
+from tools.shell_jobs import JOBS_DIR_NAME
+from util import detect_file_encoding
+
+# 这些目录总是跳过
+DEFAULT_IGNORED_DIRS = {
+    ".git",
+    ".hg",
+    ".svn",
+    "__pycache__",
+    "node_modules",
+    JOBS_DIR_NAME,
+}
+# 每一批最多的文件数量和字节数
+_BATCH_FILES = 64
+_BATCH_BYTES = 16 * 1024 * 1024
+# 同时在工作进程里运行的批次数量
+_PARALLEL_BATCHES = 2
+_GLOB_CHARS = set("*?[")
+
+
+def has_glob(pattern: str) -> bool:
+    """
+    :return: 路径里是否包含通配符
+    :rtype: bool
+    """
+    return any(char in _GLOB_CHARS for char in pattern)
+
+
+def glob_to_regex(pattern: str) -> re.Pattern:
+    """
+    把gitignore风格的通配符转换成正则表达式， 路径分隔符统一为/
+    *和?不匹配/， **匹配任意层目录
+    :param pattern: 通配符
+    :type pattern: str
+    :return: 完整匹配相对路径的正则表达式
+    :rtype: re.Pattern
+    """
+    i, parts = 0, []
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[" and (end := pattern.find("]", i + 1)) != -1:
+            body = pattern[i + 1 : end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append(f"[{body}]")
+            i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+
+    return re.compile("".join(parts) + r"\Z")
+
+
+@dataclass
+class _IgnoreRule:
+    """
+    .gitignore里的一条规则
+    """
+
+    base: str  # 规则所在目录相对于搜索根目录的路径， 根目录是空字符串
+    regex: re.Pattern
+    negate: bool
+    dir_only: bool
+    anchored: bool  # 包含/的规则相对于base匹配， 否则匹配任意一层的名称
+
+
+class IgnoreRules:
+    """
+    简化的.gitignore规则： 支持注释、!取反、/结尾只匹配目录、/开头或者中间有/的规则相对于所在目录
+    后面的规则覆盖前面的规则
+    """
+
+    def __init__(self):
+        """
+        初始化
+        """
+        self._rules: list[_IgnoreRule] = []
+
+    def load(self, directory: Path, base: str):
+        """
+        读取目录下的.gitignore
+        :param directory: 目录
+        :type directory: Path
+        :param base: 目录相对于搜索根目录的路径
+        :type base: str
+        """
+        try:
+            text = (directory / ".gitignore").read_text(
+                encoding="utf-8", errors="replace"
+            )
+        except OSError:
+            return
+
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            negate = line.startswith("!")
+            line = line.removeprefix("!")
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if line:
+                self._rules.append(
+                    _IgnoreRule(base, glob_to_regex(line), negate, dir_only, anchored)
+                )
+
+    def is_ignored(self, relative: str, is_dir: bool) -> bool:
+        """
+        :param relative: 相对于搜索根目录的路径， 分隔符是/
+        :type relative: str
+        :param is_dir: 是否是目录
+        :type is_dir: bool
+        :return: 是否被忽略
+        :rtype: bool
+        """
+        ignored = False
+        for rule in self._rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.base:
+                if not relative.startswith(rule.base + "/"):
+                    continue
+                path = relative[len(rule.base) + 1 :]
+            else:
+                path = relative
+            target = path if rule.anchored else path.rsplit("/", 1)[-1]
+            if rule.regex.match(target):
+                ignored = not rule.negate
+
+        return ignored
+
+
+def iter_files(root: Path, glob: str | None = None) -> Iterator[Path]:
+    """
+    递归遍历目录下的文件， 遵守.gitignore
+    :param root: 搜索根目录
+    :type root: Path
+    :param glob: 只返回相对路径匹配这个通配符的文件， 不包含/的通配符只匹配文件名
+    :type glob: str | None
+    :return: 文件路径
+    :rtype: Iterator[Path]
+    """
+    rules = IgnoreRules()
+    glob_regex = glob_to_regex(glob) if glob else None
+    match_name = glob is not None and "/" not in glob
+    for dirpath, dirnames, filenames in os.walk(root):
+        current = Path(dirpath)
+        base = current.relative_to(root).as_posix()
+        base = "" if base == "." else base
+        rules.load(current, base)
+        prefix = f"{base}/" if base else ""
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if name not in DEFAULT_IGNORED_DIRS
+            and not rules.is_ignored(prefix + name, is_dir=True)
+        )
+        for name in sorted(filenames):
+            rel = prefix + name
+            if rules.is_ignored(rel, is_dir=False):
+                continue
+            if glob_regex and not glob_regex.match(name if match_name else rel):
+                continue
+            yield current / name
+
+
+def _collect_matches(
+    buf: Any,
+    regex: re.Pattern,
+    newline: Any,
+    decode: Callable[[Any], str],
+    context_lines: int,
+    limit: int,
+) -> list[dict]:
+    """
+    在一个文件的内容里逐行查找匹配， 每一行最多报告一次
+    buf可以是mmap（按字节）或者str， 只在匹配的位置解码
+    """
+    matches: list[dict] = []
+    size = len(buf)
+    line_number, counted_to, position = 1, 0, 0
+    while len(matches) < limit and position <= size:
+        found = regex.search(buf, position)
+        if found is None:
+            break
+
+        line_start = buf.rfind(newline, 0, found.start()) + 1
+        line_end = buf.find(newline, found.start())
+        line_end = size if line_end == -1 else line_end
+        line_number += buf[counted_to:line_start].count(newline)
+        counted_to = line_start
+
+        context_start = line_start
+        for _ in range(context_lines):
+            if context_start == 0:
+                break
+            context_start = buf.rfind(newline, 0, context_start - 1) + 1
+        context_end = line_end
+        for _ in range(context_lines):
+            if context_end >= size:
+                break
+            following = buf.find(newline, context_end + 1)
+            context_end = size if following == -1 else following
+
+        matches.append(
+            {
+                "line_number": line_number,
+                "content": decode(buf[line_start:line_end]).rstrip("\r"),
+                "context": {
+                    "start_line": line_number
+                    - buf[context_start:line_start].count(newline),
+                    "lines": decode(buf[context_start:context_end]).splitlines(),
+                },
+            }
+        )
+        position = line_end + 1
+
+    return matches
+
+
+# 忽略大小写的时候这几个ASCII字母还能匹配非ASCII字符（ı、İ、ſ、K）， 按字节搜索会漏掉
+_NON_ASCII_FOLDS = frozenset("iksIKS")
+_BYTE_SAFE_AT = {
+    sre_constants.AT_BEGINNING,
+    sre_constants.AT_BEGINNING_LINE,
+    sre_constants.AT_BEGINNING_STRING,
+    sre_constants.AT_END,
+    sre_constants.AT_END_LINE,
+    sre_constants.AT_END_STRING,
+}
+_REPEATS = {
+    sre_constants.MAX_REPEAT,
+    sre_constants.MIN_REPEAT,
+    getattr(sre_constants, "POSSESSIVE_REPEAT", sre_constants.MAX_REPEAT),
+}
+
+
+def _byte_safe_char(code: int) -> bool:
+    return code < 128 and chr(code) not in _NON_ASCII_FOLDS
+
+
+def _byte_safe(items) -> bool:
+    """
+    判断解析之后的正则表达式按UTF-8字节匹配和按字符匹配的结果是否一致
+    .、\\w、\\d、\\s、\\b、取反的字符集都按字节匹配， 遇到多字节字符的时候结果不同
+    """
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            if not _byte_safe_char(av):
+                return False
+        elif op is sre_constants.IN:
+            for item_op, item_av in av:
+                if item_op is sre_constants.LITERAL:
+                    if not _byte_safe_char(item_av):
+                        return False
+                elif item_op is sre_constants.RANGE:
+                    low, high = item_av
+                    if high >= 128 or any(
+                        low <= ord(char) <= high for char in _NON_ASCII_FOLDS
+                    ):
+                        return False
+                else:
+                    return False
+        elif op in _REPEATS:
+            if not _byte_safe(av[2]):
+                return False
+        elif op is sre_constants.SUBPATTERN:
+            if not _byte_safe(av[-1]):
+                return False
+        elif op is sre_constants.BRANCH:
+            if not all(_byte_safe(branch) for branch in av[1]):
+                return False
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if not _byte_safe(av[1]):
+                return False
+        elif op is sre_constants.AT:
+            if av not in _BYTE_SAFE_AT:
+                return False
+        elif op is not sre_constants.GROUPREF:
+            return False
+
+    return True
+
+
+def _byte_regex(pattern: str, flags: int) -> re.Pattern | None:
+    """
+    :return: 结果和字符串正则表达式完全一致的时候返回字节正则表达式， 否则返回None
+    :rtype: re.Pattern | None
+    """
+    try:
+        if not _byte_safe(sre_parse.parse(pattern, flags)):
+            return None
+        return re.compile(pattern.encode("ascii"), flags)
+    except (re.error, UnicodeEncodeError):
+        return None
+
+
+def _search_one(
+    path: str,
+    byte_regex: re.Pattern | None,
+    text_regex: re.Pattern,
+    context_lines: int,
+    limit: int,
+) -> list[dict] | None:
+    """
+    搜索一个文件
+    :return: 匹配列表， 二进制文件返回None
+    :rtype: list[dict] | None
+    """
+    if os.path.getsize(path) == 0:
+        return []
+
+    try:
+        encoding = detect_file_encoding(path)
+    except ValueError:
+        return None
+
+    if byte_regex is not None and encoding in ("utf-8", "ascii"):
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        ):
+            return _collect_matches(
+                mm,
+                byte_regex,
+                b"\n",
+                lambda data: data.decode("utf-8", errors="replace"),
+                context_lines,
+                limit,
+            )
+
+    with open(path, encoding=encoding, errors="replace", newline="") as text_file:
+        text = text_file.read()
+    return _collect_matches(text, text_regex, "\n", str, context_lines, limit)
+
+
+def search_files(
+    paths: list[str],
+    root: str,
+    pattern: str,
+    context_lines: int,
+    max_matches: int,
+) -> dict:
+    """
+    在工作进程里搜索一批文件， 病态的正则表达式超时之后直接结束进程
+    :param paths: 文件路径列表
+    :type paths: list[str]
+    :param root: 搜索根目录， 结果里的路径相对于这个目录
+    :type root: str
+    :param pattern: 正则表达式， 忽略大小写
+    :type pattern: str
+    :param context_lines: 匹配行前后显示的行数
+    :type context_lines: int
+    :param max_matches: 这一批最多的匹配数量
+    :type max_matches: int
+    :return: 匹配列表和跳过的二进制文件
+    :rtype: dict
+    """
+    flags = re.IGNORECASE | re.MULTILINE
+    text_regex = re.compile(pattern, flags)
+    # 按字节直接搜索UTF-8文件的mmap， 不用解码； 结果可能不同的表达式解码之后按字符串搜索
+    byte_regex = _byte_regex(pattern, flags)
+
+    matches: list[dict] = []
+    skipped: list[str] = []
+    for path in paths:
+        relative = Path(path).relative_to(root).as_posix() if root else path
+        found = _search_one(
+            path, byte_regex, text_regex, context_lines, max_matches - len(matches)
+        )
+        if found is None:
+            skipped.append(relative)
+            continue
+
+        matches.extend({"file_path": relative, **match} for match in found)
+        if len(matches) >= max_matches:
+            break
+
+    return {"matches": matches, "skipped": skipped}
+
+
+def _batches(files: Iterator[Path]) -> Iterator[list[str]]:
+    """
+    按文件数量和大小把文件分成若干批
+    """
+    batch: list[str] = []
+    batch_bytes = 0
+    for file in files:
+        try:
+            size = file.stat().st_size
+        except OSError:
+            continue
+        batch.append(str(file))
+        batch_bytes += size
+        if len(batch) >= _BATCH_FILES or batch_bytes >= _BATCH_BYTES:
+            yield batch
+            batch, batch_bytes = [], 0
+
+    if batch:
+        yield batch
+
+
+def parallel_search(
+    files: Iterator[Path],
+    root: Path,
+    pattern: str,
+    context_lines: int,
+    max_matches: int,
+    timeout: float,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> dict:
+    """
+    把文件分批交给工作进程并行搜索， 结果按照文件遍历顺序排列
+    :param files: 要搜索的文件
+    :type files: Iterator[Path]
+    :param root: 搜索根目录
+    :type root: Path
+    :param pattern: 正则表达式
+    :type pattern: str
+    :param context_lines: 匹配行前后显示的行数
+    :type context_lines: int
+    :param max_matches: 最多的匹配数量， 达到之后停止搜索
+    :type max_matches: int
+    :param timeout: 整个搜索的期限（秒）
+    :type timeout: float
+    :param is_cancelled: 检查工具调用是否已经被取消
+    :type is_cancelled: Callable[[], bool] | None
+    :return: 匹配列表、搜索的文件数量、跳过的文件、是否提前结束
+    :rtype: dict
+    """
+    deadline = time.monotonic() + timeout
+    pool = get_process_pool()
+    batches = _batches(files)
+    results: dict[int, dict] = {}
+    running: dict[Future, int] = {}
+    submitted = 0
+    files_searched = 0
+    total = 0
+    truncated = False
+
+    def submit(executor: ThreadPoolExecutor) -> bool:
+        nonlocal submitted, files_searched
+        batch = next(batches, None)
+        if batch is None:
+            return False
+        files_searched += len(batch)
+        future = executor.submit(
+            pool.run,
+            search_files,
+            batch,
+            str(root),
+            pattern,
+            context_lines,
+            max_matches,
+            timeout=max(0.1, deadline - time.monotonic()),
+        )
+        running[future] = submitted
+        submitted += 1
+        return True
+
+    with ThreadPoolExecutor(
+        max_workers=_PARALLEL_BATCHES, thread_name_prefix="file-search"
+    ) as executor:
+        while len(running) < _PARALLEL_BATCHES and submit(executor):
+            pass
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                results[index] = future.result()
+                total += len(results[index]["matches"])
+
+            if total >= max_matches or (is_cancelled and is_cancelled()):
+                truncated = True
+                continue
+
+            while len(running) < _PARALLEL_BATCHES and submit(executor):
+                pass
+
+    if next(batches, None) is not None:
+        truncated = True
+
+    matches: list[dict] = []
+    skipped: list[str] = []
+    for index in sorted(results):
+        matches.extend(results[index]["matches"])
+        skipped.extend(results[index]["skipped"])
+
+    return {
+        "matches": matches[:max_matches],
+        "files_searched": files_searched,
+        "skipped_binary_files": skipped,
+        "truncated": truncated or len(matches) > max_matches,
+    }
@@ -0,0 +1,41 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/http_client.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+async工具共用的HTTP客户端
+连接池在多次工具调用之间复用， 同一个主机不用重复建立TCP和TLS连接
+只能在共享事件循环上使用， async工具都运行在这个事件循环上
+"""
+
+from threading import Lock
+import httpx
+
+DEFAULT_HEADERS = {
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36 Edg/144.0.0.0"
+}
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+_LIMITS = httpx.Limits(
+    max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0
+)
+
+_client_instance: httpx.AsyncClient | None = None
+_instance_lock = Lock()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    全局唯一获取单例
+    :return: 单例
+    :rtype: httpx.AsyncClient
+    """
+    global _client_instance
+    if _client_instance is None:
+        with _instance_lock:
+            if _client_instance is None:
+                _client_instance = httpx.AsyncClient(
+                    headers=DEFAULT_HEADERS, timeout=DEFAULT_TIMEOUT, limits=_LIMITS
+                )
+
+    return _client_instance
@@ -0,0 +1,367 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/kernel_pool.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+常驻的Python内核
+每个工作目录一个内核进程， 导入的模块和定义的变量在多次调用之间保留
+总是预先启动一个空闲内核， 新的工作目录不需要等待解释器启动
+超时先发送中断信号保留状态， 没有响应再结束进程
+"""
+
+from typing_extensions import Callable
+from pathlib import Path
+from queue import Queue, Empty
+from threading import Lock, Thread
+from uuid import uuid4
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from tools.shell_process import (
+    OUTPUT_ENCODING,
+    OutputBuffer,
+    kill_process_tree,
+    process_group_kwargs,
+)
+
+KERNEL_SCRIPT = Path(__file__).with_name("python_kernel.py")
+DEFAULT_IDLE_TIMEOUT = 1800.0
+DEFAULT_MEMORY_LIMIT_MB = 2048
+# 中断之后等待内核返回的时间（秒）
+_INTERRUPT_GRACE = 3.0
+_REAP_INTERVAL = 30.0
+
+
+class PythonKernel:
+    """
+    一个内核进程， 同一时间只能执行一段代码
+    """
+
+    def __init__(self, memory_limit_mb: int, max_output_chars: int):
+        """
+        启动内核进程
+        :param memory_limit_mb: 内存上限（MB）， 只在POSIX平台生效
+        :type memory_limit_mb: int
+        :param max_output_chars: stdout、stderr、返回值各自最多保留的字符数
+        :type max_output_chars: int
+        """
+        self.cwd: str | None = None
+        self.last_used = time.monotonic()
+        self._lock = Lock()
+        self._token = f"__PYTHON_KERNEL_{uuid4().hex}__".encode("ascii")
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-u",
+                str(KERNEL_SCRIPT),
+                self._token.decode("ascii"),
+                str(memory_limit_mb),
+                str(max_output_chars),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+            **process_group_kwargs(),
+        )
+        self._lines: Queue[bytes | None] = Queue()
+        self._reader = Thread(
+            target=self._read_output, name="python-kernel", daemon=True
+        )
+        self._reader.start()
+
+    def _read_output(self):
+        """
+        按行读取内核输出， None表示内核已经结束
+        """
+        if self._process.stdout is not None:
+            try:
+                for line in self._process.stdout:
+                    self._lines.put(line)
+            except (OSError, ValueError):
+                pass
+        self._lines.put(None)
+
+    def is_alive(self) -> bool:
+        """
+        :return: 内核进程是否还在运行
+        :rtype: bool
+        """
+        return self._process.poll() is None
+
+    def is_busy(self) -> bool:
+        """
+        :return: 是否正在执行代码
+        :rtype: bool
+        """
+        return self._lock.locked()
+
+    def close(self):
+        """
+        结束内核进程
+        """
+        kill_process_tree(self._process)
+
+    def _interrupt(self) -> bool:
+        """
+        发送中断信号， 用户代码收到KeyboardInterrupt
+        :return: 是否发送成功， Windows上不支持
+        :rtype: bool
+        """
+        if platform.system() == "Windows" or not self.is_alive():
+            return False
+
+        try:
+            os.kill(self._process.pid, signal.SIGINT)
+            return True
+        except OSError:
+            return False
+
+    def request(
+        self,
+        payload: dict,
+        timeout: float,
+        max_output_chars: int = 64 * 1024,
+        is_cancelled: Callable[[], bool] | None = None,
+    ) -> dict:
+        """
+        发送一个请求并等待结果
+        :param payload: 请求内容， {"code": 代码}或者{"chdir": 目录}
+        :type payload: dict
+        :param timeout: 超时（秒）
+        :type timeout: float
+        :param max_output_chars: 协议之外的输出最多保留的字节数
+        :type max_output_chars: int
+        :param is_cancelled: 检查工具调用是否已经被取消
+        :type is_cancelled: Callable[[], bool] | None
+        :return: 内核的响应， 额外包含timed_out、kernel_restarted、extra_output
+        :rtype: dict
+        """
+        with self._lock:
+            self.last_used = time.monotonic()
+            if self._process.stdin is None:
+                raise RuntimeError("内核没有标准输入")
+
+            try:
+                self._process.stdin.write(
+                    (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+                )
+                self._process.stdin.flush()
+            except OSError:
+                return {"kernel_restarted": True, "exception": "内核进程已经结束"}
+
+            extra = OutputBuffer(max_output_chars)
+            deadline = time.monotonic() + timeout
+            interrupted_at: float | None = None
+            while True:
+                now = time.monotonic()
+                if interrupted_at is None and (
+                    now >= deadline or (is_cancelled and is_cancelled())
+                ):
+                    interrupted_at = now
+                    if not self._interrupt():
+                        self.close()
+                elif (
+                    interrupted_at is not None
+                    and now - interrupted_at >= _INTERRUPT_GRACE
+                ):
+                    # 中断没有效果， 比如卡在C扩展里， 只能结束进程
+                    self.close()
+                    return {
+                        "timed_out": True,
+                        "kernel_restarted": True,
+                        "extra_output": extra.text(OUTPUT_ENCODING),
+                    }
+
+                try:
+                    line = self._lines.get(timeout=0.2)
+                except Empty:
+                    continue
+
+                if line is None:
+                    return {
+                        "timed_out": interrupted_at is not None,
+                        "kernel_restarted": True,
+                        "exception": "内核进程意外退出， 可能超出了内存限制",
+                        "extra_output": extra.text(OUTPUT_ENCODING),
+                    }
+
+                if not line.startswith(self._token):
+                    extra.write(line)
+                    continue
+
+                self.last_used = time.monotonic()
+                response = json.loads(line[len(self._token) :].decode("utf-8"))
+                response["timed_out"] = interrupted_at is not None
+                if extra.total_bytes:
+                    response["extra_output"] = extra.text(OUTPUT_ENCODING)
+                return response
+
+
+class KernelPool:
+    """
+    按工作目录管理常驻内核
+    """
+
+    def __init__(
+        self,
+        max_kernels: int = 4,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+        max_output_chars: int = 64 * 1024,
+    ):
+        """
+        初始化， 第一次使用的时候才启动内核
+        :param max_kernels: 同时存在的内核数量上限， 超出之后关闭最久没有使用的空闲内核
+        :type max_kernels: int
+        :param idle_timeout: 空闲超时（秒）
+        :type idle_timeout: float
+        :param memory_limit_mb: 每个内核的内存上限（MB）
+        :type memory_limit_mb: int
+        :param max_output_chars: stdout、stderr、返回值各自最多保留的字符数
+        :type max_output_chars: int
+        """
+        self._max_kernels = max_kernels
+        self._idle_timeout = idle_timeout
+        self._memory_limit_mb = memory_limit_mb
+        self.max_output_chars = max_output_chars
+        self._kernels: dict[str, PythonKernel] = {}
+        self._spare: PythonKernel | None = None
+        self._lock = Lock()
+        self._reaper: Thread | None = None
+
+    def _new_kernel(self) -> PythonKernel:
+        """
+        :return: 新启动的内核
+        :rtype: PythonKernel
+        """
+        return PythonKernel(self._memory_limit_mb, self.max_output_chars)
+
+    def _refill_spare(self):
+        """
+        在后台预先启动一个空闲内核
+        """
+
+        def start():
+            kernel = self._new_kernel()
+            with self._lock:
+                if self._spare is None:
+                    self._spare = kernel
+                    return
+            kernel.close()
+
+        Thread(target=start, name="python-kernel-spare", daemon=True).start()
+
+    def get(self, cwd: str) -> PythonKernel:
+        """
+        获取工作目录对应的内核， 不存在或者已经结束的时候使用预先启动的内核
+        :param cwd: 工作目录
+        :type cwd: str
+        :return: 常驻内核
+        :rtype: PythonKernel
+        """
+        with self._lock:
+            kernel = self._kernels.get(cwd)
+            if kernel is not None and kernel.is_alive():
+                # 在锁里更新使用时间， 刚取出的内核不会在request之前被当作空闲内核关闭
+                kernel.last_used = time.monotonic()
+                return kernel
+
+            kernel, self._spare = self._spare, None
+            if kernel is None or not kernel.is_alive():
+                kernel = self._new_kernel()
+            # 预先启动的内核的使用时间是启动时间， 分配之后按刚使用过计算
+            kernel.last_used = time.monotonic()
+            self._kernels[cwd] = kernel
+            evicted = self._evict(keep=cwd)
+
+            if self._reaper is None:
+                self._reaper = Thread(
+                    target=self._reap_forever, name="python-kernel-reaper", daemon=True
+                )
+                self._reaper.start()
+
+        for old in evicted:
+            old.close()
+        self._refill_spare()
+        kernel.request({"chdir": cwd}, timeout=30.0)
+        kernel.cwd = cwd
+        return kernel
+
+    def _evict(self, keep: str) -> list[PythonKernel]:
+        """
+        超出数量上限的时候移除最久没有使用的空闲内核， 调用者持有锁
+        :param keep: 刚分配内核的工作目录， 不会被移除
+        :type keep: str
+        """
+        idle = sorted(
+            (
+                (kernel.last_used, cwd)
+                for cwd, kernel in self._kernels.items()
+                if cwd != keep and not kernel.is_busy()
+            )
+        )
+        evicted = []
+        while len(self._kernels) > self._max_kernels and idle:
+            _, cwd = idle.pop(0)
+            evicted.append(self._kernels.pop(cwd))
+
+        return evicted
+
+    def reset(self, cwd: str):
+        """
+        关闭工作目录对应的内核， 下一次使用的时候从空白状态开始
+        :param cwd: 工作目录
+        :type cwd: str
+        """
+        with self._lock:
+            kernel = self._kernels.pop(cwd, None)
+
+        if kernel is not None:
+            kernel.close()
+
+    def _reap_forever(self):
+        """
+        定期关闭空闲超时或者已经结束的内核
+        """
+        while True:
+            time.sleep(_REAP_INTERVAL)
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    cwd
+                    for cwd, kernel in self._kernels.items()
+                    if not kernel.is_alive()
+                    or (
+                        not kernel.is_busy()
+                        and now - kernel.last_used > self._idle_timeout
+                    )
+                ]
+                kernels = [self._kernels.pop(cwd) for cwd in expired]
+
+            for kernel in kernels:
+                kernel.close()
+
+
+_pool_instance: KernelPool | None = None
+_instance_lock = Lock()
+
+
+def get_kernel_pool() -> KernelPool:
+    """
+    全局唯一获取单例
+    :return: 单例
+    :rtype: KernelPool
+    """
+    global _pool_instance
+    if _pool_instance is None:
+        with _instance_lock:
+            if _pool_instance is None:
+                _pool_instance = KernelPool()
+
+    return _pool_instance
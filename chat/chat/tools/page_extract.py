@@ -0,0 +1,168 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/page_extract.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+从HTML里提取正文
+使用标准库的html.parser， 跳过脚本、样式、导航、页眉页脚等内容
+页面有<main>或者<article>而且里面的文字足够多的时候只返回这一部分， 否则返回整个<body>的文字
+"""
+
+from html.parser import HTMLParser
+import re
+
+# 这些标签里的内容不是正文
+_SKIP_TAGS = {
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "canvas",
+    "iframe",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+    "form",
+    "button",
+    "select",
+}
+# 这些标签前后换行
+_BLOCK_TAGS = {
+    "p",
+    "div",
+    "section",
+    "article",
+    "main",
+    "br",
+    "hr",
+    "li",
+    "tr",
+    "table",
+    "ul",
+    "ol",
+    "dl",
+    "dt",
+    "dd",
+    "pre",
+    "blockquote",
+    "figcaption",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+}
+_VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "source", "wbr"}
+# <main>或者<article>里至少有这么多字符才认为是正文
+_MIN_MAIN_CHARS = 200
+_SPACES = re.compile(r"[ \t\r\f\v\u00a0\u3000]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+class _TextExtractor(HTMLParser):
+    """
+    把HTML转换成带简单标记的纯文本， 同时记录<main>和<article>里的部分
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self._in_title = False
+        # 正在跳过的标签， 只有同名的结束标签才出栈， 隐式关闭的<p>、<li>等不影响
+        self._skip_stack: list[str] = []
+        self._pre_depth = 0
+        # 所有文字， 以及<main>、<article>里的文字
+        self._parts: dict[str, list[str]] = {"body": [], "main": [], "article": []}
+        self._open: dict[str, int] = {"main": 0, "article": 0}
+
+    def _emit(self, text: str):
+        self._parts["body"].append(text)
+        for name, depth in self._open.items():
+            if depth:
+                self._parts[name].append(text)
+
+    def handle_starttag(self, tag: str, attrs):
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag in _SKIP_TAGS and tag not in _VOID_TAGS:
+            self._skip_stack.append(tag)
+            return
+        if self._skip_stack:
+            return
+
+        if tag in self._open:
+            self._open[tag] += 1
+        if tag == "pre":
+            self._pre_depth += 1
+        if tag in _BLOCK_TAGS:
+            self._emit("\n")
+        if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            self._emit("#" * int(tag[1]) + " ")
+        elif tag == "li":
+            self._emit("- ")
+
+    def handle_endtag(self, tag: str):
+        if tag == "title":
+            self._in_title = False
+            return
+        if self._skip_stack:
+            if tag in self._skip_stack:
+                # 缺少结束标签的内层跳过标签一起出栈
+                while self._skip_stack.pop() != tag:
+                    pass
+            return
+
+        if tag in _BLOCK_TAGS:
+            self._emit("\n")
+        if tag == "pre":
+            self._pre_depth = max(0, self._pre_depth - 1)
+        if tag in self._open:
+            self._open[tag] = max(0, self._open[tag] - 1)
+
+    def handle_startendtag(self, tag: str, attrs):
+        if not self._skip_stack and tag in _BLOCK_TAGS:
+            self._emit("\n")
+
+    def handle_data(self, data: str):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_stack:
+            return
+
+        self._emit(data if self._pre_depth else _SPACES.sub(" ", data))
+
+    def text(self, name: str) -> str:
+        """
+        :return: 整理之后的文字， 去掉每行首尾空白和多余的空行
+        :rtype: str
+        """
+        raw = "".join(self._parts[name])
+        lines = [line.strip() for line in raw.split("\n")]
+        return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def extract_main_text(html: str) -> tuple[str, str]:
+    """
+    提取网页的标题和正文
+    :param html: 网页源代码
+    :type html: str
+    :return: 标题和正文
+    :rtype: tuple[str, str]
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+
+    title = _SPACES.sub(" ", parser.title).strip()
+    for name in ("main", "article"):
+        text = parser.text(name)
+        if len(text) >= _MIN_MAIN_CHARS:
+            return title, text
+
+    return title, parser.text("body")
@@ -0,0 +1,310 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/process_pool.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+预热的工作进程池
+CPU密集或者不可信的计算放到独立进程里执行， 不占用聊天线程的GIL
+超过期限直接杀死工作进程并且补充一个新的进程， 不会拖垮整个服务
+POSIX平台额外限制每个工作进程的内存和CPU时间， Windows只能依靠超时强制结束
+"""
+
+from typing_extensions import Any, Callable
+from multiprocessing.connection import Connection
+from queue import Queue, Empty
+from threading import Lock
+import importlib
+import inspect
+import multiprocessing
+import time
+from tools.result import Result
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块
+    resource = None  # type: ignore[assignment]
+
+
+def _apply_memory_limit(memory_limit_mb: int):
+    """
+    限制工作进程的地址空间， 超出之后分配内存抛出MemoryError
+    :param memory_limit_mb: 内存上限（MB）
+    :type memory_limit_mb: int
+    """
+    if resource is None:
+        return
+
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _apply_cpu_budget(cpu_seconds: float):
+    """
+    工作进程会重复使用， RLIMIT_CPU统计的是累计CPU时间
+    所以每个任务开始之前把上限设置为已用时间加上本次预算， 超出之后进程收到SIGXCPU被结束
+    :param cpu_seconds: 本次任务的CPU时间预算（秒）
+    :type cpu_seconds: float
+    """
+    if resource is None:
+        return
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn: Connection, memory_limit_mb: int):
+    """
+    工作进程主循环： 接收(函数, 参数, CPU预算)， 返回(是否成功, 结果或错误信息)
+    函数必须是可以按名称pickle的模块级函数
+    """
+    _apply_memory_limit(memory_limit_mb)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+
+        if task is None:
+            break
+
+        fun, args, kwargs, cpu_seconds = task
+        _apply_cpu_budget(cpu_seconds)
+        try:
+            conn.send((True, fun(*args, **kwargs)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+def call_tool(module_name: str, fun_name: str, arguments: dict) -> dict:
+    """
+    在工作进程里执行一个工具函数
+    参数和返回值都经过序列化在进程之间传递
+    :param module_name: 工具所在的模块
+    :type module_name: str
+    :param fun_name: 工具函数名称
+    :type fun_name: str
+    :param arguments: 工具输入模型model_dump之后的数据
+    :type arguments: dict
+    :return: Result.to_dict的结果
+    :rtype: dict
+    """
+    fun = getattr(importlib.import_module(module_name), fun_name)
+    input_model = next(iter(inspect.signature(fun).parameters.values())).annotation
+    return fun(input_model.model_validate(arguments)).to_dict()
+
+
+class _Worker:
+    """
+    一个工作进程和父进程这一端的管道
+    """
+
+    def __init__(self, ctx: Any, memory_limit_mb: int):
+        """
+        启动工作进程
+        """
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb),
+            name="tool-worker",
+            daemon=True,
+        )
+        try:
+            self.process.start()
+        except BaseException:
+            self.conn.close()
+            raise
+        finally:
+            child_conn.close()
+
+    def kill(self):
+        """
+        强制结束工作进程
+        """
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ProcessPool:
+    """
+    固定大小的预热工作进程池
+    """
+
+    def __init__(self, size: int = 2, memory_limit_mb: int = 1024):
+        """
+        初始化， 工作进程在第一次使用的时候才启动
+        :param size: 工作进程数量
+        :type size: int
+        :param memory_limit_mb: 每个工作进程的内存上限（MB）， 只在POSIX平台生效
+        :type memory_limit_mb: int
+        """
+        # spawn在所有平台上行为一致， 而且避免fork多线程进程带来的死锁
+        self._ctx = multiprocessing.get_context("spawn")
+        self._size = size
+        self._memory_limit_mb = memory_limit_mb
+        self._idle: Queue[_Worker] = Queue()
+        # 已经启动而且没有结束的工作进程数量， 包括正在执行任务的
+        self._alive = 0
+        self._started = False
+        self._lock = Lock()
+
+    def _spawn(self) -> _Worker:
+        """
+        启动一个工作进程， 启动失败的时候释放占用的名额
+        调用之前需要先把_alive加一
+        """
+        try:
+            return _Worker(self._ctx, self._memory_limit_mb)
+        except Exception:
+            with self._lock:
+                self._alive -= 1
+            raise
+
+    def _ensure_started(self):
+        """
+        启动全部工作进程
+        """
+        if self._started:
+            return
+
+        with self._lock:
+            if self._started:
+                return
+            missing = self._size - self._alive
+            self._alive += missing
+            self._started = True
+
+        for started in range(missing):
+            try:
+                self._idle.put(self._spawn())
+            except Exception:
+                # 启动失败的进程在之后的调用里补充
+                with self._lock:
+                    self._alive -= missing - started - 1
+                break
+
+    def _acquire(self, timeout: float) -> _Worker:
+        """
+        取出一个空闲的工作进程， 之前启动失败而缺少的进程在这里补充
+        """
+        with self._lock:
+            spawn = self._idle.empty() and self._alive < self._size
+            if spawn:
+                self._alive += 1
+        if spawn:
+            try:
+                return self._spawn()
+            except Exception as e:
+                raise RuntimeError(f"无法启动工作进程： {e}") from e
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except Empty:
+            raise TimeoutError(f"等待空闲工作进程超过{timeout}秒")
+
+    def _replace(self, worker: _Worker):
+        """
+        杀死出错的工作进程， 只把启动成功的新进程放回队列
+        启动失败的时候进程池暂时变小， 之后的调用再补充
+        """
+        worker.kill()
+        try:
+            self._idle.put(_Worker(self._ctx, self._memory_limit_mb))
+        except Exception:
+            with self._lock:
+                self._alive -= 1
+
+    def run(
+        self,
+        fun: Callable,
+        *args: Any,
+        timeout: float,
+        cpu_seconds: float | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        在工作进程里执行fun(*args, **kwargs)， 阻塞直到返回或者超时
+        等待空闲进程的时间也计入期限
+        :param fun: 模块级函数， 参数和返回值必须可以pickle
+        :type fun: Callable
+        :param timeout: 执行期限（秒）， 超时之后杀死工作进程并抛出TimeoutError
+        :type timeout: float
+        :param cpu_seconds: CPU时间预算（秒）， 默认和timeout相同
+        :type cpu_seconds: float | None
+        :return: fun的返回值
+        :rtype: Any
+        """
+        self._ensure_started()
+        deadline = time.monotonic() + timeout
+        worker = self._acquire(timeout)
+        broken = False
+        try:
+            worker.conn.send((fun, args, kwargs, cpu_seconds or timeout))
+            if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                broken = True
+                raise TimeoutError(f"工作进程执行超过{timeout}秒， 已经强制结束")
+
+            ok, payload = worker.conn.recv()
+        except TimeoutError:
+            raise
+        except (EOFError, OSError) as e:
+            broken = True
+            raise RuntimeError("工作进程异常退出， 可能超出了内存或CPU时间限制") from e
+        finally:
+            if broken:
+                self._replace(worker)
+            else:
+                self._idle.put(worker)
+
+        if not ok:
+            raise RuntimeError(payload)
+
+        return payload
+
+
+_pool_instance: ProcessPool | None = None
+_instance_lock = Lock()
+
+
+def get_process_pool() -> ProcessPool:
+    """
+    全局唯一获取单例
+    :return: 单例
+    :rtype: ProcessPool
+    """
+    global _pool_instance
+    if _pool_instance is None:
+        with _instance_lock:
+            if _pool_instance is None:
+                _pool_instance = ProcessPool()
+
+    return _pool_instance
+
+
+def run_tool_in_process(fun: Callable, args: Any, timeout: float) -> Result:
+    """
+    把工具调用交给工作进程执行
+    :param fun: 工具函数
+    :type fun: Callable
+    :param args: 验证之后的工具输入模型
+    :type args: BaseModel
+    :param timeout: 执行期限（秒）
+    :type timeout: float
+    :return: 工具执行结果
+    :rtype: Result
+    """
+    data = get_process_pool().run(
+        call_tool,
+        fun.__module__,
+        fun.__name__,
+        args.model_dump(mode="json"),
+        timeout=timeout,
+    )
+    return Result.from_dict(data)
@@ -0,0 +1,156 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/python_kernel.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+python_exec工具的内核进程
+作为独立的脚本运行， 只依赖标准库， 从标准输入逐行读取JSON请求， 在同一个命名空间里执行代码
+执行结果以启动时传入的标记开头写到标准输出， 其它输出（比如C扩展直接写入的内容）由父进程原样收集
+用法： python python_kernel.py <标记> <内存上限MB> <默认输出上限字符数>
+"""
+
+from contextlib import redirect_stderr, redirect_stdout
+import ast
+import io
+import itertools
+import json
+import linecache
+import os
+import sys
+import traceback
+
+# 每次执行使用不同的文件名， 异常信息里可以显示出错的代码行
+_counter = itertools.count(1)
+
+
+class _CappedWriter(io.TextIOBase):
+    """
+    有上限的文本输出， 超出的部分只记录字符数
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._parts: list[str] = []
+        self._size = 0
+        self.dropped = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        room = self._limit - self._size
+        if room > 0:
+            self._parts.append(text[:room])
+            self._size += min(room, len(text))
+        self.dropped += max(0, len(text) - max(room, 0))
+        return len(text)
+
+    def getvalue(self) -> str:
+        text = "".join(self._parts)
+        if self.dropped:
+            text += f"\n...[省略了{self.dropped}个字符]..."
+        return text
+
+
+def _apply_memory_limit(memory_limit_mb: int):
+    """
+    限制内核进程的地址空间， Windows上没有这个功能
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _execute(code: str, namespace: dict, limit: int) -> str | None:
+    """
+    执行代码， 最后一条语句是表达式的时候返回它的repr， 和交互式解释器一样
+    """
+    filename = f"<python_exec-{next(_counter)}>"
+    linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+    tree = ast.parse(code, filename, "exec")
+    last = None
+    if tree.body and isinstance(statement := tree.body[-1], ast.Expr):
+        tree.body.pop()
+        last = ast.Expression(statement.value)
+
+    exec(compile(tree, filename, "exec"), namespace)
+    if last is None:
+        return None
+
+    value = eval(compile(last, filename, "eval"), namespace)
+    if value is None:
+        return None
+
+    text = repr(value)
+    if len(text) > limit:
+        text = text[:limit] + f"...[省略了{len(text) - limit}个字符]"
+    return text
+
+
+def _handle(request: dict, namespace: dict, limit: int) -> dict:
+    """
+    处理一个请求
+    """
+    if "chdir" in request:
+        os.chdir(request["chdir"])
+        sys.path[0] = os.getcwd()
+        return {"ok": True}
+
+    limit = request.get("max_output_chars", limit)
+    stdout, stderr = _CappedWriter(limit), _CappedWriter(limit)
+    response: dict = {"value": None, "exception": None}
+    stdin = sys.stdin
+    # 用户代码不能读取协议使用的标准输入
+    sys.stdin = io.StringIO("")
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            response["value"] = _execute(request["code"], namespace, limit)
+    except KeyboardInterrupt:
+        response["exception"] = (
+            "KeyboardInterrupt: 执行超时被中断， 之前定义的变量仍然保留"
+        )
+    except SystemExit as e:
+        response["exception"] = f"SystemExit: {e.code}"
+    except BaseException as e:
+        error = traceback.TracebackException.from_exception(e)
+        # 去掉内核自身的调用栈， 只保留用户代码的部分
+        error.stack = traceback.StackSummary.from_list(
+            [frame for frame in error.stack if frame.filename != __file__]
+        )
+        lines = "".join(error.format()).splitlines()
+        response["exception"] = "\n".join(lines[:1] + lines[1:][-30:])
+    finally:
+        sys.stdin = stdin
+
+    response["stdout"] = stdout.getvalue()
+    response["stderr"] = stderr.getvalue()
+    return response
+
+
+def main():
+    """
+    内核主循环
+    """
+    token, memory_limit_mb, limit = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+    _apply_memory_limit(memory_limit_mb)
+    protocol = sys.stdout
+    namespace: dict = {"__name__": "__main__", "__builtins__": __builtins__}
+    # 脚本所在的目录不应该被用户代码导入， 换成工作目录
+    sys.path[0] = os.getcwd()
+    for line in sys.stdin:
+        try:
+            response = _handle(json.loads(line), namespace, limit)
+        except BaseException as e:
+            response = {"exception": f"{type(e).__name__}: {e}"}
+
+        protocol.write(token + json.dumps(response, ensure_ascii=False) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
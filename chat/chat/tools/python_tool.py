@@ -0,0 +1,102 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/python_tool.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+在常驻的Python内核里执行代码
+和execute_shell共用shell_box下的工作目录， 可以直接读写shell工具创建的文件
+"""
+
+from pathlib import Path
+from pydantic import BaseModel, Field
+from tools import get_tool_registry, is_cancelled
+from tools.kernel_pool import get_kernel_pool
+from tools.result import Result
+from tools.shell_tool import SHELL_BOX_DIR
+
+registry = get_tool_registry()
+
+
+class PythonInputModel(BaseModel):
+    """
+    python_exec工具的输入参数
+    """
+
+    code: str = Field(
+        description="要执行的Python代码，最后一行是表达式的时候返回它的值，和交互式解释器一样",
+        examples=["import pandas as pd\ndf = pd.read_csv('data.csv')\ndf.describe()"],
+    )
+    shell_work_directory: str = Field(
+        default="",
+        description="工作目录，和execute_shell的shell_work_directory相同，每个工作目录一个独立的内核",
+    )
+    timeout: float = Field(
+        default=60.0,
+        ge=1,
+        le=600,
+        description="超时（秒），超时之后中断执行，已经定义的变量保留；中断无效的时候重启内核",
+    )
+    reset: bool = Field(
+        default=False,
+        description="True在执行之前重启内核，清空所有导入和变量",
+    )
+    max_output_chars: int = Field(
+        default=16 * 1024,
+        ge=1024,
+        le=256 * 1024,
+        description="stdout、stderr、返回值各自最多保留的字符数",
+    )
+
+
+def _work_directory(sub: str) -> Path:
+    """
+    解析工作目录， 必须在shell_box之内
+    :param sub: 工作目录名称
+    :type sub: str
+    :return: 工作目录的绝对路径
+    :rtype: Path
+    """
+    base = Path(SHELL_BOX_DIR).resolve()
+    cwd = base.joinpath(sub).resolve()
+    if not cwd.is_relative_to(base):
+        raise ValueError(
+            f"工作目录： {sub} 不在 {base} 之内， 有路径逃逸的风险。任务被阻断"
+        )
+
+    cwd.mkdir(parents=True, exist_ok=True)
+    return cwd
+
+
+# 代码自己有超时控制， 最长600秒， 这里的期限稍微宽松一些
+@registry.register(timeout=660.0)
+def python_exec(p: PythonInputModel) -> Result:
+    """
+    在常驻的Python内核里执行代码，导入的模块、定义的变量、加载的数据在多次调用之间保留
+    适合数据分析、计算、反复处理同一份数据；不需要先write脚本再用command运行
+    每个工作目录一个内核，内存和输出都有上限
+    """
+    try:
+        cwd = str(_work_directory(p.shell_work_directory))
+        pool = get_kernel_pool()
+        if p.reset:
+            pool.reset(cwd)
+
+        response = pool.get(cwd).request(
+            {"code": p.code, "max_output_chars": p.max_output_chars},
+            timeout=p.timeout,
+            max_output_chars=p.max_output_chars,
+            is_cancelled=is_cancelled,
+        )
+        error: Exception | None = None
+        if response.get("kernel_restarted"):
+            pool.reset(cwd)
+            error = RuntimeError(
+                "内核已经结束， 之前的变量和导入全部丢失， 下次调用会启动新的内核"
+            )
+        elif response.get("timed_out"):
+            error = TimeoutError(f"执行超过{p.timeout}秒被中断， 变量和导入仍然保留")
+
+        return Result(result=response, error=error)
+    except Exception as e:
+        return Result(error=e, result={})
@@ -5,6 +5,7 @@
 # * description: 一个简单的AI LLM聊天程序
 # 定义工具调用执行结果
 import json
+import builtins
 from typing_extensions import Any
 
 
@@ -42,6 +43,38 @@ class Result:
 
         return data
 
+    def to_dict(self) -> dict[str, Any]:
+        """
+        转换到可以序列化的dict， 用于在进程之间传递， 异常只保留类型名称和消息
+        :return: 可以序列化的dict
+        :rtype: dict[str, Any]
+        """
+        return {
+            "result": self.result,
+            "error": None
+            if self.error is None
+            else {"type": type(self.error).__name__, "message": str(self.error)},
+            "reminder": self.reminder,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Result":
+        """
+        从to_dict的结果还原， 内置异常还原为原来的类型， 其他异常还原为RuntimeError
+        :param data: to_dict的结果
+        :type data: dict[str, Any]
+        :rtype: Result
+        """
+        error: Exception | None = None
+        if err := data.get("error"):
+            error_type = getattr(builtins, err["type"], None)
+            if isinstance(error_type, type) and issubclass(error_type, Exception):
+                error = error_type(err["message"])
+            else:
+                error = RuntimeError(f"{err['type']}: {err['message']}")
+
+        return cls(result=data["result"], error=error, reminder=data.get("reminder"))
+
     def __repr__(self) -> str:
         """
         返回json格式的字符串
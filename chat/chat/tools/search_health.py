@@ -0,0 +1,226 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/search_health.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+搜索后端的健康状态
+在共享事件循环上并发探测所有后端， 定期重新探测， 搜索失败之后立即重新探测
+每个后端记录是否可用和平滑之后的延迟， web_search按得分选择后端， 导入和调用都不会等待探测
+"""
+
+from dataclasses import dataclass
+from threading import Lock
+import asyncio
+import time
+from tools.event_loop import get_event_loop
+
+# 重新探测的间隔（秒）
+PROBE_INTERVAL = 300.0
+PROBE_TIMEOUT = 2.0
+# 延迟的平滑系数， 越大越看重最近一次的结果
+_LATENCY_ALPHA = 0.3
+# 不可用的后端排在没有探测过的后端之后， 连续失败越多越靠后
+_FAILURE_PENALTY = 10.0
+
+
+@dataclass
+class BackendStatus:
+    """
+    一个后端的健康状态
+    """
+
+    name: str
+    host: str
+    port: int = 443
+    online: bool | None = None
+    latency: float | None = None
+    failures: int = 0
+    checked_at: float = 0.0
+
+    def score(self) -> float:
+        """
+        :return: 得分， 越小越好； 可用的后端按延迟排序， 没有探测过的在中间， 不可用的在最后
+        :rtype: float
+        """
+        if self.online is None:
+            return _FAILURE_PENALTY / 2
+        if not self.online:
+            return _FAILURE_PENALTY * (1 + self.failures)
+        return self.latency or 0.0
+
+
+class SearchHealth:
+    """
+    管理全部搜索后端的健康状态
+    """
+
+    def __init__(
+        self,
+        backends: list[tuple[str, str, int]],
+        interval: float = PROBE_INTERVAL,
+        timeout: float = PROBE_TIMEOUT,
+    ):
+        """
+        初始化， 第一次使用的时候才开始探测
+        :param backends: (名称, 主机名, 端口)列表， 靠前的后端在得分相同的时候优先
+        :type backends: list[tuple[str, str, int]]
+        :param interval: 重新探测的间隔（秒）
+        :type interval: float
+        :param timeout: 每次探测的超时（秒）
+        :type timeout: float
+        """
+        self._status = {
+            name: BackendStatus(name, host, port) for name, host, port in backends
+        }
+        self._interval = interval
+        self._timeout = timeout
+        self._lock = Lock()
+        self._started = False
+        self._probing: set[str] = set()
+
+    def _ensure_started(self):
+        """
+        在共享事件循环上启动定期探测
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        asyncio.run_coroutine_threadsafe(self._probe_forever(), get_event_loop())
+
+    async def _probe_forever(self):
+        """
+        定期并发探测全部后端
+        """
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self._interval)
+
+    async def probe_all(self):
+        """
+        并发探测全部后端
+        """
+        await asyncio.gather(*(self._probe(name) for name in self._status))
+
+    async def _probe(self, name: str):
+        """
+        尝试建立TCP连接， 记录结果和延迟
+        """
+        with self._lock:
+            if name in self._probing:
+                return
+            self._probing.add(name)
+            status = self._status[name]
+
+        start = time.monotonic()
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(status.host, status.port), self._timeout
+            )
+            writer.close()
+            self.report_success(name, time.monotonic() - start)
+        except (OSError, asyncio.TimeoutError):
+            self._mark_offline(name)
+        finally:
+            with self._lock:
+                self._probing.discard(name)
+
+    def _mark_offline(self, name: str):
+        with self._lock:
+            status = self._status[name]
+            status.online = False
+            status.failures += 1
+            status.checked_at = time.monotonic()
+
+    def report_success(self, name: str, latency: float | None = None):
+        """
+        记录一次成功的探测或者搜索
+        :param name: 后端名称
+        :type name: str
+        :param latency: 探测的连接耗时（秒）， 搜索成功的时候不提供， 搜索耗时和连接耗时不能比较
+        :type latency: float | None
+        """
+        with self._lock:
+            status = self._status[name]
+            status.online = True
+            status.failures = 0
+            status.checked_at = time.monotonic()
+            if latency is None:
+                return
+            status.latency = (
+                latency
+                if status.latency is None
+                else _LATENCY_ALPHA * latency + (1 - _LATENCY_ALPHA) * status.latency
+            )
+
+    def report_failure(self, name: str):
+        """
+        记录一次失败的搜索， 立即在后台重新探测
+        :param name: 后端名称
+        :type name: str
+        """
+        self._mark_offline(name)
+        asyncio.run_coroutine_threadsafe(self._probe(name), get_event_loop())
+
+    def ranked(self) -> list[str]:
+        """
+        :return: 按得分排序的后端名称， 第一次调用的时候启动探测， 不会等待探测结果
+        :rtype: list[str]
+        """
+        self._ensure_started()
+        with self._lock:
+            order = list(self._status)
+            return sorted(
+                order, key=lambda name: (self._status[name].score(), order.index(name))
+            )
+
+    def available(self) -> list[str]:
+        """
+        :return: 按得分排序、没有确认不可用的后端； 全部不可用的时候返回全部后端， 探测结果可能已经过时
+        :rtype: list[str]
+        """
+        ranked = self.ranked()
+        with self._lock:
+            online = [name for name in ranked if self._status[name].online is not False]
+        return online or ranked
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        :return: 全部后端的状态， 用于调试和展示
+        :rtype: dict[str, dict]
+        """
+        with self._lock:
+            return {
+                name: {
+                    "online": status.online,
+                    "latency": status.latency,
+                    "failures": status.failures,
+                }
+                for name, status in self._status.items()
+            }
+
+
+_health_instance: SearchHealth | None = None
+_instance_lock = Lock()
+
+
+def get_search_health() -> SearchHealth:
+    """
+    全局唯一获取单例
+    :return: 单例
+    :rtype: SearchHealth
+    """
+    global _health_instance
+    if _health_instance is None:
+        with _instance_lock:
+            if _health_instance is None:
+                _health_instance = SearchHealth(
+                    [
+                        ("duckduckgo", "duckduckgo.com", 443),
+                        ("baidu", "baidu.com", 443),
+                    ]
+                )
+
+    return _health_instance
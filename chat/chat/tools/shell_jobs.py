@@ -0,0 +1,260 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/shell_jobs.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+后台shell任务
+长时间运行的构建或者服务放到后台， agent可以继续推理， 之后再查看状态和输出
+任务输出写入工作目录下的环形日志文件， 超过上限之后只保留最近的部分
+"""
+
+from threading import Lock, Thread
+from pathlib import Path
+from uuid import uuid4
+import subprocess
+import time
+from tools.shell_process import (
+    OUTPUT_ENCODING,
+    kill_process_tree,
+    process_group_kwargs,
+    pump_output,
+)
+from tools.text_file import tail_lines
+
+JOBS_DIR_NAME = ".jobs"
+# 同时运行的后台任务上限
+MAX_RUNNING_JOBS = 8
+
+
+class RingLog:
+    """
+    有上限的日志文件
+    超过上限之后只保留最近一半的内容， 开头写一行说明
+    """
+
+    def __init__(self, path: Path, limit: int):
+        """
+        初始化并清空日志文件
+        :param path: 日志文件路径
+        :type path: Path
+        :param limit: 日志文件的最大字节数
+        :type limit: int
+        """
+        self.path = path
+        self._limit = limit
+        self._size = 0
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+        # 写入线程和tail查询可能同时访问日志文件
+        self._lock = Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_bytes(b"")
+
+    def write(self, data: bytes):
+        """
+        追加输出， 超过上限的时候压缩日志文件
+        :param data: 输出内容
+        :type data: bytes
+        """
+        with self._lock:
+            self.total_bytes += len(data)
+            with self.path.open("ab") as f:
+                f.write(data)
+            self._size += len(data)
+            if self._size > self._limit:
+                self._compact()
+
+    def tail(self, lines: int) -> str:
+        """
+        从文件末尾向前读取， 直到凑够需要的行数
+        :param lines: 行数
+        :type lines: int
+        :return: 最后若干行文本
+        :rtype: str
+        """
+        with self._lock:
+            return tail_lines(self.path, lines, encoding=OUTPUT_ENCODING)
+
+    def _compact(self):
+        """
+        只保留最近一半的内容
+        """
+        keep = self._limit // 2
+        with self.path.open("rb") as f:
+            f.seek(-keep, 2)
+            tail = f.read()
+
+        # 从下一行开头保留， 避免半行内容
+        newline = tail.find(b"\n")
+        if 0 <= newline < len(tail) - 1:
+            tail = tail[newline + 1 :]
+        self.dropped_bytes += self._size - len(tail)
+        header = f"...[省略了{self.dropped_bytes}字节更早的输出]...\n".encode(
+            OUTPUT_ENCODING
+        )
+        self.path.write_bytes(header + tail)
+        self._size = len(header) + len(tail)
+
+
+class ShellJob:
+    """
+    一个后台运行的shell命令
+    """
+
+    def __init__(self, command: str, cwd: Path, max_log_bytes: int):
+        """
+        启动后台命令， stderr合并到stdout写入日志文件
+        :param command: 要执行的命令
+        :type command: str
+        :param cwd: 工作目录
+        :type cwd: Path
+        :param max_log_bytes: 日志文件的最大字节数
+        :type max_log_bytes: int
+        """
+        self.job_id = uuid4().hex[:8]
+        self.command = command
+        self.cwd = cwd.resolve()
+        self.started_at = time.time()
+        self.ended_at: float | None = None
+        self.killed = False
+        self.log = RingLog(cwd / JOBS_DIR_NAME / f"{self.job_id}.log", max_log_bytes)
+        self._process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            shell=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            **process_group_kwargs(),
+        )
+        self._writer = Thread(
+            target=self._write_log, name=f"shell-job-{self.job_id}", daemon=True
+        )
+        self._writer.start()
+
+    def _write_log(self):
+        """
+        把命令输出写入日志文件， 输出结束之后记录结束时间
+        """
+        if self._process.stdout is not None:
+            pump_output(self._process.stdout, [self.log.write])
+
+        self._process.wait()
+        self.ended_at = time.time()
+
+    def is_running(self) -> bool:
+        """
+        :return: 命令是否还在运行
+        :rtype: bool
+        """
+        return self._process.poll() is None
+
+    def kill(self):
+        """
+        结束命令和它启动的所有子进程
+        """
+        if self.is_running():
+            self.killed = True
+            kill_process_tree(self._process)
+
+    def status(self) -> dict:
+        """
+        :return: 人类和LLM可读的任务状态
+        :rtype: dict
+        """
+        if self.is_running():
+            status = "running"
+        else:
+            status = "killed" if self.killed else "exited"
+        end = self.ended_at or time.time()
+
+        return {
+            "job_id": self.job_id,
+            "command": self.command,
+            "status": status,
+            "exit_code": self._process.returncode,
+            "elapsed_seconds": round(end - self.started_at, 1),
+            "output_bytes": self.log.total_bytes,
+            "log_path": str(self.log.path),
+        }
+
+
+class ShellJobManager:
+    """
+    管理所有后台任务， 任务只能在启动它的工作目录里查询
+    """
+
+    def __init__(self):
+        """
+        初始化
+        """
+        self._jobs: dict[str, ShellJob] = {}
+        self._lock = Lock()
+
+    def start(self, command: str, cwd: Path, max_log_bytes: int) -> ShellJob:
+        """
+        启动后台任务
+        :param command: 要执行的命令
+        :type command: str
+        :param cwd: 工作目录
+        :type cwd: Path
+        :param max_log_bytes: 日志文件的最大字节数
+        :type max_log_bytes: int
+        :return: 新的后台任务
+        :rtype: ShellJob
+        """
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.is_running())
+            if running >= MAX_RUNNING_JOBS:
+                raise RuntimeError(
+                    f"同时运行的后台任务不能超过{MAX_RUNNING_JOBS}个， 请先kill不需要的任务"
+                )
+
+            job = ShellJob(command=command, cwd=cwd, max_log_bytes=max_log_bytes)
+            self._jobs[job.job_id] = job
+            return job
+
+    def get(self, job_id: str, cwd: Path) -> ShellJob:
+        """
+        :param job_id: 任务id
+        :type job_id: str
+        :param cwd: 当前工作目录
+        :type cwd: Path
+        :return: 后台任务
+        :rtype: ShellJob
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.cwd != cwd.resolve():
+            raise ValueError(f"当前工作目录没有后台任务： {job_id}")
+
+        return job
+
+    def list(self, cwd: Path) -> list[ShellJob]:
+        """
+        :param cwd: 当前工作目录
+        :type cwd: Path
+        :return: 这个工作目录的所有后台任务
+        :rtype: list[ShellJob]
+        """
+        resolved = cwd.resolve()
+        return [job for job in self._jobs.values() if job.cwd == resolved]
+
+
+_manager_instance: ShellJobManager | None = None
+_instance_lock = Lock()
+
+
+def get_shell_job_manager() -> ShellJobManager:
+    """
+    全局唯一获取单例
+    :return: 单例
+    :rtype: ShellJobManager
+    """
+    global _manager_instance
+    if _manager_instance is None:
+        with _instance_lock:
+            if _manager_instance is None:
+                _manager_instance = ShellJobManager()
+
+    return _manager_instance
@@ -0,0 +1,215 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/shell_process.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+# shell工具用到的子进程辅助函数
+# 限制输出大小， 增量读取输出， 结束整个进程组
+from typing_extensions import IO, Callable
+from threading import Lock
+import codecs
+import locale
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# 子进程输出使用系统默认编码， 和subprocess的text=True保持一致
+OUTPUT_ENCODING = locale.getpreferredencoding(False)
+# 进度消息的最小间隔（秒）和最大长度， 防止大量输出刷屏
+_PROGRESS_INTERVAL = 0.5
+_PROGRESS_MAX_CHARS = 2000
+
+
+class OutputBuffer:
+    """
+    有上限的输出缓冲区
+    保留输出的开头和结尾各一半， 中间超出上限的部分丢弃， 只记录丢弃的字节数
+    """
+
+    def __init__(self, limit: int):
+        """
+        初始化
+        :param limit: 最多保留的字节数
+        :type limit: int
+        """
+        self._half = max(1, limit // 2)
+        self._head = bytearray()
+        self._tail = bytearray()
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+
+    def write(self, data: bytes):
+        """
+        追加一段输出
+        :param data: 输出内容
+        :type data: bytes
+        """
+        self.total_bytes += len(data)
+        room = self._half - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+
+        if data:
+            self._tail += data
+            overflow = len(self._tail) - self._half
+            if overflow > 0:
+                self.dropped_bytes += overflow
+                del self._tail[:overflow]
+
+    @property
+    def truncated(self) -> bool:
+        """
+        :return: 是否有输出被丢弃
+        :rtype: bool
+        """
+        return self.dropped_bytes > 0
+
+    def text(self, encoding: str = OUTPUT_ENCODING) -> str:
+        """
+        :param encoding: 输出编码
+        :type encoding: str
+        :return: 保留下来的输出文本， 被丢弃的部分用一行说明代替
+        :rtype: str
+        """
+        head = self._head.decode(encoding, errors="replace")
+        tail = self._tail.decode(encoding, errors="replace")
+        if not self.truncated:
+            return head + tail
+
+        return f"{head}\n...[省略了{self.dropped_bytes}字节输出]...\n{tail}"
+
+
+class ProgressThrottle:
+    """
+    把增量输出按行转发给进度回调， 合并短时间内的多行并且限制长度
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[str], None] | None,
+        encoding: str = OUTPUT_ENCODING,
+    ):
+        """
+        初始化
+        :param callback: 进度回调， None的时候什么也不做
+        :type callback: Callable[[str], None] | None
+        :param encoding: 输出编码
+        :type encoding: str
+        """
+        self._callback = callback
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._pending = ""
+        self._last_emit = 0.0
+        # stdout和stderr两个读取线程同时写入
+        self._lock = Lock()
+
+    def feed(self, data: bytes):
+        """
+        追加一段输出， 满足时间间隔的时候转发所有完整的行
+        :param data: 输出内容
+        :type data: bytes
+        """
+        if self._callback is None:
+            return
+
+        with self._lock:
+            self._pending += self._decoder.decode(data)
+            if time.monotonic() - self._last_emit >= _PROGRESS_INTERVAL:
+                self._emit(final=False)
+
+    def flush(self):
+        """
+        转发剩余的输出
+        """
+        if self._callback is None:
+            return
+
+        with self._lock:
+            self._pending += self._decoder.decode(b"", final=True)
+            self._emit(final=True)
+
+    def _emit(self, final: bool):
+        """
+        转发已经缓存的输出
+        :param final: 是否输出不完整的最后一行
+        :type final: bool
+        """
+        if final:
+            text, self._pending = self._pending, ""
+        else:
+            cut = self._pending.rfind("\n") + 1
+            text, self._pending = self._pending[:cut], self._pending[cut:]
+
+        if not text or self._callback is None:
+            return
+
+        if len(text) > _PROGRESS_MAX_CHARS:
+            text = f"...\n{text[-_PROGRESS_MAX_CHARS:]}"
+
+        self._last_emit = time.monotonic()
+        self._callback(text)
+
+
+def pump_output(
+    stream: IO[bytes],
+    sinks: list[Callable[[bytes], None]],
+):
+    """
+    增量读取子进程的输出直到结束， 每读到一段就交给所有接收方
+    应当在独立线程里运行
+    :param stream: 子进程的stdout或stderr
+    :type stream: IO[bytes]
+    :param sinks: 接收输出的函数列表
+    :type sinks: list[Callable[[bytes], None]]
+    """
+    read = getattr(stream, "read1", stream.read)
+    try:
+        while data := read(8192):
+            for sink in sinks:
+                sink(data)
+    except (OSError, ValueError):
+        # 进程被结束之后管道可能已经关闭
+        pass
+    finally:
+        stream.close()
+
+
+def process_group_kwargs() -> dict:
+    """
+    :return: 让子进程成为新进程组组长的Popen参数， 以便结束整个进程树
+    :rtype: dict
+    """
+    if sys.platform == "win32":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process: subprocess.Popen):
+    """
+    结束子进程和它创建的所有子孙进程
+    子进程必须使用process_group_kwargs创建
+    :param process: 子进程
+    :type process: subprocess.Popen
+    """
+    if process.poll() is not None:
+        return
+
+    try:
+        if sys.platform == "win32":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                capture_output=True,
+            )
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        process.kill()
+
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        pass
@@ -0,0 +1,314 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/shell_session.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+常驻shell会话
+每个工作目录一个常驻的shell进程， cd、环境变量、激活的虚拟环境在多次调用之间保留
+命令通过管道发送， 输出用一个随机的结束标记分隔， 空闲超时之后自动关闭
+"""
+
+from typing_extensions import Callable
+from queue import Queue, Empty
+from threading import Lock, Thread
+from uuid import uuid4
+import platform
+import subprocess
+import time
+from tools.shell_process import (
+    OUTPUT_ENCODING,
+    OutputBuffer,
+    ProgressThrottle,
+    kill_process_tree,
+    process_group_kwargs,
+    pump_output,
+)
+
+# 空闲超过这个时间（秒）的会话被关闭
+DEFAULT_IDLE_TIMEOUT = 600.0
+_REAP_INTERVAL = 30.0
+
+
+class ShellSessionResult:
+    """
+    常驻会话里一条命令的执行结果
+    """
+
+    def __init__(
+        self,
+        output: OutputBuffer,
+        exit_code: int | None,
+        timed_out: bool = False,
+        session_closed: bool = False,
+    ):
+        """
+        :param output: 命令的输出， stderr已经合并到stdout
+        :type output: OutputBuffer
+        :param exit_code: 命令的退出码， 会话意外结束的时候为None
+        :type exit_code: int | None
+        :param timed_out: 是否超时， 超时之后会话被结束
+        :type timed_out: bool
+        :param session_closed: 命令执行期间会话是否已经结束， 比如执行了exit
+        :type session_closed: bool
+        """
+        self.output = output
+        self.exit_code = exit_code
+        self.timed_out = timed_out
+        self.session_closed = session_closed
+
+
+class ShellSession:
+    """
+    一个常驻的shell进程， 同一时间只能执行一条命令
+    """
+
+    def __init__(self, cwd: str):
+        """
+        启动shell进程
+        :param cwd: shell的初始工作目录
+        :type cwd: str
+        """
+        self.cwd = cwd
+        self.last_used = time.monotonic()
+        self._lock = Lock()
+        self._is_windows = platform.system() == "Windows"
+        if self._is_windows:
+            args = ["cmd.exe", "/Q", "/K"]
+        else:
+            args = ["bash", "--noprofile", "--norc"]
+        self._process = subprocess.Popen(
+            args,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            **process_group_kwargs(),
+        )
+        # 读取线程在会话的整个生命周期里运行， None表示输出已经结束
+        self._chunks: Queue[bytes | None] = Queue()
+        self._reader = Thread(
+            target=self._read_output, name="shell-session", daemon=True
+        )
+        self._reader.start()
+
+    def _read_output(self):
+        """
+        把shell的输出放进队列
+        """
+        if self._process.stdout is not None:
+            pump_output(self._process.stdout, [self._chunks.put])
+
+        self._chunks.put(None)
+
+    def is_alive(self) -> bool:
+        """
+        :return: shell进程是否还在运行
+        :rtype: bool
+        """
+        return self._process.poll() is None
+
+    def is_busy(self) -> bool:
+        """
+        :return: 是否正在执行命令
+        :rtype: bool
+        """
+        return self._lock.locked()
+
+    def close(self):
+        """
+        结束shell进程和它启动的所有子进程
+        """
+        kill_process_tree(self._process)
+
+    def _wrap_command(self, command: str, sentinel: str) -> str:
+        """
+        包装命令： 标准输入重定向到空设备， 防止命令读走后面的结束标记
+        命令结束之后输出结束标记和退出码
+        :param command: 原始命令
+        :type command: str
+        :param sentinel: 结束标记
+        :type sentinel: str
+        :return: 写入shell标准输入的内容
+        :rtype: str
+        """
+        if self._is_windows:
+            return f"({command}\n) < NUL 2>&1\necho.\necho {sentinel} %errorlevel%\n"
+
+        return (
+            f"{{ {command}\n}} < /dev/null 2>&1\nprintf '\\n{sentinel} %s\\n' \"$?\"\n"
+        )
+
+    def run(
+        self,
+        command: str,
+        timeout: float,
+        max_output_bytes: int,
+        progress_callback: Callable[[str], None] | None = None,
+        is_cancelled: Callable[[], bool] | None = None,
+    ) -> ShellSessionResult:
+        """
+        在会话里执行一条命令
+        :param command: 要执行的命令
+        :type command: str
+        :param timeout: 超时（秒）， 超时之后结束整个会话
+        :type timeout: float
+        :param max_output_bytes: 最多保留的输出字节数
+        :type max_output_bytes: int
+        :param progress_callback: 实时输出回调
+        :type progress_callback: Callable[[str], None] | None
+        :param is_cancelled: 检查工具调用是否已经被取消
+        :type is_cancelled: Callable[[], bool] | None
+        :return: 执行结果
+        :rtype: ShellSessionResult
+        """
+        with self._lock:
+            self.last_used = time.monotonic()
+            output = OutputBuffer(max_output_bytes)
+            progress = ProgressThrottle(progress_callback)
+            sentinel = f"__SHELL_SESSION_DONE_{uuid4().hex}__"
+            marker = sentinel.encode("ascii")
+            if self._process.stdin is None:
+                raise RuntimeError("shell会话没有标准输入")
+
+            self._process.stdin.write(
+                self._wrap_command(command, sentinel).encode(OUTPUT_ENCODING)
+            )
+            self._process.stdin.flush()
+
+            deadline = time.monotonic() + timeout
+            pending = b""
+            while True:
+                if time.monotonic() >= deadline or (is_cancelled and is_cancelled()):
+                    self.close()
+                    progress.flush()
+                    return ShellSessionResult(output, None, timed_out=True)
+
+                try:
+                    chunk = self._chunks.get(timeout=0.2)
+                except Empty:
+                    continue
+
+                if chunk is None:
+                    output.write(pending)
+                    progress.feed(pending)
+                    progress.flush()
+                    return ShellSessionResult(output, None, session_closed=True)
+
+                pending += chunk
+                index = pending.find(marker)
+                if index == -1:
+                    # 保留可能是结束标记开头的部分， 其余的作为输出
+                    keep = len(marker)
+                    output.write(pending[:-keep])
+                    progress.feed(pending[:-keep])
+                    pending = pending[-keep:]
+                    continue
+
+                # 结束标记之前有一个额外的换行， 去掉它
+                body = pending[:index]
+                body = body[:-2] if body.endswith(b"\r\n") else body.removesuffix(b"\n")
+                output.write(body)
+                progress.feed(body)
+                rest = pending[index + len(marker) :]
+                while b"\n" not in rest:
+                    try:
+                        chunk = self._chunks.get(
+                            timeout=max(0.1, deadline - time.monotonic())
+                        )
+                    except Empty:
+                        break
+                    if chunk is None:
+                        break
+                    rest += chunk
+
+                progress.flush()
+                self.last_used = time.monotonic()
+                try:
+                    exit_code: int | None = int(rest.split(b"\n", 1)[0].strip())
+                except ValueError:
+                    exit_code = None
+
+                return ShellSessionResult(output, exit_code)
+
+
+class ShellSessionPool:
+    """
+    按工作目录管理常驻shell会话
+    """
+
+    def __init__(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        初始化
+        :param idle_timeout: 空闲超时（秒）
+        :type idle_timeout: float
+        """
+        self._idle_timeout = idle_timeout
+        self._sessions: dict[str, ShellSession] = {}
+        self._lock = Lock()
+        self._reaper: Thread | None = None
+
+    def get(self, cwd: str) -> ShellSession:
+        """
+        获取工作目录对应的会话， 不存在或者已经结束的时候重新启动
+        :param cwd: 工作目录
+        :type cwd: str
+        :return: 常驻会话
+        :rtype: ShellSession
+        """
+        with self._lock:
+            session = self._sessions.get(cwd)
+            if session is None or not session.is_alive():
+                session = ShellSession(cwd)
+                self._sessions[cwd] = session
+            # 在锁里更新使用时间， 刚取出的会话不会在run之前被当作空闲会话关闭
+            session.last_used = time.monotonic()
+
+            if self._reaper is None:
+                self._reaper = Thread(
+                    target=self._reap_forever, name="shell-session-reaper", daemon=True
+                )
+                self._reaper.start()
+
+            return session
+
+    def _reap_forever(self):
+        """
+        定期关闭空闲超时或者已经结束的会话
+        """
+        while True:
+            time.sleep(_REAP_INTERVAL)
+            now = time.monotonic()
+            with self._lock:
+                expired = [
+                    cwd
+                    for cwd, session in self._sessions.items()
+                    if not session.is_alive()
+                    or (
+                        not session.is_busy()
+                        and now - session.last_used > self._idle_timeout
+                    )
+                ]
+                sessions = [self._sessions.pop(cwd) for cwd in expired]
+
+            for session in sessions:
+                session.close()
+
+
+_pool_instance: ShellSessionPool | None = None
+_instance_lock = Lock()
+
+
+def get_shell_session_pool() -> ShellSessionPool:
+    """
+    全局唯一获取单例
+    :return: 单例
+    :rtype: ShellSessionPool
+    """
+    global _pool_instance
+    if _pool_instance is None:
+        with _instance_lock:
+            if _pool_instance is None:
+                _pool_instance = ShellSessionPool()
+
+    return _pool_instance
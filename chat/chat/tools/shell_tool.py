@@ -5,14 +5,31 @@
 # * description: 一个简单的AI LLM聊天程序
 # 简单实现了一个简单执行shell命令的工具
 from typing import Literal
+from typing_extensions import Iterator
+from threading import Thread
 import subprocess
 import re
 import platform
+import time
 from pathlib import Path
 from pydantic import BaseModel, Field, model_validator
 from tools.result import Result
-from tools import get_tool_registry
-from util import read_file_text
+from tools import get_tool_registry, get_progress_callback, is_cancelled
+from tools.shell_session import get_shell_session_pool
+from tools.shell_jobs import get_shell_job_manager
+from tools.text_file import read_lines
+from tools.file_search import has_glob, iter_files, parallel_search
+from tools.trigram_index import get_trigram_index
+from tools.dir_listing import count_children, list_page
+from tools.file_edit import apply_edits, atomic_write, diff_summary
+from tools.shell_process import (
+    OutputBuffer,
+    ProgressThrottle,
+    kill_process_tree,
+    process_group_kwargs,
+    pump_output,
+)
+from util import detect_file_encoding, read_file_text
 from error_handling import emit_error
 
 SHELL_BOX_DIR = "shell_box"
@@ -47,9 +64,28 @@ DANGEROUS_PATTERNS = [
     "cat /etc/passwd",
     "type %SystemRoot%\\system32\\config\\sam",
 ]
+# 常见语言里的定义： Python、JavaScript/TypeScript、Go、Rust、Java/C#等的函数、类、变量
+SYMBOL_DEFINITION_PATTERN = (
+    r"^[ \t]*(?:(?:export|default|pub(?:\([^)\n]*\))?|public|private|protected|static|async|abstract|final)[ \t]+)*"
+    r"(?:def|class|function\*?|func|fn|struct|enum|interface|trait|type|impl|const|let|var|module|namespace)"
+    r"[ \t]+(?:\([^)\n]*\)[ \t]*)?{name}\b"
+    r"|^[ \t]*{name}[ \t]*(?::[^=\n]*)?=(?!=)"
+)
 _registry = get_tool_registry()
 
 
+class EditItem(BaseModel):
+    """
+    批量编辑里的一处替换
+    """
+
+    old_string: str = Field(
+        description="要被替换的字符串，replace_all为False的时候必须唯一"
+    )
+    new_string: str = Field(description="用于替换的新字符串，可以是空字符串")
+    replace_all: bool = Field(default=False, description="是否替换所有出现的位置")
+
+
 class ShellInputModel(BaseModel):
     """
     shell命令执行工具的输入参数
@@ -62,21 +98,41 @@ class ShellInputModel(BaseModel):
         "list",  # 列举文件
         "edit",  # 编辑文件（搜索替换）
         "grep",  # 文件内搜索
+        "find_symbol",  # 查找函数、类等定义
         "state",  # 文件基本信息
+        "start",  # 后台启动shell命令
+        "poll",  # 查看后台任务状态
+        "tail",  # 查看后台任务最后的输出
+        "kill",  # 结束后台任务
     ] = Field(description="所有可用功能")
 
     # === command 专用参数 ===
     timeout: float = Field(
-        description="command专用，shell命令执行的超时时间（秒）",
+        description="command和grep专用，执行的超时时间（秒）",
         default=120.0,
         ge=0.1,
         le=3600.0,
     )
     command: str | None = Field(
         default=None,
-        description=f"command专用，要执行的{platform.system()} shell命令，格外注意平台差异",
+        description=f"command和start专用，要执行的{platform.system()} shell命令，格外注意平台差异",
         examples=["ls -la", "dir /B", "gcc hello.c -o hello.out", "node main.js"],
     )
+    max_output_bytes: int = Field(
+        default=64 * 1024,
+        ge=1024,
+        le=4 * 1024 * 1024,
+        description="command专用，stdout和stderr各自最多保留的字节数，超出之后保留开头和结尾；start专用，日志文件的最大字节数，超出之后只保留最近的输出",
+    )
+    persistent: bool = Field(
+        default=False,
+        description="command专用，True在工作目录的常驻shell会话里执行，cd、环境变量、虚拟环境在多次调用之间保留，stderr合并到stdout；False每次启动新的shell",
+    )
+    # === poll tail kill 专用参数 ===
+    job_id: str | None = Field(
+        default=None,
+        description="tail和kill专用，start返回的后台任务id；poll不提供的时候列出工作目录的所有后台任务",
+    )
     # === 除了command之外所有功能专用参数 ===
     file_path: str | None = Field(
         default=None,
@@ -88,7 +144,14 @@ class ShellInputModel(BaseModel):
     append: bool = Field(default=False, description="write专用，True追加；False覆盖")
     # === read 专用参数 ===
     limit: int | None = Field(
-        default=None, description="read专用，None读入全部，否则截断行数", ge=1
+        default=None,
+        description="read专用，None读入全部，否则截断行数；tail专用，返回的行数，默认50；list专用，每页最多的条目数，默认200",
+        ge=1,
+    )
+    offset: int = Field(
+        default=0,
+        description="read专用，从第几行开始读取（从0开始），配合limit分页，返回的next_offset是下一页的offset；tail为True的时候表示跳过最后的几行",
+        ge=0,
     )
     tail: bool = Field(
         default=False,
@@ -99,6 +162,23 @@ class ShellInputModel(BaseModel):
         default=False,
         description="list专用，是否显是隐藏文件",
     )
+    depth: int = Field(
+        default=1, ge=1, le=10, description="list专用，递归深度，1只列举目录本身"
+    )
+    glob: str | None = Field(
+        default=None,
+        description="list专用，只返回相对路径匹配的条目，不包含/的时候只匹配名称",
+        examples=["*.py", "src/**/test_*"],
+    )
+    sort_by: Literal["name", "mtime", "size", "none"] = Field(
+        default="name",
+        description="list专用，每层目录内部的排序方式，mtime和size从大到小，none最快",
+    )
+    cursor: int = Field(
+        default=0,
+        ge=0,
+        description="list专用，分页游标，传入上一页返回的next_cursor",
+    )
 
     # === edit专用参数
     old_string: str | None = Field(
@@ -108,6 +188,11 @@ class ShellInputModel(BaseModel):
         default=None, description="edit专用，用于替换的新字符串"
     )
     replace_all: bool = Field(default=True, description="是否全部替换")
+    edits: list[EditItem] | None = Field(
+        default=None,
+        description="edit专用，批量替换，提供的时候忽略old_string和new_string；所有替换都在原始内容上定位，任何一处找不到、不唯一或者互相重叠的时候整个批次都不写入",
+        max_length=100,
+    )
     # === grep专用参数 ===
     pattern: str | None = Field(
         default=None, description="grep专用，搜索模式字符串或正则表达式"
@@ -115,6 +200,22 @@ class ShellInputModel(BaseModel):
     context_lines: int = Field(
         default=2, ge=0, le=20, description="grep专用，匹配行前行后显是的行数"
     )
+    max_matches: int = Field(
+        default=200,
+        ge=1,
+        le=2000,
+        description="grep和find_symbol专用，最多返回的匹配数量，达到之后停止搜索",
+    )
+    use_index: bool = Field(
+        default=False,
+        description="grep专用，True使用工作目录的三元组索引跳过不可能匹配的文件，适合反复搜索同一个大目录；第一次使用需要建立索引",
+    )
+    # === find_symbol专用参数 ===
+    symbol: str | None = Field(
+        default=None,
+        description="find_symbol专用，要查找定义的函数、类、变量名称，总是使用索引",
+        examples=["ShellInputModel", "get_tool_registry"],
+    )
 
     # === 通用参数 ===
     shell_work_directory: str = Field(
@@ -135,9 +236,14 @@ class ShellInputModel(BaseModel):
             "read": ["file_path"],
             "write": ["file_path", "content"],
             "list": [],
-            "edit": ["old_string", "new_string"],
+            "edit": ["file_path"],
             "grep": ["file_path", "pattern"],
+            "find_symbol": ["symbol"],
             "state": ["file_path"],
+            "start": ["command"],
+            "poll": [],
+            "tail": ["job_id"],
+            "kill": ["job_id"],
         }
         required = required_map.get(fun, [])
         missing = []
@@ -171,7 +277,12 @@ class ShellToolDispatcher:
             "list": self._handler_list,
             "edit": self._handler_edit,
             "grep": self._handler_grep,
+            "find_symbol": self._handler_find_symbol,
             "state": self._handler_state,
+            "start": self._handler_start,
+            "poll": self._handler_poll,
+            "tail": self._handler_tail,
+            "kill": self._handler_kill,
         }
 
     def _safe_path(self, parent: Path, sub: str, auto_mkdir: bool = False) -> Path:
@@ -231,37 +342,113 @@ class ShellToolDispatcher:
         if not p.command:
             raise ValueError("必须提供command参数")
 
-        lower_command = p.command.lower()
+        self._check_command(p.command)
+        if p.persistent:
+            return self._run_in_session(p, cwd)
+
+        # 增量读取输出， 内存里只保留开头和结尾， 同时把实时输出转发给UI
+        process = subprocess.Popen(
+            p.command,
+            cwd=cwd,
+            shell=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **process_group_kwargs(),
+        )
+        stdout = OutputBuffer(p.max_output_bytes)
+        stderr = OutputBuffer(p.max_output_bytes)
+        progress = ProgressThrottle(get_progress_callback())
+        readers = [
+            Thread(
+                target=pump_output,
+                args=(process.stdout, [stdout.write, progress.feed]),
+                daemon=True,
+            ),
+            Thread(
+                target=pump_output,
+                args=(process.stderr, [stderr.write, progress.feed]),
+                daemon=True,
+            ),
+        ]
+        for reader in readers:
+            reader.start()
+
+        deadline = time.monotonic() + p.timeout
+        timed_out = False
+        while process.poll() is None:
+            if time.monotonic() >= deadline or is_cancelled():
+                timed_out = True
+                kill_process_tree(process)
+                break
+
+            try:
+                process.wait(timeout=0.2)
+            except subprocess.TimeoutExpired:
+                pass
+
+        for reader in readers:
+            reader.join(timeout=5)
+        progress.flush()
+
+        result = Result(
+            result={
+                "command": p.command,
+                "stdout": stdout.text(),
+                "stderr": stderr.text(),
+                "exit_code": process.returncode,
+                "truncated": stdout.truncated or stderr.truncated,
+            }
+        )
+        if timed_out:
+            result.error = TimeoutError(f"Shell Command Execute Timeout: {p.timeout}S.")
+
+        return result
+
+    def _check_command(self, command: str):
+        """
+        阻断危险命令
+        :param command: shell命令
+        :type command: str
+        """
+        lower_command = command.lower()
         if any(pattern in lower_command for pattern in DANGEROUS_PATTERNS):
             raise PermissionError("非法命令被阻断")
 
-        process = None
-        result = Result(result={})
+    def _run_in_session(self, p: ShellInputModel, cwd: Path) -> Result:
+        """
+        在工作目录的常驻shell会话里执行命令
+        超时之后整个会话被结束， 下一次调用重新启动
+        """
+        if not p.command:
+            raise ValueError("必须提供command参数")
 
-        try:
-            process = subprocess.run(
-                p.command,
-                cwd=cwd,
-                capture_output=True,
-                text=True,
-                shell=True,
-                timeout=p.timeout,
+        session = get_shell_session_pool().get(str(cwd.resolve()))
+        session_result = session.run(
+            command=p.command,
+            timeout=p.timeout,
+            max_output_bytes=p.max_output_bytes,
+            progress_callback=get_progress_callback(),
+            is_cancelled=is_cancelled,
+        )
+        result = Result(
+            result={
+                "command": p.command,
+                "stdout": session_result.output.text(),
+                "stderr": "",
+                "exit_code": session_result.exit_code,
+                "truncated": session_result.output.truncated,
+                "persistent": True,
+            }
+        )
+        if session_result.timed_out:
+            result.error = TimeoutError(
+                f"Shell Command Execute Timeout: {p.timeout}S. 常驻会话已经结束， 会话状态丢失"
             )
-        except subprocess.TimeoutExpired:
-            result.error = TimeoutError(f"Shell Command Execute Timeout: {p.timeout}S.")
-        except Exception as e:
-            emit_error(msg=str(e), exception=e)
-            result.error = e
-        finally:
-            if process is not None:
-                result.result = {
-                    "command": p.command,
-                    "stdout": process.stdout,
-                    "stderr": process.stderr,
-                    "exit_code": process.returncode,
-                }
+        elif session_result.session_closed:
+            result.error = RuntimeError("常驻shell会话已经退出， 下一次调用会重新启动")
 
-            return result
+        return result
 
     def _handler_read(self, p: ShellInputModel, cwd: Path) -> Result:
         """
@@ -272,19 +459,16 @@ class ShellToolDispatcher:
 
         try:
             file_path = self._safe_path(cwd, p.file_path)
-            content = read_file_text(str(file_path), require=True)
-            if not content:
-                raise ValueError("文件是空的")
+            if not (p.limit or p.tail or p.offset):
+                content = read_file_text(str(file_path), require=True)
+                if not content:
+                    raise ValueError("文件是空的")
 
-            if p.limit or p.tail:
-                lines = content.splitlines()
-                if p.tail:
-                    selected = lines[-p.limit :] if p.limit else lines
-                else:
-                    selected = lines[: p.limit] if p.limit else lines
-                content = "\n".join(selected)
+                return Result(result={"path": str(file_path), "file_content": content})
 
-            return Result(result={"path": str(file_path), "file_content": content})
+            # 只读取需要的行， 大文件不会整个读入内存
+            result = read_lines(file_path, offset=p.offset, limit=p.limit, tail=p.tail)
+            return Result(result={"path": str(file_path), **result})
         except Exception as e:
             return Result(error=e, result={})
 
@@ -322,26 +506,16 @@ class ShellToolDispatcher:
         try:
             target = p.file_path or "."
             file_path = self._safe_path(cwd, target)
-            items = []
-            for item in file_path.iterdir():
-                if not p.show_hidden and item.name.startswith("."):
-                    continue
-                stat = item.stat()
-                items.append(
-                    {
-                        "name": item.name,
-                        "type": "directory" if item.is_dir() else "file",
-                        "size": stat.st_size if item.is_file() else None,
-                        "modified": stat.st_mtime,
-                    }
-                )
-            return Result(
-                result={
-                    "path": str(file_path),
-                    "items": items,
-                    "total": len(items),
-                }
+            page = list_page(
+                file_path,
+                cursor=p.cursor,
+                limit=min(p.limit or 200, 1000),
+                depth=p.depth,
+                glob=p.glob,
+                show_hidden=p.show_hidden,
+                sort_by=p.sort_by,
             )
+            return Result(result={"path": str(file_path), **page})
         except Exception as e:
             return Result(error=e, result={})
 
@@ -350,29 +524,42 @@ class ShellToolDispatcher:
         编辑文件（查找和替换
         """
         try:
-            if p.file_path is None or p.old_string is None or p.new_string is None:
-                raise ValueError("必须提供参数file_path; old_string & new_string")
+            if p.file_path is None:
+                raise ValueError("必须提供参数file_path")
+
+            edits = p.edits
+            if not edits:
+                if p.old_string is None or p.new_string is None:
+                    raise ValueError("必须提供参数edits或者old_string & new_string")
+                edits = [
+                    EditItem(
+                        old_string=p.old_string,
+                        new_string=p.new_string,
+                        replace_all=p.replace_all,
+                    )
+                ]
 
             file_path = self._safe_path(cwd, p.file_path)
-            content = read_file_text(str(file_path), require=True)
+            encoding = detect_file_encoding(str(file_path))
+            content = file_path.read_bytes().decode(encoding)
             if not content:
                 raise ValueError(f"文件： {p.file_path}是空文件")
 
-            old_count = content.count(p.old_string)
-            replace_count = old_count if p.replace_all else (1 if old_count > 0 else 0)
-            new_content = content.replace(
-                p.old_string, p.new_string, -1 if p.replace_all else 1
+            new_content, counts = apply_edits(
+                content, [(e.old_string, e.new_string, e.replace_all) for e in edits]
             )
-
             if new_content != content:
-                with file_path.open("w", encoding="UTF-8") as f:
-                    f.write(new_content)
+                atomic_write(file_path, new_content.encode(encoding))
 
             return Result(
                 result={
                     "path": str(file_path),
-                    "replace_all": p.replace_all,
-                    "replace_count": replace_count,
+                    "replace_count": sum(counts),
+                    "edits": [
+                        {"index": i, "replace_count": count}
+                        for i, count in enumerate(counts)
+                    ],
+                    "diff": diff_summary(content, new_content, p.file_path),
                 }
             )
         except Exception as e:
@@ -386,40 +573,139 @@ class ShellToolDispatcher:
             if p.file_path is None or p.pattern is None:
                 raise ValueError("必须提供参数： file_path & pattern")
 
-            file_path = self._safe_path(cwd, p.file_path)
-            content = read_file_text(str(file_path), require=True)
-            if content is None:
-                raise ValueError(f"文件： {p.file_path}是空白文件")
-
-            lines = content.splitlines()
-            pattern = re.compile(p.pattern, re.IGNORECASE)
-            matches = []
-            for i, line in enumerate(lines, 1):
-                if pattern.search(line):
-                    start = max(0, i - p.context_lines - 1)
-                    end = min(len(lines), i + p.context_lines)
-                    matches.append(
-                        {
-                            "line_number": i,
-                            "content": line,
-                            "context": {
-                                "start_line": start + 1,
-                                "lines": lines[start:end],
-                            },
-                        }
-                    )
+            files, root = self._search_target(p.file_path, cwd, p.use_index)
+            if p.use_index:
+                files = get_trigram_index(cwd).filter_files(files, p.pattern)
+
+            result = parallel_search(
+                files,
+                root,
+                p.pattern,
+                context_lines=p.context_lines,
+                max_matches=p.max_matches,
+                timeout=p.timeout,
+                is_cancelled=is_cancelled,
+            )
 
             return Result(
                 result={
-                    "file_path": str(file_path),
+                    "file_path": str(self._safe_path(cwd, p.file_path)),
                     "pattern": p.pattern,
-                    "total_matches": len(matches),
-                    "matches": matches,
+                    "total_matches": len(result["matches"]),
+                    **result,
                 }
             )
         except Exception as e:
             return Result(error=e, result={})
 
+    def _search_target(
+        self, target: str, cwd: Path, use_index: bool
+    ) -> tuple[Iterator[Path], Path]:
+        """
+        解析搜索目标， 可以是文件、目录或者通配符， 目录和通配符递归搜索
+        :param target: 搜索目标
+        :type target: str
+        :param cwd: 工作目录
+        :type cwd: Path
+        :param use_index: 是否使用索引， 使用的时候先增量更新索引
+        :type use_index: bool
+        :return: 要搜索的文件和结果路径的根目录
+        :rtype: tuple[Iterator[Path], Path]
+        """
+        glob = None
+        if has_glob(target):
+            parts = Path(target).parts
+            index = next(i for i, part in enumerate(parts) if has_glob(part))
+            target = str(Path(*parts[:index])) if index else "."
+            glob = "/".join(parts[index:])
+
+        root = self._safe_path(cwd, target)
+        if root.is_file():
+            return iter([root]), root.parent
+        if not root.is_dir():
+            raise FileNotFoundError(f"路径不存在： {root}")
+
+        if use_index:
+            # 索引里的路径都是解析之后的绝对路径
+            get_trigram_index(cwd).refresh()
+            root = root.resolve()
+
+        return iter_files(root, glob), root
+
+    def _handler_find_symbol(self, p: ShellInputModel, cwd: Path) -> Result:
+        """
+        用索引查找函数、类、变量的定义
+        """
+        if not p.symbol:
+            raise ValueError("必须提供参数： symbol")
+
+        files, root = self._search_target(p.file_path or ".", cwd, use_index=True)
+        name = re.escape(p.symbol)
+        # 先用符号名称本身过滤候选文件， 定义的正则表达式有分支， 索引无法直接过滤
+        files = get_trigram_index(cwd).filter_files(files, name)
+        result = parallel_search(
+            files,
+            root,
+            SYMBOL_DEFINITION_PATTERN.format(name=name),
+            context_lines=p.context_lines,
+            max_matches=p.max_matches,
+            timeout=p.timeout,
+            is_cancelled=is_cancelled,
+        )
+        return Result(
+            result={
+                "symbol": p.symbol,
+                "total_matches": len(result["matches"]),
+                **result,
+            }
+        )
+
+    def _handler_start(self, p: ShellInputModel, cwd: Path) -> Result:
+        """
+        后台启动shell命令， 立即返回任务id
+        """
+        if not p.command:
+            raise ValueError("必须提供command参数")
+
+        self._check_command(p.command)
+        job = get_shell_job_manager().start(
+            command=p.command, cwd=cwd, max_log_bytes=p.max_output_bytes
+        )
+        return Result(result=job.status())
+
+    def _handler_poll(self, p: ShellInputModel, cwd: Path) -> Result:
+        """
+        查看后台任务的状态， 不提供job_id的时候列出所有任务
+        """
+        manager = get_shell_job_manager()
+        if p.job_id:
+            return Result(result=manager.get(p.job_id, cwd).status())
+
+        return Result(result={"jobs": [job.status() for job in manager.list(cwd)]})
+
+    def _handler_tail(self, p: ShellInputModel, cwd: Path) -> Result:
+        """
+        查看后台任务最后的输出
+        """
+        if not p.job_id:
+            raise ValueError("必须提供参数： job_id")
+
+        job = get_shell_job_manager().get(p.job_id, cwd)
+        result = job.status()
+        result["output"] = job.log.tail(p.limit or 50)
+        return Result(result=result)
+
+    def _handler_kill(self, p: ShellInputModel, cwd: Path) -> Result:
+        """
+        结束后台任务和它启动的所有子进程
+        """
+        if not p.job_id:
+            raise ValueError("必须提供参数： job_id")
+
+        job = get_shell_job_manager().get(p.job_id, cwd)
+        job.kill()
+        return Result(result=job.status())
+
     def _handler_state(self, p: ShellInputModel, cwd: Path) -> Result:
         """
         获取目录或文件的属性
@@ -439,7 +725,7 @@ class ShellToolDispatcher:
                 "permissions": oct(stat.st_mode)[-3:],
             }
             if file_path.is_dir():
-                result["children_count"] = len(list(file_path.iterdir()))
+                result["children_count"] = count_children(file_path)
 
             return Result(result=result)
         except Exception as e:
@@ -449,19 +735,25 @@ class ShellToolDispatcher:
 _dispatcher = ShellToolDispatcher()
 
 
-@_registry.register
+# command自己有超时控制， 最长3600秒， 这里的期限稍微宽松一些
+@_registry.register(timeout=3660.0)
 def execute_shell(shell_inputModel: ShellInputModel) -> Result:
     """
     shell工具的统一入口：
     根据ShellInputModel.inner_fun_name自动分发给内部处理子工具
     优先使用非command功能，除非不能满足需求
     command; 执行shell命令
-    read; 读取文本文件
+    read; 读取文本文件，大文件用offset和limit分页读取
     write; 写入文本文件
-    list 列举路径
-    edit; 编辑文件（查找替换）
-    grep; 文件内部搜索
+    list 列举路径，支持递归深度、通配符过滤、排序，结果分页，有next_cursor的时候还有下一页
+    edit; 编辑文件（查找替换），多处修改用edits一次提交，原子写入，返回diff
+    grep; 文件内部搜索，file_path是目录或者通配符（如src/**/*.py）的时候递归并行搜索，遵守.gitignore
+    find_symbol; 查找函数、类、变量的定义，比grep更快更准确
     state; 查看目录文件的属性
+    start; 后台启动长时间运行的命令，返回job_id，不等待结束
+    poll; 查看后台任务状态
+    tail; 查看后台任务最后的输出
+    kill; 结束后台任务
     安全限制
     所有的工作在ShellInputModel.shell_work_directory目录内； 禁止访问上级目录或目录逃逸
     :param shell_inputModel: 包含inner_fun_name和所需参数
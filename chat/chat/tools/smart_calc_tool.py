@@ -6,28 +6,103 @@
 """
 SmartCalc - 智能计算工具
 数学计算 + 单位换算 + 历法查询
+单位定义第一次换算的时候才加载， 解析结果缓存在磁盘上； 历法和节假日按日期缓存
+batch一次计算多个表达式
+array用NumPy计算数组表达式， NumPy在第一次使用的时候才导入
 """
 
 from typing import Literal
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
+from threading import Lock
 from pydantic import BaseModel, Field
 from simpleeval import simple_eval  # type: ignore
-from lunar_python import Lunar, Solar  # type: ignore
+from lunar_python import Solar  # type: ignore
 import chinese_calendar as calendar  # type: ignore
 from pint import UnitRegistry
 from tools import get_tool_registry
 from tools.result import Result
 
 registry = get_tool_registry()
-ureg: UnitRegistry = UnitRegistry()
+# batch一次最多计算的表达式数量
+MAX_BATCH_ITEMS = 100
+
+_ureg_instance: UnitRegistry | None = None
+_ureg_lock = Lock()
+
+
+def get_unit_registry() -> UnitRegistry:
+    """
+    全局唯一获取单位注册表， 第一次调用的时候加载
+    cache_folder=":auto:"把解析之后的单位定义缓存到用户缓存目录， 之后加载快很多
+    :return: 单例
+    :rtype: UnitRegistry
+    """
+    global _ureg_instance
+    if _ureg_instance is None:
+        with _ureg_lock:
+            if _ureg_instance is None:
+                _ureg_instance = UnitRegistry(cache_folder=":auto:")
+
+    return _ureg_instance
+
+
+class BatchItem(BaseModel):
+    func: Literal["calc", "convert"]
+    expr: str = Field(description="表达式或换算")
 
 
 class SmartInput(BaseModel):
-    func: Literal["calc", "convert", "time"]
+    func: Literal["calc", "convert", "time", "batch", "array"]
     expr: str = Field(default="", description="表达式或换算")
     year: int = Field(default=2026)
     month: int = Field(default=1, ge=1, le=12)
     day: int = Field(default=1, ge=1, le=31)
+    items: list[BatchItem] = Field(
+        default_factory=list,
+        max_length=MAX_BATCH_ITEMS,
+        description="batch的计算和换算列表，按顺序返回每一项的结果",
+    )
+    variables: dict[str, float | list[float] | list[list[float]]] = Field(
+        default_factory=dict,
+        description="array表达式里使用的变量，数字、数字列表或者矩阵（二维列表）",
+    )
+
+
+def _calc(expr: str) -> dict:
+    """
+    数学计算
+    """
+    return {"result": simple_eval(expr)}
+
+
+def _convert(expr: str) -> dict:
+    """
+    单位换算， 解析 "10 m to km"
+    """
+    a, b, c = expr.replace(" to ", " ").split()
+    r = (float(a) * get_unit_registry()(b)).to(c)
+    return {"result": float(r.magnitude), "unit": str(r.units)}
+
+
+@lru_cache(maxsize=512)
+def _lunar_info(day: date) -> dict:
+    """
+    农历、生肖、节气、节假日， 同一天的结果不变
+    """
+    lunar = Solar.fromYmd(day.year, day.month, day.day).getLunar()
+    try:
+        _, name = calendar.get_holiday_detail(day)
+    except NotImplementedError:
+        # chinese_calendar只包含已经公布的年份
+        name = None
+
+    return {
+        "lunar": lunar.toString(),
+        "shengxiao": lunar.getYearShengXiao(),
+        "jieqi": lunar.getJieQi(),
+        "holiday": name or "无",
+    }
 
 
 def _now() -> dict:
@@ -35,21 +110,32 @@ def _now() -> dict:
     当前时间信息
     """
     dt = datetime.now()
-    lunar = Lunar.fromDate(dt)
-    is_hol, name = calendar.get_holiday_detail(dt.date())
 
     return {
         "datetime": dt.isoformat(),
         "date": dt.strftime("%Y-%m-%d"),
         "weekday": dt.strftime("%A"),
-        "lunar": lunar.toString(),
-        "shengxiao": lunar.getYearShengXiao(),
-        "jieqi": lunar.getJieQi(),
-        "holiday": name or "无",
+        **_lunar_info(dt.date()),
     }
 
 
-@registry.register
+def _batch(items: list[BatchItem]) -> list[dict]:
+    """
+    按顺序计算每一项， 一项出错不影响其它项
+    """
+    results = []
+    for item in items:
+        try:
+            results.append(
+                _calc(item.expr) if item.func == "calc" else _convert(item.expr)
+            )
+        except Exception as e:
+            results.append({"error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+# simple_eval和pint换算都是纯CPU计算， 病态表达式可能长时间占用CPU， 放到工作进程里执行
+@registry.register(timeout=10.0, mode="process")
 def smart_calc(p: SmartInput) -> Result:
     """
     smart_calc - 计算/换算/时间查询
@@ -57,31 +143,36 @@ def smart_calc(p: SmartInput) -> Result:
     calc:   数学计算  {"func": "calc", "expr": "2 + 3 * 4"}
     convert:单位换算  {"func": "convert", "expr": "10 m to km"}
     time:   时间查询  {"func": "time", "expr": "now"} 或 {"func": "time", "year": 2024, "month": 8, "day": 23}
+    batch:  批量计算  {"func": "batch", "items": [{"func": "convert", "expr": "1 mile to km"}, {"func": "calc", "expr": "2 ** 10"}]}
+    array:  数组计算  {"func": "array", "expr": "percentile(x, 90)", "variables": {"x": [3, 1, 4, 1, 5]}}
+            统计: sum mean median std var min max percentile quantile cumsum diff sort corrcoef cov
+            回归: linregress(x, y) polyfit(x, y, deg) polyval(p, x)
+            矩阵: a @ b dot inv det solve transpose eye reshape
+            创建: array arange linspace zeros ones， 数组之间支持 + - * / ** 和比较运算
+    多个计算或换算一次用batch完成，不要逐个调用
     """
     try:
         match p.func:
             case "calc":
-                return Result(result={"result": simple_eval(p.expr)})
+                return Result(result=_calc(p.expr))
             case "convert":
-                # 解析 "10 m to km"
-                a, b, c = p.expr.replace(" to ", " ").split()
-                r = (float(a) * ureg(b)).to(c)
-                return Result(
-                    result={"result": float(r.magnitude), "unit": str(r.units)}
-                )
+                return Result(result=_convert(p.expr))
+            case "batch":
+                return Result(result={"results": _batch(p.items)})
+            case "array":
+                from tools.array_eval import evaluate_array
+
+                return Result(result={"result": evaluate_array(p.expr, p.variables)})
             case "time":
                 # expr="now" 或指定日期转换
                 if p.expr == "now" or not any([p.year, p.month, p.day]):
                     return Result(result=_now())
 
                 # 公历转农历
-                solar = Solar.fromYmd(p.year, p.month, p.day)
-                lunar = solar.getLunar()
                 return Result(
                     result={
                         "solar": f"{p.year}-{p.month:02d}-{p.day:02d}",
-                        "lunar": lunar.toString(),
-                        "shengxiao": lunar.getYearShengXiao(),
+                        **_lunar_info(date(p.year, p.month, p.day)),
                     }
                 )
 
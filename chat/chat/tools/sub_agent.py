@@ -0,0 +1,285 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/sub_agent.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+有预算的子agent
+迭代次数、token用量、执行时间三种预算， 模型给出最终回答就立即结束
+预算用完的时候不再调用工具， 让模型根据已有的信息总结一次
+结果里报告每种预算用了多少
+"""
+
+from typing_extensions import Any, Literal
+from dataclasses import asdict, dataclass, field
+import time
+from tools import get_tool_registry, raise_if_cancelled, ToolCancelledError
+from tools.result import Result
+from model_manager import get_model_manager
+from tool_call_looper import ToolCallLooper
+from error_handling import handle_api_error, is_transient_error
+
+DEFAULT_SUB_AGENT_MODEL = "qwen3.5:4b"
+SUB_AGENT_SYSTEM_PROMPT = "你是一个子agent，帮助主agent探索任务，最后总结,主agent需要最后的总结内容，其他的消息列表直接废弃，所以最后的消息必须有内容而且是最终结果"
+_SUMMARY_PROMPT = "预算已经用完，不能再调用工具。请根据目前得到的信息给出最终总结。"
+# 模型接口暂时故障的时候最多重试的次数
+_MAX_RETRIES = 2
+
+StopReason = Literal[
+    "final_answer",
+    "max_iterations",
+    "token_budget",
+    "time_budget",
+    "cancelled",
+    "error",
+]
+
+
+@dataclass
+class SubAgentBudget:
+    """
+    子agent的预算
+    """
+
+    max_iterations: int = 8
+    token_budget: int = 100_000
+    time_budget: float = 300.0
+
+
+@dataclass
+class SubAgentUsage:
+    """
+    子agent实际使用的预算
+    """
+
+    iterations: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    elapsed_seconds: float = 0.0
+    stop_reason: StopReason = "final_answer"
+    retries: int = 0
+    budget: SubAgentBudget = field(default_factory=SubAgentBudget)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+            "total_tokens": self.total_tokens,
+        }
+
+
+class _BudgetExhausted(Exception):
+    """
+    某一种预算已经用完
+    """
+
+    def __init__(self, reason: StopReason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _response_tokens(response: Any) -> tuple[int, int]:
+    """
+    :return: 一次非流式响应的输入和输出token数， OpenAI兼容接口和ollama的字段不同
+    :rtype: tuple[int, int]
+    """
+    if usage := getattr(response, "usage", None):
+        return (
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+        )
+
+    return (
+        getattr(response, "prompt_eval_count", 0) or 0,
+        getattr(response, "eval_count", 0) or 0,
+    )
+
+
+def get_last_message(messages: list) -> str:
+    """
+    获取子agent输出的最后一条有内容的消息
+    :param messages: 消息列表
+    :type messages: list
+    :rtype: str
+    """
+    for message in reversed(messages):
+        if message["role"] == "assistant" and message.get("content"):
+            return message["content"]
+
+    return "没有总结内容"
+
+
+def _is_final_answer(messages: list) -> bool:
+    """
+    :return: 最后一条消息是不是模型给出的回答， 而不是工具结果
+    :rtype: bool
+    """
+    return (
+        bool(messages)
+        and messages[-1]["role"] == "assistant"
+        and bool(messages[-1].get("content"))
+    )
+
+
+def resolve_sub_agent_settings(
+    model: str | None = None,
+) -> tuple[str, SubAgentBudget]:
+    """
+    读取配置文件的sub_agent项目， 确定模型和默认预算
+    sub_agent.model是默认模型， sub_agent.model_aliases把别名映射到子模型名称
+    :param model: 模型别名或者子模型名称， None使用配置的默认模型
+    :type model: str | None
+    :return: 子模型名称和默认预算
+    :rtype: tuple[str, SubAgentBudget]
+    """
+    try:
+        settings = get_model_manager().config.get("sub_agent") or {}
+    except KeyError:
+        settings = {}
+
+    aliases = settings.get("model_aliases") or {}
+    name = model or settings.get("model") or DEFAULT_SUB_AGENT_MODEL
+    budget = SubAgentBudget(
+        **{
+            key: settings[key]
+            for key in ("max_iterations", "token_budget", "time_budget")
+            if key in settings
+        }
+    )
+    return aliases.get(name, name), budget
+
+
+class SubAgentRunner:
+    """
+    在预算之内运行一个子agent
+    """
+
+    def __init__(
+        self, model_name: str, budget: SubAgentBudget, deadline: float | None = None
+    ):
+        """
+        :param model_name: 子模型名称
+        :type model_name: str
+        :param budget: 预算
+        :type budget: SubAgentBudget
+        :param deadline: 外部的期限， time.monotonic()的时间， 和time_budget取较早的一个
+        :type deadline: float | None
+        """
+        self._model_name = model_name
+        self._budget = budget
+        self._deadline = deadline
+        self.usage = SubAgentUsage(budget=budget)
+
+    def _check_budget(self, start: float):
+        """
+        每一轮迭代之前检查是否已经取消或者超出预算
+        """
+        raise_if_cancelled()
+        now = time.monotonic()
+        if now - start >= self._budget.time_budget or (
+            self._deadline is not None and now >= self._deadline
+        ):
+            raise _BudgetExhausted("time_budget")
+        if self.usage.iterations >= self._budget.max_iterations:
+            raise _BudgetExhausted("max_iterations")
+        if self.usage.total_tokens >= self._budget.token_budget:
+            raise _BudgetExhausted("token_budget")
+
+        self.usage.iterations += 1
+
+    def _count_tokens(self, response: Any):
+        prompt_tokens, completion_tokens = _response_tokens(response)
+        self.usage.prompt_tokens += prompt_tokens
+        self.usage.completion_tokens += completion_tokens
+
+    def _summarize(self, model, messages: list) -> list:
+        """
+        迭代次数或者token用完的时候， 不带工具再调用一次模型， 得到总结
+        """
+        messages.append({"role": "user", "content": _SUMMARY_PROMPT})
+        model.tools = None
+        response = model.chat(messages=messages, tools=None, stream=False)
+        self._count_tokens(response)
+        model.response_handler(response, messages=messages)
+        return messages
+
+    def run(self, prompt: str) -> Result:
+        """
+        运行子agent， 模型不再调用工具的时候结束
+        :param prompt: 委派的任务内容
+        :type prompt: str
+        :return: 最后的总结和预算用量
+        :rtype: Result
+        """
+        start = time.monotonic()
+        messages = [
+            {"role": "system", "content": SUB_AGENT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+        model = get_model_manager().create_or_switch(model_name=self._model_name)
+        if model is None:
+            raise ValueError(
+                f"子agent的模型创建失败： {self._model_name}， 请在配置文件的sub_agent.model里替换一个模型。"
+            )
+
+        model.tools = get_tool_registry().to_call_tools(exclude={"task"})
+        looper = ToolCallLooper(enable_tools=True)
+        error: Exception | None = None
+        while True:
+            try:
+                messages = looper.run(
+                    model=model,
+                    messages=messages,
+                    is_online=model.is_online,
+                    exclude_tools={"task"},
+                    max_iterations=self._budget.max_iterations,
+                    on_iteration=lambda _: self._check_budget(start),
+                    on_response=self._count_tokens,
+                )
+                if not _is_final_answer(messages):
+                    # 迭代次数用完的时候looper正常返回， 最后一条消息是工具结果
+                    raise _BudgetExhausted("max_iterations")
+                self.usage.stop_reason = "final_answer"
+                break
+            except _BudgetExhausted as e:
+                self.usage.stop_reason = e.reason
+                if e.reason != "time_budget":
+                    try:
+                        messages = self._summarize(model, messages)
+                    except Exception as summary_error:
+                        error = summary_error
+                break
+            except ToolCancelledError as e:
+                self.usage.stop_reason = "cancelled"
+                error = e
+                break
+            except Exception as e:
+                # 只有暂时故障才重试， 重试也计入迭代次数和时间预算
+                if not is_transient_error(e):
+                    self.usage.stop_reason = "error"
+                    error = e
+                    break
+
+                self.usage.retries += 1
+                if self.usage.retries > _MAX_RETRIES or not handle_api_error(
+                    err=e,
+                    messages=messages,
+                    call_count=self.usage.retries,
+                    pop_message=False,
+                ):
+                    self.usage.stop_reason = "error"
+                    error = e
+                    break
+
+        self.usage.elapsed_seconds = time.monotonic() - start
+        return Result(
+            result={
+                "last_message": get_last_message(messages),
+                "usage": self.usage.to_dict(),
+            },
+            error=error,
+        )
@@ -0,0 +1,464 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/table_query.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+分块执行的表格查询
+过滤条件在每一块上生成布尔掩码， 分组聚合用np.unique编码之后bincount， 每一块的部分结果合并到按分组键索引的状态里
+没有排序的时候找到足够的行就提前结束， 有排序的时候每一块只保留前limit行
+"""
+
+from typing_extensions import Any, Iterator
+import math
+import numpy as np
+from tools.table_reader import read_chunks
+
+# 分组数量上限， 防止按高基数列分组占满内存
+MAX_GROUPS = 100_000
+_AGGREGATES = ("count", "sum", "mean", "min", "max")
+
+
+def _as_float(column: np.ndarray) -> np.ndarray:
+    """
+    :return: 数字形式的列， 不能转换的值为NaN
+    :rtype: np.ndarray
+    """
+    if column.dtype.kind == "f":
+        return column
+
+    def convert(value) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return math.nan
+
+    return np.fromiter((convert(value) for value in column), np.float64, len(column))
+
+
+def _is_null(column: np.ndarray) -> np.ndarray:
+    """
+    :return: 每一行是否为空值
+    :rtype: np.ndarray
+    """
+    if column.dtype.kind == "f":
+        return np.isnan(column)
+
+    return np.fromiter(
+        (value is None or value == "" for value in column), bool, len(column)
+    )
+
+
+def _as_text(column: np.ndarray) -> np.ndarray:
+    """
+    :return: 文本形式的列， 空值为空字符串
+    :rtype: np.ndarray
+    """
+    if column.dtype.kind == "f":
+        # 和json_value一样， 整数值的浮点数不带小数部分
+        text = column.astype(str)
+        integral = (np.mod(column, 1) == 0) & (np.abs(column) < 2**53)
+        text[integral] = column[integral].astype(np.int64).astype(str)
+        text[np.isnan(column)] = ""
+        return text
+
+    return np.array(["" if value is None else str(value) for value in column], str)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _numeric_value(column: np.ndarray, value: Any) -> float | None:
+    """
+    :return: 按数字比较的时候的值， 数字列上的数字文本也按数字比较； 按文本比较的时候返回None
+    :rtype: float | None
+    """
+    if _is_number(value):
+        return float(value)
+    if column.dtype.kind == "f" and isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _compare(left: np.ndarray, op: str, right: Any) -> np.ndarray:
+    """
+    :return: 逐元素比较的结果
+    :rtype: np.ndarray
+    """
+    match op:
+        case "==":
+            return left == right
+        case "!=":
+            return left != right
+        case ">":
+            return left > right
+        case ">=":
+            return left >= right
+        case "<":
+            return left < right
+        case "<=":
+            return left <= right
+        case _:
+            raise ValueError(f"不支持的比较运算： {op}")
+
+
+def _column(chunk: dict[str, np.ndarray], name: str, rows: int) -> np.ndarray:
+    """
+    :return: 块里的列， 这一块没有这一列的时候全部是空值
+    :rtype: np.ndarray
+    """
+    column = chunk.get(name)
+    if column is None:
+        return np.full(rows, np.nan)
+    return column
+
+
+def condition_mask(column: np.ndarray, op: str, value: Any) -> np.ndarray:
+    """
+    在一列上计算过滤条件
+    :param column: 列
+    :type column: np.ndarray
+    :param op: 比较运算
+    :type op: str
+    :param value: 比较的值
+    :type value: Any
+    :return: 布尔掩码
+    :rtype: np.ndarray
+    """
+    null = _is_null(column)
+    if op == "is_null":
+        return null
+    if op == "not_null":
+        return ~null
+
+    if op == "contains":
+        text = np.char.lower(_as_text(column))
+        return (np.char.find(text, str(value).lower()) >= 0) & ~null
+
+    if op == "in":
+        values = value if isinstance(value, list) else [value]
+        numbers = [_numeric_value(column, v) for v in values]
+        if values and all(number is not None for number in numbers):
+            return np.isin(_as_float(column), np.array(numbers, np.float64))
+        return np.isin(_as_text(column), [str(v) for v in values]) & ~null
+
+    number = _numeric_value(column, value)
+    if number is not None:
+        floats = _as_float(column)
+        return _compare(floats, op, number) & ~np.isnan(floats)
+
+    target = "" if value is None else str(value)
+    return _compare(_as_text(column), op, target) & ~null
+
+
+def json_value(value) -> Any:
+    """
+    :return: 可以序列化成JSON的值， NaN为None， 整数值的浮点数转换成整数
+    :rtype: Any
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return None
+        if value.is_integer() and abs(value) < 2**53:
+            return int(value)
+    return value
+
+
+def _group_key(value) -> Any:
+    """
+    :return: object列里的分组键
+        同一列在别的块里可能是数字列， 数字用json_value的值， 和数字列里的同一个值在一个分组
+    :rtype: Any
+    """
+    if value is None:
+        return None
+    if _is_number(value):
+        return json_value(value)
+    return str(value)
+
+
+class _GroupState:
+    """
+    分组聚合的中间状态， 每个聚合保存计数、总和、最小值、最大值
+    """
+
+    def __init__(self, aggregates: list[tuple[str, str | None]]):
+        self.aggregates = aggregates
+        self.index: dict[tuple, int] = {}
+        self.counts: list[np.ndarray] = [np.zeros(0) for _ in aggregates]
+        self.sums: list[np.ndarray] = [np.zeros(0) for _ in aggregates]
+        self.mins: list[np.ndarray] = [np.zeros(0) for _ in aggregates]
+        self.maxs: list[np.ndarray] = [np.zeros(0) for _ in aggregates]
+
+    def _group_ids(self, keys: list[tuple]) -> np.ndarray:
+        """
+        把这一块的分组键映射到全局编号， 新的分组追加到状态末尾
+        """
+        ids = np.empty(len(keys), np.int64)
+        for position, key in enumerate(keys):
+            group = self.index.get(key)
+            if group is None:
+                if len(self.index) >= MAX_GROUPS:
+                    raise ValueError(
+                        f"分组数量超过{MAX_GROUPS}， 请选择基数更低的分组列或者增加过滤条件"
+                    )
+                group = self.index[key] = len(self.index)
+            ids[position] = group
+
+        grow = len(self.index) - len(self.counts[0]) if self.aggregates else 0
+        if grow > 0:
+            for values, fill in (
+                (self.counts, 0.0),
+                (self.sums, 0.0),
+                (self.mins, math.inf),
+                (self.maxs, -math.inf),
+            ):
+                for i, array in enumerate(values):
+                    values[i] = np.concatenate([array, np.full(grow, fill)])
+        return ids
+
+    def update(self, chunk: dict[str, np.ndarray], group_by: list[str], mask):
+        """
+        合并一块数据的部分聚合结果
+        """
+        rows = int(mask.sum())
+        if rows == 0:
+            return
+
+        codes = np.zeros(rows, np.int64)
+        key_columns = []
+        for key_name in group_by:
+            column = _column(chunk, key_name, len(mask))[mask]
+            if column.dtype.kind == "f":
+                uniques, inverse = np.unique(column, return_inverse=True)
+                count = len(uniques)
+            else:
+                keys = np.empty(len(column), dtype=object)
+                keys[:] = [_group_key(value) for value in column]
+                column = keys
+                # 数字和文本混合的object数组不能排序， 用字典编码
+                encoding: dict = {}
+                inverse = np.fromiter(
+                    (encoding.setdefault(key, len(encoding)) for key in column),
+                    np.int64,
+                    len(column),
+                )
+                count = len(encoding)
+            # 每加一列重新压缩编码， 多列分组也不会溢出
+            _, codes = np.unique(codes * count + inverse, return_inverse=True)
+            key_columns.append(column)
+
+        _, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        groups = [
+            tuple(json_value(column[row]) for column in key_columns) for row in first
+        ]
+        ids = self._group_ids(groups)[inverse]
+        size = len(self.index)
+
+        for i, (func, name) in enumerate(self.aggregates):
+            if name is None:
+                self.counts[i] += np.bincount(ids, minlength=size)
+                continue
+
+            raw = _column(chunk, name, len(mask))[mask]
+            if func == "count":
+                self.counts[i] += np.bincount(ids, ~_is_null(raw), minlength=size)
+                continue
+
+            values = _as_float(raw)
+            valid = ~np.isnan(values)
+            self.counts[i] += np.bincount(ids, valid, minlength=size)
+            self.sums[i] += np.bincount(ids, np.where(valid, values, 0), minlength=size)
+            np.minimum.at(self.mins[i], ids[valid], values[valid])
+            np.maximum.at(self.maxs[i], ids[valid], values[valid])
+
+    def rows(self) -> list[list]:
+        """
+        :return: 每个分组一行， 分组键在前， 聚合结果在后
+        :rtype: list[list]
+        """
+        result = []
+        for key, group in self.index.items():
+            row = list(key)
+            for i, (func, _) in enumerate(self.aggregates):
+                count = self.counts[i][group]
+                if func == "count":
+                    row.append(int(count))
+                elif count == 0:
+                    row.append(None)
+                elif func == "sum":
+                    row.append(json_value(self.sums[i][group]))
+                elif func == "mean":
+                    row.append(float(self.sums[i][group] / count))
+                elif func == "min":
+                    row.append(json_value(self.mins[i][group]))
+                else:
+                    row.append(json_value(self.maxs[i][group]))
+            result.append(row)
+        return result
+
+
+def _sort_rows(rows: list[list], index: int, descending: bool) -> list[list]:
+    """
+    按一列排序， 空值总是在最后； 数字和文本混合的时候数字在前
+    """
+    present = [row for row in rows if row[index] is not None]
+    missing = [row for row in rows if row[index] is None]
+    present.sort(
+        key=lambda row: (
+            (0, row[index], "") if _is_number(row[index]) else (1, 0, str(row[index]))
+        ),
+        reverse=descending,
+    )
+    return present + missing
+
+
+def run_query(
+    path,
+    table_format: str,
+    select: list[str] | None = None,
+    where: list[tuple[str, str, Any]] | None = None,
+    group_by: list[str] | None = None,
+    aggregates: list[tuple[str, str | None]] | None = None,
+    order_by: str | None = None,
+    descending: bool = False,
+    limit: int = 50,
+) -> dict:
+    """
+    执行查询
+    :param path: 文件路径
+    :type path: Path
+    :param table_format: csv、tsv、jsonl或者parquet
+    :type table_format: str
+    :param select: 返回的列， 没有聚合的时候有效， None返回全部列
+    :type select: list[str] | None
+    :param where: (列, 运算, 值)条件列表， 全部满足的行才参与计算
+    :type where: list[tuple[str, str, Any]] | None
+    :param group_by: 分组列
+    :type group_by: list[str] | None
+    :param aggregates: (聚合函数, 列)列表， count的列可以是None表示行数
+    :type aggregates: list[tuple[str, str | None]] | None
+    :param order_by: 排序的列或者聚合结果的名称
+    :type order_by: str | None
+    :param descending: 是否从大到小
+    :type descending: bool
+    :param limit: 最多返回的行数
+    :type limit: int
+    :return: columns、rows以及扫描和匹配的行数
+    :rtype: dict
+    """
+    where = where or []
+    group_by = group_by or []
+    aggregates = aggregates or ([("count", None)] if group_by else [])
+    for func, _ in aggregates:
+        if func not in _AGGREGATES:
+            raise ValueError(f"不支持的聚合函数： {func}")
+
+    needed: set[str] | None = None
+    if aggregates:
+        needed = {name for name, _, _ in where} | set(group_by)
+        needed |= {name for _, name in aggregates if name}
+    elif select:
+        needed = {name for name, _, _ in where} | set(select)
+        if order_by:
+            needed.add(order_by)
+
+    chunks: Iterator[tuple[int, dict[str, np.ndarray]]] = read_chunks(
+        path, table_format, needed
+    )
+    seen: set[str] = set()
+    scanned = matched = 0
+    truncated = False
+
+    if aggregates:
+        state = _GroupState(aggregates)
+        for rows, chunk in chunks:
+            seen.update(chunk)
+            mask = np.ones(rows, bool)
+            for name, op, value in where:
+                mask &= condition_mask(_column(chunk, name, rows), op, value)
+            scanned += rows
+            matched += int(mask.sum())
+            state.update(chunk, group_by, mask)
+
+        names = [f"{func}_{name}" if name else func for func, name in aggregates]
+        columns = group_by + names
+        result_rows = state.rows()
+        if not group_by and not result_rows:
+            # 没有匹配的行也返回一行聚合结果， 和SQL一致
+            result_rows = [[0 if func == "count" else None for func, _ in aggregates]]
+    else:
+        columns = list(select or [])
+        if order_by and columns and order_by not in columns:
+            columns.append(order_by)
+        result_rows = []
+        for rows, chunk in chunks:
+            seen.update(chunk)
+            mask = np.ones(rows, bool)
+            for name, op, value in where:
+                mask &= condition_mask(_column(chunk, name, rows), op, value)
+            scanned += rows
+            indices = np.flatnonzero(mask)
+            matched += len(indices)
+            if not select:
+                columns += [name for name in chunk if name not in columns]
+                # JSON Lines后面的块可能出现新的列， 之前的行补上空值
+                for row in result_rows:
+                    row += [None] * (len(columns) - len(row))
+            if order_by and order_by not in columns:
+                raise ValueError(f"列不存在： {order_by}")
+
+            if order_by:
+                # 数字列先在块内用argpartition取出前limit行， 减少逐行转换
+                key = _column(chunk, order_by, rows)
+                if key.dtype.kind == "f" and len(indices) > limit:
+                    values = key[indices]
+                    values = np.where(
+                        np.isnan(values), np.inf, -values if descending else values
+                    )
+                    indices = indices[np.argpartition(values, limit)[:limit]]
+            elif len(result_rows) + len(indices) >= limit:
+                indices = indices[: limit - len(result_rows)]
+                truncated = True
+
+            result_rows += [
+                [json_value(_column(chunk, name, rows)[row]) for name in columns]
+                for row in indices
+            ]
+            if order_by:
+                result_rows = _sort_rows(
+                    result_rows, columns.index(order_by), descending
+                )[:limit]
+            if truncated:
+                break
+
+    referenced = {name for name, _, _ in where} | set(group_by) | set(select or [])
+    referenced |= {name for _, name in aggregates if name}
+    if missing := sorted(referenced - seen):
+        raise ValueError(f"列不存在： {missing}")
+
+    if order_by and aggregates:
+        if order_by not in columns:
+            raise ValueError(f"排序列不在结果里： {order_by}， 可选： {columns}")
+        result_rows = _sort_rows(result_rows, columns.index(order_by), descending)
+
+    if len(result_rows) > limit:
+        result_rows = result_rows[:limit]
+        truncated = True
+
+    result = {
+        "columns": columns,
+        "rows": result_rows,
+        "scanned_rows": scanned,
+        "matched_rows": matched,
+    }
+    if truncated:
+        # 提前结束的时候没有扫描全部数据， 匹配行数是下限
+        result["truncated"] = True
+    return result
@@ -0,0 +1,253 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/table_reader.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+分块读取表格文件
+CSV、JSON Lines、Parquet按固定行数分块读取， 每一块是列名到numpy数组的字典， 内存占用和文件大小无关
+数字列统一转换成float64（空值为NaN）， 其它列是object数组（空值为None）
+类型按块判断， 同一列在不同的块里可能不同， object数组里的数字单元格也是数字， 按值处理的结果和类型无关
+"""
+
+from typing_extensions import Iterator, Literal
+from pathlib import Path
+import csv
+import json
+import math
+import numpy as np
+from util import detect_file_encoding
+
+try:
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:  # Parquet是可选功能， 需要安装pyarrow
+    pq = None
+
+TableFormat = Literal["auto", "csv", "tsv", "jsonl", "parquet"]
+CHUNK_ROWS = 65536
+_SUFFIX_FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+
+
+def detect_format(path: Path, table_format: TableFormat) -> str:
+    """
+    :param path: 文件路径
+    :type path: Path
+    :param table_format: 指定的格式， auto按后缀名判断
+    :type table_format: TableFormat
+    :return: 文件格式
+    :rtype: str
+    """
+    if table_format != "auto":
+        return table_format
+
+    if fmt := _SUFFIX_FORMATS.get(path.suffix.lower()):
+        return fmt
+
+    raise ValueError(f"无法根据后缀名判断文件格式： {path.name}， 请指定format")
+
+
+def _has_leading_zero(text: np.ndarray) -> np.ndarray:
+    """
+    :return: 每个单元格是否以多余的0开头， 比如00123这样的编号
+    :rtype: np.ndarray
+    """
+    digits = np.char.lstrip(np.char.strip(text), "+-")
+    candidates = np.char.startswith(digits, "0") & (np.char.str_len(digits) > 1)
+    leading = np.zeros(len(text), bool)
+    leading[candidates] = [value[1].isdigit() for value in digits[candidates]]
+    return leading
+
+
+def _cell_value(value: str) -> str | float:
+    """
+    :return: 混合列里的单元格， 数字文本转换成float， 编号之类的文本保持原样
+    :rtype: str | float
+    """
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return number if math.isfinite(number) else value
+
+
+def text_column(values: list) -> np.ndarray:
+    """
+    把文本值转换成列， 全部是数字的时候转换成float64
+    以0开头的编号（比如00123）保持文本， 其它列里的数字单元格转换成float， 和数字列里的同一个值相等
+    :param values: 单元格文本， 空字符串表示空值
+    :type values: list
+    :return: float64或者object数组
+    :rtype: np.ndarray
+    """
+    text = np.array(values, dtype=str)
+    empty = text == ""
+    leading_zero = _has_leading_zero(text)
+    if not leading_zero.any():
+        try:
+            return np.where(empty, "nan", text).astype(np.float64)
+        except ValueError:
+            pass
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = [
+        None if value == "" else value if zero else _cell_value(value)
+        for value, zero in zip(values, leading_zero)
+    ]
+    return column
+
+
+def value_column(values: list) -> np.ndarray:
+    """
+    把JSON值转换成列， 全部是数字或者空值的时候转换成float64
+    :param values: JSON值
+    :type values: list
+    :return: float64或者object数组
+    :rtype: np.ndarray
+    """
+    if all(
+        value is None
+        or (isinstance(value, (int, float)) and not isinstance(value, bool))
+        for value in values
+    ):
+        return np.array(
+            [np.nan if value is None else value for value in values], dtype=np.float64
+        )
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _delimited_chunks(
+    path: Path, delimiter: str, columns: set[str] | None
+) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+    """
+    分块读取CSV和TSV， 第一行是列名
+    """
+    encoding = detect_file_encoding(str(path))
+    with path.open(encoding=encoding, errors="replace", newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        wanted = [
+            (index, name)
+            for index, name in enumerate(header)
+            if columns is None or name in columns
+        ]
+        width = len(header)
+        rows: list[list[str]] = []
+        for row in reader:
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            rows.append(row)
+            if len(rows) >= CHUNK_ROWS:
+                yield (
+                    len(rows),
+                    {
+                        name: text_column([r[index] for r in rows])
+                        for index, name in wanted
+                    },
+                )
+                rows = []
+
+        if rows:
+            yield (
+                len(rows),
+                {name: text_column([r[index] for r in rows]) for index, name in wanted},
+            )
+
+
+def _jsonl_chunks(
+    path: Path, columns: set[str] | None
+) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+    """
+    分块读取JSON Lines， 每一行是一个对象， 缺少的键作为空值
+    """
+
+    def build(rows: list[dict]) -> tuple[int, dict[str, np.ndarray]]:
+        names: dict[str, None] = {}
+        for row in rows:
+            names.update(dict.fromkeys(row))
+        if columns is not None:
+            names = {name: None for name in names if name in columns}
+        return len(rows), {
+            name: value_column([row.get(name) for row in rows]) for name in names
+        }
+
+    encoding = detect_file_encoding(str(path))
+    with path.open(encoding=encoding, errors="replace") as f:
+        rows: list[dict] = []
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"第{number}行不是JSON对象")
+            rows.append(row)
+            if len(rows) >= CHUNK_ROWS:
+                yield build(rows)
+                rows = []
+
+        if rows:
+            yield build(rows)
+
+
+def _parquet_chunks(
+    path: Path, columns: set[str] | None
+) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+    """
+    用pyarrow按批读取Parquet， 只读取需要的列
+    """
+    if pq is None:
+        raise ImportError("读取Parquet需要安装pyarrow： pip install pyarrow")
+
+    parquet = pq.ParquetFile(path)
+    names = [
+        name
+        for name in parquet.schema_arrow.names
+        if columns is None or name in columns
+    ]
+    for batch in parquet.iter_batches(batch_size=CHUNK_ROWS, columns=names):
+        chunk = {}
+        for name, array in zip(batch.schema.names, batch.columns):
+            values = array.to_numpy(zero_copy_only=False)
+            if values.dtype.kind in "iuf":
+                chunk[name] = values.astype(np.float64)
+            else:
+                chunk[name] = value_column(values.tolist())
+        yield batch.num_rows, chunk
+
+
+def read_chunks(
+    path: Path, table_format: str, columns: set[str] | None = None
+) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+    """
+    分块读取表格文件
+    :param path: 文件路径
+    :type path: Path
+    :param table_format: csv、tsv、jsonl或者parquet
+    :type table_format: str
+    :param columns: 只读取这些列， None读取全部
+    :type columns: set[str] | None
+    :return: 每一块的行数和列名到数组的字典， 只读取的列可能是空的， 行数要单独返回
+    :rtype: Iterator[tuple[int, dict[str, np.ndarray]]]
+    """
+    if table_format == "csv":
+        return _delimited_chunks(path, ",", columns)
+    if table_format == "tsv":
+        return _delimited_chunks(path, "\t", columns)
+    if table_format == "jsonl":
+        return _jsonl_chunks(path, columns)
+    if table_format == "parquet":
+        return _parquet_chunks(path, columns)
+
+    raise ValueError(f"不支持的文件格式： {table_format}")
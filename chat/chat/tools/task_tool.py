@@ -6,72 +6,119 @@
 """
 实现了一个Sub Agent
 该Agent拥有自己的消息列表， 不污染主消息列表
-完成后返回最后的总结内容， 其他历史消息直接丢弃
+完成后返回最后的总结内容和预算用量， 其他历史消息直接丢弃
+多个互相独立的任务可以同时委派， 每个任务一个子agent并发执行， 共用一个期限
 """
 
-from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor, wait
+import contextvars
+import time
+from pydantic import BaseModel, Field, model_validator
 from tools import get_tool_registry
 from tools.result import Result
-from model_manager import get_model_manager
-from tool_call_looper import ToolCallLooper
-from error_handling import handle_api_error
+from tools.sub_agent import SubAgentRunner, resolve_sub_agent_settings
 
 
 registry = get_tool_registry()
+# 同时运行的子agent数量上限
+MAX_PARALLEL_AGENTS = 3
+# 全部子agent共用的期限（秒）， 比工具的执行期限短， 留出返回部分结果的时间
+_SHARED_DEADLINE = 840.0
 
 
 class SubAgentInput(BaseModel):
-    prompt: str = Field(description="Prompt： 委派给子agent的任务内容")
+    prompt: str = Field(default="", description="Prompt： 委派给子agent的任务内容")
+    prompts: list[str] = Field(
+        default_factory=list,
+        max_length=6,
+        description="多个互相独立的任务，每个任务一个子agent并发执行，按顺序返回每个任务的总结；和prompt二选一",
+    )
+    model: str | None = Field(
+        default=None,
+        description="子agent使用的模型别名或者子模型名称，不提供使用配置文件sub_agent.model",
+    )
+    max_iterations: int | None = Field(
+        default=None, ge=1, le=30, description="每个子agent最多调用模型的次数"
+    )
+    token_budget: int | None = Field(
+        default=None, ge=1000, description="每个子agent最多使用的token数"
+    )
+    time_budget: float | None = Field(
+        default=None, ge=10, le=840, description="每个子agent最长的执行时间（秒）"
+    )
 
+    @model_validator(mode="after")
+    def check_prompts(self) -> "SubAgentInput":
+        if not self.prompt and not self.prompts:
+            raise ValueError("必须提供prompt或者prompts参数")
+        return self
 
-def get_last_message(messages: list) -> str:
+
+def _run_sub_agent(p: SubAgentInput, prompt: str, deadline: float) -> Result:
     """
-    获取task工具LLM输出的最后一条消息
-    :param messages: 消息列表
-    :type messages: list
-    :rtype: str
+    在预算之内运行一个子agent直到得到总结
+    :param p: 工具参数， 提供模型和预算
+    :type p: SubAgentInput
+    :param prompt: 委派的任务内容
+    :type prompt: str
+    :param deadline: 共用的期限， time.monotonic()的时间
+    :type deadline: float
+    :return: 子agent的最后一条消息和预算用量
+    :rtype: Result
     """
-    for i in range(len(messages), -1, -1):
-        if messages[i]["role"] == "assistant":
-            return messages[i]["content"]
+    model_name, budget = resolve_sub_agent_settings(p.model)
+    for name in ("max_iterations", "token_budget", "time_budget"):
+        if (value := getattr(p, name)) is not None:
+            setattr(budget, name, value)
 
-    return "没有总结内容"
+    return SubAgentRunner(model_name, budget, deadline=deadline).run(prompt)
 
 
-@registry.register
+@registry.register(timeout=900.0)
 def task(p: SubAgentInput) -> Result:
     """
     Sub Agent， 协助主agent完成任务
     拥有自己的消息列表，不会污染主消息列表
     完成后返回最终结果，历史消息全部丢弃
+    多个互相独立的任务放到prompts里一次委派，子agent并发执行，耗时取决于最慢的任务
     """
-    messages = [
-        {
-            "role": "system",
-            "content": "你是一个子agent，帮助主agent探索任务，最后总结,主agent需要最后的总结内容，其他的消息列表直接废弃，所以最后的消息必须有内容而且是最终结果",
-        },
-        {"role": "user", "content": p.prompt},
-    ]
-    model = get_model_manager().create_or_switch(model_name="qwen3.5:4b")
-    if model is None:
-        raise ValueError("模型创建失败，请替换一个模型。")
-
-    model.max_tokens = 8000
+    deadline = time.monotonic() + _SHARED_DEADLINE
+    if not p.prompts:
+        return _run_sub_agent(p, p.prompt, deadline)
 
-    model.tools = get_tool_registry().to_call_tools(exclude={"task"})
-    looper = ToolCallLooper(enable_tools=True)
-    tool_result = {}
-    for i in range(3):
-        try:
-            messages = looper.run(
-                model=model, messages=messages, is_online=model.is_online
+    prompts = ([p.prompt] if p.prompt else []) + p.prompts
+    executor = ThreadPoolExecutor(
+        max_workers=min(len(prompts), MAX_PARALLEL_AGENTS),
+        thread_name_prefix="sub-agent",
+    )
+    try:
+        # 每个子agent复制一份上下文， 工作线程里也能检查当前工具调用是否已经取消
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, _run_sub_agent, p, prompt, deadline
             )
-            tool_result["last_message"] = get_last_message(messages=messages)
+            for prompt in prompts
+        ]
+        wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    finally:
+        # 超过期限的子agent会在下一轮迭代之前结束， 不在这里等待
+        executor.shutdown(wait=False, cancel_futures=True)
 
-        except Exception as e:
-            if not handle_api_error(
-                err=e, messages=messages, call_count=i, pop_message=True
-            ):
-                return Result(error=e, result={})
+    results = []
+    for index, future in enumerate(futures):
+        item: dict = {"index": index}
+        if not future.done() or future.cancelled():
+            item["error"] = "子agent超过了共用的期限， 没有完成"
+        elif future.exception() is not None:
+            item["error"] = str(future.exception())
+        else:
+            result = future.result()
+            item.update(result.result)
+            if result.error:
+                item["error"] = str(result.error)
+        results.append(item)
 
-    return Result(result=tool_result)
+    error = None
+    if all("error" in item for item in results):
+        error = RuntimeError("所有子agent都没有完成")
+    return Result(result={"results": results}, error=error)
@@ -0,0 +1,253 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/text_file.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+按行读取大文本文件
+开头的若干行增量读取， 结尾的若干行从文件末尾向前定位读取， 都不需要读入整个文件
+任意位置的分页依靠稀疏的行偏移索引， 索引按(路径, 大小, 修改时间)缓存
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+import bisect
+import mmap
+from util import detect_file_encoding
+
+# 行索引每个分块的大小， 分块内的换行统计在C代码里完成
+_INDEX_CHUNK = 1024 * 1024
+# 超过这个大小的文件用mmap建立索引
+_MMAP_THRESHOLD = 8 * 1024 * 1024
+_READ_BLOCK = 64 * 1024
+_INDEX_CACHE_SIZE = 32
+
+
+def _is_line_based(encoding: str) -> bool:
+    """
+    :return: 编码里的换行是否是单字节的\\n， UTF-16/32不能按字节查找换行
+    :rtype: bool
+    """
+    return not encoding.lower().replace("-", "").startswith(("utf16", "utf32"))
+
+
+class _LineIndex:
+    """
+    稀疏的行偏移索引
+    记录每个分块开头之前有多少个换行， 定位某一行的时候只需要扫描一个分块
+    """
+
+    def __init__(self, path: Path, size: int):
+        """
+        扫描整个文件建立索引
+        :param path: 文件路径
+        :type path: Path
+        :param size: 文件大小
+        :type size: int
+        """
+        self.path = path
+        self.size = size
+        # newlines[i]是第i个分块开头之前的换行数量
+        self.newlines: list[int] = []
+        count = 0
+        with path.open("rb") as f:
+            if size >= _MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start in range(0, size, _INDEX_CHUNK):
+                        self.newlines.append(count)
+                        # 切片只复制一个分块， 内存占用和文件大小无关
+                        count += mm[start : start + _INDEX_CHUNK].count(b"\n")
+            else:
+                while chunk := f.read(_INDEX_CHUNK):
+                    self.newlines.append(count)
+                    count += chunk.count(b"\n")
+
+        ends_with_newline = count > 0 and self._last_byte() == b"\n"
+        self.total_lines = count if ends_with_newline or size == 0 else count + 1
+
+    def _last_byte(self) -> bytes:
+        """
+        :return: 文件最后一个字节
+        :rtype: bytes
+        """
+        with self.path.open("rb") as f:
+            f.seek(-1, 2)
+            return f.read(1)
+
+    def line_offset(self, line: int) -> int:
+        """
+        :param line: 从0开始的行号
+        :type line: int
+        :return: 这一行开头的字节偏移， 超出文件的时候返回文件大小
+        :rtype: int
+        """
+        if line <= 0:
+            return 0
+        if line >= self.total_lines:
+            return self.size
+
+        # 第line行从第line个换行之后开始， 找到包含这个换行的分块
+        chunk = bisect.bisect_left(self.newlines, line) - 1
+        remaining = line - self.newlines[chunk]
+        with self.path.open("rb") as f:
+            f.seek(chunk * _INDEX_CHUNK)
+            position = chunk * _INDEX_CHUNK
+            while True:
+                block = f.read(_READ_BLOCK)
+                found = block.count(b"\n")
+                if found < remaining:
+                    remaining -= found
+                    position += len(block)
+                    continue
+
+                index = -1
+                for _ in range(remaining):
+                    index = block.find(b"\n", index + 1)
+                return position + index + 1
+
+
+_index_cache: OrderedDict[tuple[str, int, int], _LineIndex] = OrderedDict()
+_cache_lock = Lock()
+
+
+def _get_line_index(path: Path) -> _LineIndex:
+    """
+    获取文件的行索引， 文件大小和修改时间不变的时候使用缓存
+    :param path: 文件路径
+    :type path: Path
+    :return: 行索引
+    :rtype: _LineIndex
+    """
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        if index := _index_cache.get(key):
+            _index_cache.move_to_end(key)
+            return index
+
+    index = _LineIndex(path, stat.st_size)
+    with _cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+    return index
+
+
+def _decode_lines(data: bytes, encoding: str) -> list[str]:
+    """
+    :return: 解码之后按行拆分的文本
+    :rtype: list[str]
+    """
+    # 只按\n拆分， 和行索引的计数一致； str.splitlines还会在\r、\x0c、\u2028等字符处拆分
+    text = data.decode(encoding, errors="replace")
+    if not text:
+        return []
+
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+    return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+
+def tail_lines(path: Path, lines: int, skip: int = 0, encoding: str = "utf-8") -> str:
+    """
+    从文件末尾向前读取， 直到凑够需要的行数
+    :param path: 文件路径
+    :type path: Path
+    :param lines: 返回的行数
+    :type lines: int
+    :param skip: 跳过最后的若干行， 用来向前翻页
+    :type skip: int
+    :param encoding: 文件编码
+    :type encoding: str
+    :return: 最后若干行文本
+    :rtype: str
+    """
+    wanted = lines + skip
+    with path.open("rb") as f:
+        position = f.seek(0, 2)
+        # 从后向前读到的块， 最后反转之后只拼接一次
+        blocks: list[bytes] = []
+        newlines = 0
+        # 多读一个换行， 保证第一行是完整的
+        while position > 0 and newlines <= wanted:
+            step = min(_READ_BLOCK, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+
+    data = b"".join(reversed(blocks))
+    selected = _decode_lines(data, encoding)[-wanted:]
+    return "\n".join(selected[: max(0, len(selected) - skip)])
+
+
+def _read_lines_from(f, count: int) -> tuple[bytes, bool]:
+    """
+    从当前位置增量读取若干行
+    :return: 读到的内容， 后面是否还有更多内容
+    :rtype: tuple[bytes, bool]
+    """
+    data = b"".join(f.readline() for _ in range(count))
+    return data, bool(f.read(1))
+
+
+def read_lines(
+    path: Path,
+    offset: int = 0,
+    limit: int | None = None,
+    tail: bool = False,
+) -> dict:
+    """
+    按行读取文本文件的一部分
+    :param path: 文件路径
+    :type path: Path
+    :param offset: 开头模式下从第几行开始（从0开始）； 结尾模式下跳过最后的几行
+    :type offset: int
+    :param limit: 最多返回的行数， None表示到文件结束
+    :type limit: int | None
+    :param tail: 是否从文件末尾读取
+    :type tail: bool
+    :return: 读取的内容和分页信息
+    :rtype: dict
+    """
+    if path.stat().st_size == 0:
+        raise ValueError("文件是空的")
+
+    encoding = detect_file_encoding(str(path))
+    if not _is_line_based(encoding):
+        # 多字节换行的编码没法按字节定位， 只能整体解码
+        all_lines = _decode_lines(path.read_bytes(), encoding)
+        if tail:
+            end: int | None = max(0, len(all_lines) - offset)
+            start = max(0, end - limit) if limit and end else 0
+        else:
+            start, end = offset, (offset + limit if limit else None)
+        return {"file_content": "\n".join(all_lines[start:end]), "encoding": encoding}
+
+    if tail:
+        lines = limit if limit else _get_line_index(path).total_lines
+        return {
+            "file_content": tail_lines(path, lines, skip=offset, encoding=encoding),
+            "encoding": encoding,
+        }
+
+    start = _get_line_index(path).line_offset(offset) if offset else 0
+    with path.open("rb") as f:
+        f.seek(start)
+        if limit is None:
+            data, has_more = f.read(), False
+        else:
+            data, has_more = _read_lines_from(f, limit)
+
+    result: dict = {
+        "file_content": "\n".join(_decode_lines(data, encoding)),
+        "encoding": encoding,
+    }
+    if has_more and limit:
+        result["next_offset"] = offset + limit
+
+    return result
@@ -10,9 +10,9 @@ todo待办计划工具
 """
 
 from typing import Literal
-from threading import Lock
 from pydantic import BaseModel, Field
-from tools import get_tool_registry
+from tools import get_tool_registry, get_tool_context
+from tools.context import ToolContext
 from tools.result import Result
 
 
@@ -94,21 +94,19 @@ class _TodoManager:
 
 
 registry = get_tool_registry()
-_todo_manager: _TodoManager | None = None
-_lock = Lock()
 
 
-def get_todo_manager() -> "_TodoManager":
+def get_todo_manager(context: ToolContext | None = None) -> "_TodoManager":
     """
-    单例返回
+    返回会话自己的待办列表， 每个会话（包括子agent）互不干扰
+    :param context: 会话的工具状态， None的时候使用当前正在执行的工具调用所属的会话
+    :type context: ToolContext | None
+    :rtype: _TodoManager
     """
-    global _todo_manager
-    if _todo_manager is None:
-        with _lock:
-            if _todo_manager is None:
-                _todo_manager = _TodoManager()
+    if context is None:
+        context = get_tool_context()
 
-    return _todo_manager
+    return context.state("todo", _TodoManager)
 
 
 @registry.register
@@ -4,7 +4,7 @@
 # * date： 2026-03
 # * description: 一个简单的AI LLM聊天程序
 # 收集工具调用
-from typing_extensions import Any
+from typing_extensions import Any, Callable
 from copy import deepcopy
 import json
 from error_handling import emit_error
@@ -21,8 +21,18 @@ class ToolCallAccumulator:
         """
         初始化
         """
+        self._on_tool_call: Callable[[dict], None] | None = None
         self._do_init()
 
+    def set_tool_call_handler(self, handler: Callable[[dict], None] | None):
+        """
+        设置工具调用完成回调
+        某个工具调用的参数完整之后立即回调， 调用方可以提前执行工具， 不必等待整个响应结束
+        :param handler: 参数是完整的工具调用信息， 传入None取消回调
+        :type handler: Callable[[dict], None] | None
+        """
+        self._on_tool_call = handler
+
     def _do_init(self):
         """
         初始化和重置的重复代码放在一起
@@ -58,6 +68,7 @@ class ToolCallAccumulator:
                 "arguments": tool_calls.function.arguments,
             }
             self._tool_calls.append(tool_call)
+            self._emit_tool_call(tool_call)
 
         return None
 
@@ -113,8 +124,18 @@ class ToolCallAccumulator:
             emit_error(msg=str(e), exception=e)
             return e
 
+        self._emit_tool_call(self._tool_calls[-1])
         return None
 
+    def _emit_tool_call(self, tool_call: dict):
+        """
+        通知调用方一个工具调用已经完整
+        :param tool_call: 完整的工具调用信息
+        :type tool_call: dict
+        """
+        if self._on_tool_call is not None:
+            self._on_tool_call(deepcopy(tool_call))
+
     def all(self) -> list:
         """
         清空并返回所有工具调用
@@ -0,0 +1,322 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/trigram_index.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+工作目录的三元组索引
+记录每个文件包含哪些连续的3字节片段（小写）， 搜索之前用正则表达式里必须出现的字面量排除不可能匹配的文件
+只有候选文件交给grep真正搜索， 所以索引只影响速度， 不影响结果
+每次查询之前按修改时间和大小增量更新， 只重新读取变化过的文件
+三元组编码成整数 b0<<16|b1<<8|b2， 倒排表是按文件编号排序的array('I')， 大目录也不会占用太多内存
+"""
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from re import _constants as sre_constants  # type: ignore[attr-defined]
+from re import _parser as sre_parse  # type: ignore[attr-defined]
+from threading import Lock
+from typing_extensions import Iterator
+import os
+import numpy as np
+from tools.file_search import iter_files
+from tools.process_pool import get_process_pool
+from util import detect_file_encoding
+
+# 超过这个大小的文件不建立索引， 查询的时候总是作为候选
+_MAX_INDEXED_BYTES = 2 * 1024 * 1024
+_BATCH_FILES = 128
+_PARALLEL_BATCHES = 2
+_BATCH_TIMEOUT = 120.0
+# 删除的文件编号超过这个数量而且超过现有文件的一半的时候， 从倒排表里清理掉
+_MIN_COMPACT_IDS = 1024
+_EMPTY = np.empty(0, dtype=np.uint32)
+
+
+def encode_trigrams(data: bytes) -> np.ndarray:
+    """
+    :param data: 小写之后的内容
+    :type data: bytes
+    :return: 排序去重之后的三元组编码
+    :rtype: np.ndarray
+    """
+    if len(data) < 3:
+        return _EMPTY
+    values = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    return np.unique(values[:-2] << 16 | values[1:-1] << 8 | values[2:])
+
+
+def extract_trigrams(paths: list[str]) -> dict[str, np.ndarray | None]:
+    """
+    在工作进程里读取一批文件的三元组
+    :param paths: 文件路径列表
+    :type paths: list[str]
+    :return: 每个文件的三元组编码， 不能建立索引的文件（非UTF-8、过大）为None， 二进制文件为空数组
+    :rtype: dict[str, np.ndarray | None]
+    """
+    result: dict[str, np.ndarray | None] = {}
+    for path in paths:
+        try:
+            if os.path.getsize(path) > _MAX_INDEXED_BYTES:
+                result[path] = None
+                continue
+            encoding = detect_file_encoding(path)
+        except ValueError:
+            # 二进制文件不会被grep搜索， 没有任何三元组
+            result[path] = _EMPTY
+            continue
+        except OSError:
+            result[path] = None
+            continue
+
+        if encoding not in ("utf-8", "ascii"):
+            result[path] = None
+            continue
+
+        with open(path, "rb") as f:
+            data = f.read().lower()
+        result[path] = encode_trigrams(data)
+
+    return result
+
+
+def _literal_runs(pattern: str) -> list[str] | None:
+    """
+    找出正则表达式每次匹配都必须包含的连续字面量
+    :param pattern: 正则表达式
+    :type pattern: str
+    :return: 字面量列表， 顶层有分支的时候返回None表示无法过滤
+    :rtype: list[str] | None
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+
+    runs: list[str] = []
+    current = ""
+    for op, av in parsed:
+        # 非ASCII的有大小写字符按字节小写之后不能保证一致， 不作为字面量
+        if op == sre_constants.LITERAL and (
+            (char := chr(av)).isascii() or char.lower() == char.upper()
+        ):
+            current += char
+            continue
+        if op == sre_constants.BRANCH:
+            return None
+        if current:
+            runs.append(current)
+        current = ""
+
+    if current:
+        runs.append(current)
+
+    return runs
+
+
+def required_trigrams(pattern: str) -> set[int] | None:
+    """
+    :param pattern: 正则表达式
+    :type pattern: str
+    :return: 匹配的文件必须包含的三元组编码， None表示不能过滤
+    :rtype: set[int] | None
+    """
+    runs = _literal_runs(pattern)
+    if not runs:
+        return None
+
+    grams: set[int] = set()
+    for run in runs:
+        grams.update(encode_trigrams(run.lower().encode("utf-8")).tolist())
+
+    return grams or None
+
+
+class TrigramIndex:
+    """
+    一个目录的三元组倒排索引
+    """
+
+    def __init__(self, root: Path):
+        """
+        初始化， 第一次查询的时候建立索引
+        :param root: 建立索引的目录
+        :type root: Path
+        """
+        self.root = root
+        # 文件路径 -> (修改时间, 大小, 文件编号)
+        self._files: dict[str, tuple[int, int, int]] = {}
+        # 三元组编码 -> 包含它的文件编号， 编号递增分配， 追加之后仍然有序
+        self._postings: dict[int, array] = {}
+        # 没有建立索引的文件编号， 总是作为候选
+        self._unindexed: set[int] = set()
+        # 已经删除但是还留在倒排表里的文件编号
+        self._removed: set[int] = set()
+        self._paths: dict[int, str] = {}
+        self._next_id = 0
+        self._lock = Lock()
+
+    def _remove(self, file_id: int):
+        """
+        从索引里删除一个文件， 倒排表里的编号之后批量清理， 查询的时候跳过
+        """
+        if file_id not in self._unindexed:
+            self._removed.add(file_id)
+        self._unindexed.discard(file_id)
+        self._paths.pop(file_id, None)
+
+    def _compact(self):
+        """
+        删除的文件编号足够多的时候从倒排表里清理掉
+        """
+        if len(self._removed) < max(_MIN_COMPACT_IDS, len(self._paths) // 2):
+            return
+
+        removed = np.fromiter(self._removed, dtype=np.uint32)
+        for gram, postings in list(self._postings.items()):
+            ids = np.frombuffer(postings, dtype=np.uint32)
+            kept = ids[~np.isin(ids, removed, assume_unique=True)]
+            if kept.size:
+                self._postings[gram] = array("I", kept.tobytes())
+            else:
+                del self._postings[gram]
+        self._removed.clear()
+
+    def _add(self, path: str, stat: tuple[int, int], grams: np.ndarray | None):
+        """
+        把一个文件加入索引
+        """
+        file_id = self._next_id
+        self._next_id += 1
+        self._files[path] = (*stat, file_id)
+        self._paths[file_id] = path
+        if grams is None:
+            self._unindexed.add(file_id)
+            return
+
+        postings = self._postings
+        for gram in grams.tolist():
+            if (ids := postings.get(gram)) is None:
+                ids = postings[gram] = array("I")
+            ids.append(file_id)
+
+    def refresh(self) -> dict:
+        """
+        按修改时间和大小增量更新索引
+        :return: 更新统计
+        :rtype: dict
+        """
+        with self._lock:
+            current: dict[str, tuple[int, int]] = {}
+            for file in iter_files(self.root):
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+                current[str(file)] = (stat.st_mtime_ns, stat.st_size)
+
+            removed = [path for path in self._files if path not in current]
+            changed = [
+                path
+                for path, stat in current.items()
+                if self._files.get(path, (None, None))[:2] != stat
+            ]
+            for path in removed + changed:
+                if path in self._files:
+                    self._remove(self._files.pop(path)[2])
+
+            batches = [
+                changed[i : i + _BATCH_FILES]
+                for i in range(0, len(changed), _BATCH_FILES)
+            ]
+            pool = get_process_pool()
+            with ThreadPoolExecutor(
+                max_workers=_PARALLEL_BATCHES, thread_name_prefix="trigram-index"
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        pool.run, extract_trigrams, batch, timeout=_BATCH_TIMEOUT
+                    )
+                    for batch in batches
+                ]
+                for batch, future in zip(batches, futures):
+                    try:
+                        extracted = future.result()
+                    except (TimeoutError, RuntimeError):
+                        # 这一批没有建立索引， 作为候选保证结果完整
+                        extracted = {path: None for path in batch}
+                    for path, grams in extracted.items():
+                        self._add(path, current[path], grams)
+            self._compact()
+
+            return {
+                "indexed_files": len(self._files),
+                "updated_files": len(changed),
+                "removed_files": len(removed),
+            }
+
+    def candidates(self, pattern: str) -> set[str] | None:
+        """
+        :param pattern: 正则表达式
+        :type pattern: str
+        :return: 可能匹配的文件路径， None表示不能过滤， 所有文件都是候选
+        :rtype: set[str] | None
+        """
+        grams = required_trigrams(pattern)
+        if grams is None:
+            return None
+
+        with self._lock:
+            postings = sorted(
+                (self._postings.get(gram, array("I")) for gram in grams), key=len
+            )
+            ids = np.frombuffer(postings[0], dtype=np.uint32)
+            for other in postings[1:]:
+                if not ids.size:
+                    break
+                ids = np.intersect1d(
+                    ids, np.frombuffer(other, dtype=np.uint32), assume_unique=True
+                )
+            paths = {
+                path
+                for file_id in ids.tolist()
+                if (path := self._paths.get(file_id)) is not None
+            }
+            return paths | {self._paths[file_id] for file_id in self._unindexed}
+
+    def filter_files(self, files: Iterator[Path], pattern: str) -> Iterator[Path]:
+        """
+        去掉不可能匹配的文件， 索引里没有的文件（比如刚刚创建的）保留
+        :param files: 要搜索的文件
+        :type files: Iterator[Path]
+        :param pattern: 正则表达式
+        :type pattern: str
+        :return: 候选文件
+        :rtype: Iterator[Path]
+        """
+        candidates = self.candidates(pattern)
+        for file in files:
+            path = str(file)
+            if candidates is None or path in candidates or path not in self._files:
+                yield file
+
+
+_indexes: dict[str, TrigramIndex] = {}
+_indexes_lock = Lock()
+
+
+def get_trigram_index(root: Path) -> TrigramIndex:
+    """
+    获取目录对应的索引， 每个目录一个实例
+    :param root: 建立索引的目录
+    :type root: Path
+    :return: 三元组索引
+    :rtype: TrigramIndex
+    """
+    key = str(root.resolve())
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = TrigramIndex(Path(key))
+
+        return _indexes[key]
@@ -0,0 +1,236 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tools/web_fetch_tool.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+下载网页并提取正文
+多个URL在共享的连接池上并发下载， 边下载边解压， 超过大小上限就停止
+提取之后的正文按URL缓存在磁盘上， 有ETag或者Last-Modified的页面用条件请求重新验证
+"""
+
+from threading import Lock
+import asyncio
+import re
+import time
+import chardet
+import httpx
+from diskcache import Cache  # type: ignore
+from pydantic import BaseModel, Field
+from tools import get_tool_registry
+from tools.http_client import get_http_client
+from tools.page_extract import extract_main_text
+from tools.result import Result
+
+registry = get_tool_registry()
+# 每个页面最多下载的字节数（解压之后）
+MAX_DOWNLOAD_BYTES = 2 * 1024 * 1024
+_FETCH_CONCURRENCY = 4
+_CACHE_DIR = "./tmp/cache/web_fetch"
+_CACHE_SIZE_LIMIT = 256 * 1024 * 1024
+# 没有ETag和Last-Modified的页面， 缓存在这段时间内直接使用（秒）
+_FRESH_SECONDS = 600.0
+_CACHE_EXPIRE_SECONDS = 7 * 24 * 3600.0
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+_TEXT_TYPES = ("text/", "application/json", "application/xml", "application/xhtml")
+
+_cache_instance: Cache | None = None
+_cache_lock = Lock()
+
+
+def _get_cache() -> Cache:
+    """
+    全局唯一获取磁盘缓存
+    :return: 单例
+    :rtype: Cache
+    """
+    global _cache_instance
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = Cache(_CACHE_DIR, size_limit=_CACHE_SIZE_LIMIT)
+
+    return _cache_instance
+
+
+class WebFetchInput(BaseModel):
+    """
+    web_fetch工具的输入参数
+    """
+
+    urls: list[str] = Field(
+        min_length=1, max_length=10, description="要读取的网页URL，可以一次读取多个"
+    )
+    max_chars: int = Field(
+        default=8000,
+        ge=500,
+        le=50000,
+        description="每个页面最多返回的正文字符数",
+    )
+    timeout: float = Field(
+        default=15.0, ge=1, le=60, description="每个页面的下载超时（秒）"
+    )
+    use_cache: bool = Field(default=True, description="False强制重新下载")
+
+
+def _decode(body: bytes, charset: str | None) -> str:
+    """
+    按响应头、<meta>声明、UTF-8、自动检测的顺序确定编码
+    """
+    if not charset and (match := _META_CHARSET.search(body[:4096])):
+        charset = match.group(1).decode("ascii", "ignore")
+    candidates = [charset] if charset else []
+    candidates.append("utf-8")
+    for encoding in candidates:
+        try:
+            return body.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+
+    detected = chardet.detect(body[:65536]).get("encoding") or "utf-8"
+    return body.decode(detected, errors="replace")
+
+
+def _parse(body: bytes, charset: str | None, content_type: str) -> tuple[str, str]:
+    """
+    解码并提取标题和正文
+    :return: 标题和正文
+    :rtype: tuple[str, str]
+    """
+    text = _decode(body, charset)
+    if "html" in content_type:
+        return extract_main_text(text)
+    return "", text.strip()
+
+
+async def _download(
+    client: httpx.AsyncClient, url: str, headers: dict, timeout: float
+) -> tuple[httpx.Response, bytes, bool]:
+    """
+    流式下载， 解压之后超过上限就停止
+    :return: 响应、正文、是否被截断
+    :rtype: tuple[httpx.Response, bytes, bool]
+    """
+    async with client.stream(
+        "GET", url, headers=headers, timeout=timeout, follow_redirects=True
+    ) as response:
+        if response.status_code == 304:
+            return response, b"", False
+        response.raise_for_status()
+
+        content_type = response.headers.get("content-type", "text/html").lower()
+        if not content_type.startswith(_TEXT_TYPES):
+            raise ValueError(f"不支持的内容类型： {content_type}")
+
+        chunks: list[bytes] = []
+        size = 0
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_DOWNLOAD_BYTES:
+                truncated = True
+                break
+
+        return response, b"".join(chunks)[:MAX_DOWNLOAD_BYTES], truncated
+
+
+async def _fetch_page(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    url: str,
+    p: WebFetchInput,
+) -> dict:
+    """
+    下载一个页面并提取正文， 优先使用缓存
+    磁盘缓存的读写、解码和正文提取都是同步的， 放到线程里执行， 不阻塞共享的事件循环
+    """
+    if not url.startswith(("http://", "https://")):
+        raise ValueError("只支持http和https链接")
+
+    cache = await asyncio.to_thread(_get_cache)
+    cached: dict | None = (
+        await asyncio.to_thread(cache.get, url) if p.use_cache else None
+    )
+    headers = {}
+    if cached is not None:
+        if not (cached.get("etag") or cached.get("last_modified")):
+            if time.time() - cached["fetched_at"] < _FRESH_SECONDS:
+                return {**cached["page"], "cached": True}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    async with semaphore:
+        response, body, truncated = await _download(client, url, headers, p.timeout)
+
+    if response.status_code == 304 and cached is not None:
+        return {**cached["page"], "cached": True}
+
+    title, content = await asyncio.to_thread(
+        _parse,
+        body,
+        response.charset_encoding,
+        response.headers.get("content-type", "text/html").lower(),
+    )
+
+    page = {
+        "url": url,
+        "final_url": str(response.url),
+        "title": title,
+        "content": content,
+        "download_truncated": truncated,
+    }
+    etag, last_modified = (
+        response.headers.get("etag"),
+        response.headers.get("last-modified"),
+    )
+    # 缓存键是URL， ETag和正文一起保存， ETag变化的时候条件请求返回新的正文
+    await asyncio.to_thread(
+        cache.set,
+        url,
+        {
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+            "page": page,
+        },
+        expire=_CACHE_EXPIRE_SECONDS,
+    )
+    return {**page, "cached": False}
+
+
+@registry.register(timeout=90.0)
+async def web_fetch(p: WebFetchInput) -> Result:
+    """
+    读取网页正文：下载一个或多个URL，去掉脚本、导航、页眉页脚，只返回标题和正文文字
+    web_search只返回摘要，需要页面详细内容的时候使用这个工具，不要用execute_shell运行curl
+    """
+    client = get_http_client()
+    semaphore = asyncio.Semaphore(_FETCH_CONCURRENCY)
+    responses = await asyncio.gather(
+        *(_fetch_page(client, semaphore, url, p) for url in p.urls),
+        return_exceptions=True,
+    )
+
+    pages = []
+    for url, response in zip(p.urls, responses):
+        if isinstance(response, BaseException):
+            pages.append(
+                {"url": url, "error": f"{type(response).__name__}: {response}"}
+            )
+            continue
+
+        content = response["content"]
+        if len(content) > p.max_chars:
+            response["content"] = (
+                content[: p.max_chars]
+                + f"\n...[正文共{len(content)}个字符， 已截断]..."
+            )
+        pages.append(response)
+
+    error = None
+    if all("error" in page for page in pages):
+        error = RuntimeError("； ".join(page["error"] for page in pages))
+    return Result(result={"pages": pages}, error=error)
@@ -3,22 +3,39 @@
 # * Author： 2651688427@qq.com <FreeRUOK>
 # * date： 2026-02
 # * description: 一个简单的AI LLM聊天程序
-# 实现了一个Web搜索工具， 优先使用duckduckgo， 备用百度
-import requests
+# 实现了一个Web搜索工具， 同时查询所有可用的后端（duckduckgo、百度）， 按规范化的URL合并去重之后排序
+# 收到足够的结果或者超过期限就返回， 不等待慢的后端
+from typing_extensions import Awaitable, Callable
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import asyncio
+import time
+import httpx
 from ddgs import DDGS  # type: ignore
 from baidusearch.baidusearch import search as bds  # type: ignore
 from pydantic import BaseModel, Field
 from tools.result import Result
 from tools import get_tool_registry
-from util import first_online_host
+from tools.http_client import get_http_client
+from tools.search_health import get_search_health
 
 _registry = get_tool_registry()
-_web_search_address: tuple | None = first_online_host(
-    addresss=[
-        ("duckduckgo.com", 443),
-        ("baidu.com", 443),
-    ]
-)
+# 百度跳转链接解析： 单个请求的超时、同时进行的请求数、全部解析的期限（秒）
+_RESOLVE_TIMEOUT = 3.0
+_RESOLVE_CONCURRENCY = 8
+_RESOLVE_DEADLINE = 4.0
+_RESOLVED_CACHE_SIZE = 1024
+# 跳转链接到真实URL的缓存， 只在共享事件循环上访问
+_resolved_urls: OrderedDict[str, str] = OrderedDict()
+# 全部后端的搜索期限（秒）， 超过之后返回已经收到的结果
+_SEARCH_DEADLINE = 12.0
+# 倒数排名融合的平滑常数
+_RRF_K = 60
+# 规范化URL的时候去掉的跟踪参数
+_TRACKING_PARAMS = {"spm", "from", "fr", "ref"}
+
+# 搜索后端的统一接口： (query, max_results) -> [{"title", "url", "snippet"}]
+Searcher = Callable[[str, int], Awaitable[list[dict]]]
 
 
 class _WebSearchInput(BaseModel):
@@ -31,24 +48,46 @@ class _WebSearchInput(BaseModel):
     max_results: int = Field(default=8, description="返回结果数量，默认 8", ge=1, le=25)
 
 
-def _get_real_url(baidu_link: str) -> str:
+def _ddgs_text(query: str, max_results: int) -> list:
+    """
+    DDGS只有同步接口， 放到线程里执行
+    """
+    with DDGS() as ddgs:
+        return list(ddgs.text(query, max_results=max_results))
+
+
+async def _get_real_url(
+    client: httpx.AsyncClient, semaphore: asyncio.Semaphore, baidu_link: str
+) -> str:
     """
-    获取百度搜索结果的真是URL
+    获取百度搜索结果的真实URL
+    :param client: 发送请求的http客户端
+    :type client: httpx.AsyncClient
+    :param semaphore: 限制同时进行的请求数
+    :type semaphore: asyncio.Semaphore
     :param baidu_link: 被百度加密的跳转URL
     :type baidu_link: str
-    :return: 如果能查到真是URL则返回， 否则加密URL原样返回
+    :return: 如果能查到真实URL则返回， 否则加密URL原样返回
     :rtype: str
     """
     if not baidu_link:
         return ""
 
-    headers = {
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36 Edg/144.0.0.0"
-    }
+    if baidu_link in _resolved_urls:
+        _resolved_urls.move_to_end(baidu_link)
+        return _resolved_urls[baidu_link]
+
     try:
-        response = requests.get(baidu_link, headers=headers, allow_redirects=False)
-        if response.status_code == 302:
-            return response.headers.get("Location", baidu_link)
+        async with semaphore:
+            response = await client.get(
+                baidu_link, follow_redirects=False, timeout=_RESOLVE_TIMEOUT
+            )
+        if response.is_redirect and "Location" in response.headers:
+            real_url = response.headers["Location"]
+            _resolved_urls[baidu_link] = real_url
+            if len(_resolved_urls) > _RESOLVED_CACHE_SIZE:
+                _resolved_urls.popitem(last=False)
+            return real_url
 
     except Exception:
         pass
@@ -56,9 +95,135 @@ def _get_real_url(baidu_link: str) -> str:
     return baidu_link
 
 
+async def _resolve_urls(links: list[str]) -> list[str]:
+    """
+    并发解析百度跳转链接， 超过期限还没有解析完成的链接原样返回
+    :param links: 跳转链接
+    :type links: list[str]
+    :return: 和links一一对应的URL
+    :rtype: list[str]
+    """
+    client = get_http_client()
+    semaphore = asyncio.Semaphore(_RESOLVE_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_get_real_url(client, semaphore, link)) for link in links
+    ]
+    if tasks:
+        await asyncio.wait(tasks, timeout=_RESOLVE_DEADLINE)
+
+    urls = []
+    for link, task in zip(links, tasks):
+        if task.done() and not task.cancelled():
+            urls.append(task.result())
+        else:
+            task.cancel()
+            urls.append(link)
+    return urls
+
+
+async def _search_duckduckgo(query: str, max_results: int) -> list[dict]:
+    """
+    使用duckduckgo搜索
+    """
+    results = await asyncio.to_thread(_ddgs_text, query, max_results)
+    return [
+        {
+            "title": result.get("title", ""),
+            "url": result.get("href", ""),
+            "snippet": result.get("body", ""),
+        }
+        for result in results
+    ]
+
+
+async def _search_baidu(query: str, max_results: int) -> list[dict]:
+    """
+    使用百度搜索， 需要解析跳转链接得到真实URL
+    """
+    results = await asyncio.to_thread(bds, query, num_results=max_results)
+    urls = await _resolve_urls([result.get("url", "") for result in results])
+    return [
+        {
+            "title": result.get("title", ""),
+            "url": url,
+            "snippet": result.get("abstract", ""),
+        }
+        for result, url in zip(results, urls)
+    ]
+
+
+# 后端名称和search_health里的名称一致， 新的后端实现Searcher接口之后在这里注册
+_SEARCHERS: dict[str, Searcher] = {
+    "duckduckgo": _search_duckduckgo,
+    "baidu": _search_baidu,
+}
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化URL， 用于合并不同后端返回的同一个页面
+    :param url: 原始URL
+    :type url: str
+    :return: 去掉协议差异、www、锚点、跟踪参数和末尾斜杠之后的URL
+    :rtype: str
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not (key.lower().startswith("utm_") or key.lower() in _TRACKING_PARAMS)
+        )
+    )
+    path = parts.path.rstrip("/")
+    return urlunsplit(("", host, path, query, ""))
+
+
+class _MergedResults:
+    """
+    合并多个后端的结果， 按倒数排名融合排序， 多个后端都返回的结果排在前面
+    """
+
+    def __init__(self):
+        self._items: dict[str, dict] = {}
+        self._scores: dict[str, float] = {}
+
+    def add(self, backend: str, results: list[dict]):
+        """
+        :param backend: 后端名称
+        :type backend: str
+        :param results: 后端返回的结果， 按后端自己的相关度排序
+        :type results: list[dict]
+        """
+        for rank, result in enumerate(results):
+            if not (result.get("url") and result.get("title")):
+                continue
+
+            key = normalize_url(result["url"])
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = {**result, "sources": []}
+            elif len(result.get("snippet", "")) > len(item.get("snippet", "")):
+                item["snippet"] = result["snippet"]
+            item["sources"].append(backend)
+            self._scores[key] = self._scores.get(key, 0.0) + 1 / (_RRF_K + rank)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def top(self, count: int) -> list[dict]:
+        """
+        :return: 得分最高的count个结果
+        :rtype: list[dict]
+        """
+        keys = sorted(self._items, key=lambda key: -self._scores[key])
+        return [self._items[key] for key in keys[:count]]
+
+
 # 自动注册工具
-@_registry.register
-def web_search(input_model: _WebSearchInput) -> Result:
+@_registry.register(timeout=60.0)
+async def web_search(input_model: _WebSearchInput) -> Result:
     """
     工具的实现
     :param input_model: 工具的参数统一接受 pydantic.BaseModel 的子类型
@@ -66,36 +231,41 @@ def web_search(input_model: _WebSearchInput) -> Result:
     :return: 返回工具执行结果， , 执行结果统一使用Result类型
     :rtype: Result
     """
-    global _web_search_address
-    search_results = []
-    url_name, body_name = "href", "body"
-    # 开始搜索
+    health = get_search_health()
+    tasks = {
+        asyncio.ensure_future(
+            _SEARCHERS[backend](input_model.query, input_model.max_results)
+        ): backend
+        for backend in health.available()
+    }
+    merged = _MergedResults()
+    errors: list[str] = []
+    deadline = time.monotonic() + _SEARCH_DEADLINE
+    pending = set(tasks)
     try:
-        if (
-            _web_search_address is not None
-            and _web_search_address[0] == "duckduckgo.com"
-        ):
-            with DDGS() as ddgs:
-                search_results = list(
-                    ddgs.text(input_model.query, max_results=input_model.max_results)
-                )
-        else:
-            search_results = bds(input_model.query, num_results=input_model.max_results)
-            url_name = "url"
-            body_name = "abstract"
-        # 统一搜索结果
-        search_data = [
-            {
-                "title": result.get("title", ""),
-                "url": result.get(url_name, "")
-                if _web_search_address is not None
-                and _web_search_address[0] != "baidu.com"
-                else _get_real_url(result.get("url", "")),
-                "snippet": result.get(body_name, ""),
-            }
-            for result in search_results
-        ]
-
-        return Result(result={"search_results": search_data})
-    except Exception as e:
-        return Result(result={}, error=e)
+        # 先完成的后端先合并， 结果足够的时候不再等待其它后端
+        while pending and len(merged) < input_model.max_results:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                backend = tasks[task]
+                if task.exception() is None:
+                    health.report_success(backend)
+                    merged.add(backend, task.result())
+                else:
+                    # 失败的后端降低得分并在后台重新探测
+                    health.report_failure(backend)
+                    errors.append(f"{backend}: {task.exception()}")
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if not len(merged) and errors:
+        return Result(result={}, error=RuntimeError("； ".join(errors)))
+
+    return Result(result={"search_results": merged.top(input_model.max_results)})
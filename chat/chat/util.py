@@ -7,7 +7,9 @@
 # 这里提供了日志文件的配置， 也许该分离日志和错误处理部分
 from queue import Queue
 from io import BytesIO
+from functools import lru_cache
 import base64
+import codecs
 from pathlib import Path
 import re
 import socket
@@ -56,6 +58,94 @@ def validate_values(
     return values
 
 
+# 编码检测只看文件的几段采样， chardet处理几MB的内容非常慢
+_ENCODING_SAMPLE_BYTES = 64 * 1024
+# 文件开头这个范围内出现NUL字节就认为是二进制文件
+_BINARY_SNIFF_BYTES = 8192
+# UTF-32 LE的BOM以UTF-16 LE的BOM开头， 必须先检查
+_BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _is_utf8_sample(sample: bytes, at_start: bool, at_end: bool) -> bool:
+    """
+    文件中间的采样可能切断多字节字符， 跳过开头不完整的字符， 允许结尾不完整
+    :param at_start: 采样是否从文件开头开始
+    :param at_end: 采样是否一直到文件结尾
+    """
+    if not at_start:
+        skip = 0
+        while skip < 3 and skip < len(sample) and 0x80 <= sample[skip] <= 0xBF:
+            skip += 1
+        sample = sample[skip:]
+
+    try:
+        sample.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        return not at_end and e.reason == "unexpected end of data"
+
+
+def _sample_encoding(samples: list[bytes]) -> str:
+    """
+    按照BOM、二进制特征、UTF-8、chardet的顺序判断采样内容的编码
+    :param samples: 文件开头、中间、结尾的采样， 只有最后一个采样到达文件结尾
+    """
+    head = samples[0]
+    for bom, encoding in _BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding
+
+    if b"\x00" in head[:_BINARY_SNIFF_BYTES]:
+        raise ValueError("二进制文件")
+
+    last = len(samples) - 1
+    if all(
+        _is_utf8_sample(sample, at_start=i == 0, at_end=i == last)
+        for i, sample in enumerate(samples)
+    ):
+        return "utf-8"
+
+    if detected := chardet.detect(b"".join(samples))["encoding"]:
+        return detected
+
+    raise ValueError("无法识别文本编码")
+
+
+@lru_cache(maxsize=256)
+def _cached_file_encoding(path: str, mtime_ns: int, size: int) -> str:
+    """
+    读取文件开头、中间、结尾的采样判断编码
+    修改时间和大小作为缓存键的一部分， 文件变化之后重新检测
+    """
+    with open(path, "rb") as f:
+        samples = [f.read(_ENCODING_SAMPLE_BYTES)]
+        if size > 3 * _ENCODING_SAMPLE_BYTES:
+            f.seek(size // 2)
+            samples.append(f.read(_ENCODING_SAMPLE_BYTES))
+            f.seek(size - _ENCODING_SAMPLE_BYTES)
+            samples.append(f.read())
+        elif size > _ENCODING_SAMPLE_BYTES:
+            samples.append(f.read())
+
+    return _sample_encoding(samples)
+
+
+def detect_file_encoding(filename: str) -> str:
+    """
+    检测文本文件的编码， 结果按(路径, 修改时间, 大小)缓存
+    二进制文件或者无法识别的编码抛出ValueError
+    """
+    path = Path(filename)
+    stat = path.stat()
+    return _cached_file_encoding(str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+
 def read_file_text(filename: str, require: bool = False) -> str | None:
     """
     读取一个文本文件所有内容
@@ -63,9 +153,17 @@ def read_file_text(filename: str, require: bool = False) -> str | None:
     """
     try:
         buf = Path(filename).read_bytes()
-        if encoding := chardet.detect(buf)["encoding"]:
+        try:
+            encoding = detect_file_encoding(filename)
+        except ValueError as e:
+            raise ValueError(f"文件: {filename} 不是纯文本文件。 {e}")
+
+        try:
             return buf.decode(encoding=encoding)
-        else:
+        except UnicodeDecodeError:
+            # 采样之外的内容不符合检测到的编码， 退回到检测全部内容
+            if detected := chardet.detect(buf)["encoding"]:
+                return buf.decode(encoding=detected, errors="replace")
             raise ValueError(f"文件: {filename} 不是纯文本文件。")
 
     except (FileNotFoundError, PermissionError, ValueError) as e:
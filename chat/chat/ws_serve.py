@@ -144,21 +144,32 @@ class WSServe:
         每次模型输出消息块的时候调用
         """
         if self.serve_status.current_content_tag != model_result.tag:
+            # 工具进度和模型输出交替到达， 切换类型之前先发送缓冲的内容， 不把两种内容拼在一行里
+            self._flush_line()
             self.serve_status.current_content_tag = model_result.tag
             model_result.content = f"\n{model_result.content}"
 
         self.serve_status.line += model_result.content
         self.serve_status.current_model_name = model_result.model_name
         if self.serve_status.line[-1:] == "\n" or model_result.tag == ContentTag.end:
-            self.sio.emit(
-                "chat",
-                ModelResult(
-                    self.serve_status.line,
-                    self.serve_status.current_content_tag,
-                    self.serve_status.current_model_name,
-                ).to_dict(),
-            )
-            self.serve_status.line = ""
+            self._flush_line()
+
+    def _flush_line(self):
+        """
+        把缓冲的内容连同它的类型发送给前端
+        """
+        if not self.serve_status.line:
+            return
+
+        self.sio.emit(
+            "chat",
+            ModelResult(
+                self.serve_status.line,
+                self.serve_status.current_content_tag,
+                self.serve_status.current_model_name,
+            ).to_dict(),
+        )
+        self.serve_status.line = ""
 
     def output_audio(self, audio_buffer: BytesIO):
         """
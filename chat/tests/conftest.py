@@ -0,0 +1,13 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tests/conftest.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+程序的模块按chat目录平铺导入（from tools import ...）， 测试也一样
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "chat"))
@@ -0,0 +1,51 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tests/test_array_eval.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+smart_calc的数组模式
+"""
+
+import pytest
+from tools.array_eval import evaluate_array
+
+_VARIABLES = {"x": [1, 2, 3, 4, 5], "A": [[2, 1], [1, 3]], "b": [3, 5]}
+
+
+@pytest.mark.parametrize(
+    ("expr", "expected"),
+    [
+        ("percentile(x, 50)", 3.0),
+        ("sum(x > 2)", 3),
+        ("sum((x > 1) & (x < 5))", 3),
+        ("solve(A, b)", [0.8, 1.4]),
+        ("A @ A", [[5.0, 5.0], [5.0, 10.0]]),
+        ("dot(x, x)", 55.0),
+        ("dot(2, x)", [2.0, 4.0, 6.0, 8.0, 10.0]),
+    ],
+)
+def test_evaluate(expr, expected):
+    assert evaluate_array(expr, _VARIABLES) == expected
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "zeros(10000, 10000)",
+        "arange(10**9)",
+        "sum(reshape(arange(20000), 20000, 1) < arange(20000))",
+        "sum(reshape(arange(20000), 20000, 1) == arange(20000))",
+        "reshape(arange(20000), 20000, 1) @ reshape(arange(20000), 1, 20000)",
+        "dot(reshape(arange(20000), 20000, 1), reshape(arange(20000), 1, 20000))",
+        "matmul(reshape(arange(20000), 20000, 1), reshape(arange(20000), 1, 20000))",
+    ],
+)
+def test_size_limit(expr):
+    with pytest.raises(ValueError, match="数组太大"):
+        evaluate_array(expr)
+
+
+def test_attribute_access_blocked():
+    with pytest.raises(Exception, match="不能访问属性"):
+        evaluate_array("x.tofile('/tmp/x')", _VARIABLES)
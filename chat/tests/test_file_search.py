@@ -0,0 +1,38 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tests/test_file_search.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+按字节搜索和按字符串搜索的结果一致
+"""
+
+import pytest
+from tools.file_search import search_files
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / "names.txt"
+    path.write_text("用户名字\nuser_name = 'KELVIN'\n", encoding="utf-8")
+    return path
+
+
+def _lines(path, pattern: str) -> list:
+    result = search_files([str(path)], "", pattern, 0, 10)
+    return [match["line_number"] for match in result["matches"]]
+
+
+@pytest.mark.parametrize(
+    "pattern, lines",
+    [
+        ("用.名", [1]),
+        (r"^\w+$", [1]),
+        (r"[^a-z]名", [1]),
+        ("user_name", [2]),
+        # K和开尔文符号忽略大小写的时候相等
+        ("Kelvin", [2]),
+    ],
+)
+def test_patterns_match_characters(source_file, pattern, lines):
+    assert _lines(source_file, pattern) == lines
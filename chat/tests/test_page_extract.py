@@ -0,0 +1,40 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tests/test_page_extract.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+网页正文提取
+"""
+
+from tools.page_extract import extract_main_text
+
+
+def test_implicitly_closed_tags_in_header():
+    html = "<body><header><p>Site<p>tag</header><p>Real content</p></body>"
+    assert extract_main_text(html) == ("", "Real content")
+
+
+def test_implicitly_closed_list_items_in_nav():
+    html = "<body><nav><ul><li>Home<li>About</ul></nav><p>Body</p></body>"
+    assert extract_main_text(html)[1] == "Body"
+
+
+def test_nested_skip_tags():
+    html = (
+        "<body><footer><form><select><option>a<option>b</select></form>"
+        "<nav>links</nav></footer><p>after</p></body>"
+    )
+    assert extract_main_text(html)[1] == "after"
+
+
+def test_prefers_main():
+    article = "正文。" * 100
+    html = (
+        "<html><head><title> 标题 </title><script>var a = 1</script></head>"
+        f"<body><div>侧边</div><main><h1>大标题</h1><p>{article}</p></main></body></html>"
+    )
+    title, text = extract_main_text(html)
+    assert title == "标题"
+    assert text.startswith("# 大标题")
+    assert "侧边" not in text
@@ -0,0 +1,94 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tests/test_table_query.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+data_query的查询引擎
+"""
+
+import json
+import pytest
+from tools import table_reader
+from tools.table_query import run_query
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text("city,amount\n北京,10\n上海,20\n北京,30\n广州,\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    path = tmp_path / "events.jsonl"
+    rows = [{"user": "a", "ms": 5}, {"user": "b"}, {"user": "a", "ms": 7}]
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n", encoding="utf-8")
+    return path
+
+
+def test_count_only_csv(csv_file):
+    result = run_query(csv_file, "csv", aggregates=[("count", None)])
+    assert result["rows"] == [[4]]
+    assert result["scanned_rows"] == 4
+
+
+def test_count_only_jsonl(jsonl_file):
+    result = run_query(jsonl_file, "jsonl", aggregates=[("count", None)])
+    assert result["rows"] == [[3]]
+    assert result["scanned_rows"] == 3
+
+
+def test_count_with_where_on_sparse_jsonl_column(jsonl_file):
+    result = run_query(
+        jsonl_file, "jsonl", where=[("ms", ">", 6)], aggregates=[("count", None)]
+    )
+    assert result["rows"] == [[1]]
+    assert result["scanned_rows"] == 3
+
+
+def test_group_by_sum(csv_file):
+    result = run_query(
+        csv_file,
+        "csv",
+        group_by=["city"],
+        aggregates=[("sum", "amount")],
+        order_by="sum_amount",
+        descending=True,
+    )
+    assert result["columns"] == ["city", "sum_amount"]
+    assert result["rows"][0] == ["北京", 40.0]
+
+
+def test_missing_column(csv_file):
+    with pytest.raises(ValueError):
+        run_query(csv_file, "csv", aggregates=[("sum", "price")])
+
+
+def test_numeric_text_compares_as_number(csv_file):
+    result = run_query(csv_file, "csv", where=[("amount", "==", "30")])
+    assert result["rows"] == [["北京", 30]]
+    result = run_query(csv_file, "csv", where=[("amount", "in", ["10", 20])])
+    assert [row[1] for row in result["rows"]] == [10, 20]
+
+
+def test_contains_on_numeric_column(csv_file):
+    result = run_query(csv_file, "csv", where=[("amount", "contains", "30")])
+    assert result["rows"] == [["北京", 30]]
+
+
+def test_group_keys_match_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(table_reader, "CHUNK_ROWS", 2)
+    path = tmp_path / "ids.csv"
+    # 第一块全部是数字， 第二块是数字和文本混合
+    path.write_text("id,n\n7,1\n8,1\n7,1\nx,1\n", encoding="utf-8")
+    result = run_query(path, "csv", group_by=["id"], order_by="count")
+    assert result["rows"] == [[8, 1], ["x", 1], [7, 2]]
+
+
+def test_leading_zero_ids_stay_text(tmp_path):
+    path = tmp_path / "codes.csv"
+    path.write_text("code\n00123\n45\n", encoding="utf-8")
+    result = run_query(path, "csv", where=[("code", "==", "00123")])
+    assert result["rows"] == [["00123"]]
@@ -0,0 +1,38 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tests/test_text_file.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+按行读取文本文件
+"""
+
+import pytest
+from tools.text_file import read_lines
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "lines.txt"
+    # 第1行里有换页符和行分隔符， 第2行是CRLF结尾
+    path.write_bytes("line 0\nline\x0c1\u2028x\nline 2\r\nline 3\nline 4\n".encode())
+    return path
+
+
+def test_head_pages_follow_newlines(text_file):
+    first = read_lines(text_file, offset=0, limit=2)
+    assert first["file_content"] == "line 0\nline\x0c1\u2028x"
+    assert first["next_offset"] == 2
+
+    second = read_lines(text_file, offset=first["next_offset"], limit=2)
+    assert second["file_content"] == "line 2\nline 3"
+
+
+def test_tail(text_file):
+    assert read_lines(text_file, limit=2, tail=True)["file_content"] == "line 3\nline 4"
+    result = read_lines(text_file, offset=3, limit=1, tail=True)
+    assert result["file_content"] == "line\x0c1\u2028x"
+
+
+def test_skip_past_start(text_file):
+    assert read_lines(text_file, offset=10, limit=2, tail=True)["file_content"] == ""
@@ -0,0 +1,131 @@
+# --*-- Encoding: UTF-8 --*--
+#! filename: tests/test_web_fetch.py
+# * Author： 2651688427@qq.com <FreeRUOK>
+# * date： 2026-03
+# * description: 一个简单的AI LLM聊天程序
+"""
+web_fetch工具， 使用本地的HTTP服务器代替真实网站
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import threading
+import pytest
+from diskcache import Cache  # type: ignore
+from tools import get_tool_registry
+from tools.context import ToolContext
+import tools.web_fetch_tool as web_fetch_tool
+
+_ARTICLE = "<p>" + "正文内容很长。" * 60 + "</p>"
+_PAGES = {
+    "/article": (
+        "text/html; charset=utf-8",
+        (
+            "<html><head><title>测试页面</title></head><body>"
+            "<nav><ul><li>首页<li>关于</ul></nav>"
+            f"<main><h1>标题</h1>{_ARTICLE}</main><footer>版权</footer></body></html>"
+        ).encode(),
+    ),
+    "/gbk": (
+        "text/html",
+        '<html><head><meta charset="gbk"></head><body><p>你好世界</p></body></html>'.encode(
+            "gbk"
+        ),
+    ),
+    "/big": ("text/plain", b"x" * (web_fetch_tool.MAX_DOWNLOAD_BYTES * 2)),
+    "/image": ("image/png", b"\x89PNG"),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits: list[str] = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        if self.path not in _PAGES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path == "/article" and self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        content_type, body = _PAGES[self.path]
+        body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/article":
+            self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    cache = Cache(str(tmp_path / "web_fetch"))
+    monkeypatch.setattr(web_fetch_tool, "_cache_instance", cache)
+    _Handler.hits.clear()
+    yield cache
+    cache.close()
+
+
+def _fetch(**arguments) -> dict:
+    result = get_tool_registry().execute("web_fetch", arguments, context=ToolContext())
+    return {"error": result.error, "pages": result.result["pages"]}
+
+
+def test_extracts_main_content(base_url):
+    page = _fetch(urls=[base_url + "/article"])["pages"][0]
+    assert page["title"] == "测试页面"
+    assert page["content"].startswith("# 标题")
+    assert "首页" not in page["content"] and "版权" not in page["content"]
+    assert page["cached"] is False
+
+
+def test_decodes_meta_charset(base_url):
+    page = _fetch(urls=[base_url + "/gbk"])["pages"][0]
+    assert page["content"] == "你好世界"
+
+
+def test_download_size_cap(base_url):
+    page = _fetch(urls=[base_url + "/big"], max_chars=500)["pages"][0]
+    assert page["download_truncated"] is True
+    assert "已截断" in page["content"]
+
+
+def test_errors_are_reported_per_url(base_url):
+    result = _fetch(urls=[base_url + "/article", base_url + "/image", "ftp://x"])
+    article, image, ftp = result["pages"]
+    assert "error" not in article
+    assert "不支持的内容类型" in image["error"]
+    assert "http" in ftp["error"]
+    assert result["error"] is None
+
+
+def test_all_failed(base_url):
+    result = _fetch(urls=[base_url + "/missing"])
+    assert result["error"] is not None
+
+
+def test_revalidates_with_etag(base_url):
+    _fetch(urls=[base_url + "/article"])
+    page = _fetch(urls=[base_url + "/article"])["pages"][0]
+    assert page["cached"] is True
+    assert _Handler.hits == ["/article", "/article"]
+
+    page = _fetch(urls=[base_url + "/article"], use_cache=False)["pages"][0]
+    assert page["cached"] is False